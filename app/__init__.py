@@ -1,8 +1,10 @@
+import atexit
 import datetime
 import logging
 import os
+import threading
 
-from flask import Flask, abort, send_from_directory
+from flask import Flask, abort, jsonify, send_from_directory
 from flask_login import LoginManager
 
 from . import database
@@ -10,7 +12,10 @@ from .auth import requires_auth
 from .config import Config
 from .models import User
 from .routes import main_bp
-from .services.detection_service import DetectionService
+from .services.job_service import JobManager
+from .services.model_loader import DetectionLoader
+from .services.stats_cache import StatsCache
+from .services.violation_writer import ViolationWriter
 
 login_manager = LoginManager()
 login_manager.login_view = "auth.login"
@@ -27,11 +32,14 @@ logging.basicConfig(
     format="%(asctime)s %(levelname)s %(name)s %(threadName)s : %(message)s",
 )
 
-detection_service = None
+detection_loader = None
+job_manager = None
+stats_cache = None
+violation_writer = None
 
 
 def create_app(config_class=Config):
-    global detection_service
+    global detection_loader, job_manager, stats_cache, violation_writer
 
     app = Flask(__name__)
     app.config.from_object(config_class)
@@ -40,12 +48,45 @@ def create_app(config_class=Config):
     database.init_app(app)
     login_manager.init_app(app)
 
-    if detection_service is None:
-        with app.app_context():
-            detection_service = DetectionService()
-            app.detection_service = detection_service
-    else:
-        app.detection_service = detection_service
+    if stats_cache is None:
+        stats_cache = StatsCache(ttl_sec=app.config["DASHBOARD_STATS_TTL_SEC"])
+    app.stats_cache = stats_cache
+
+    if violation_writer is None:
+        violation_writer = ViolationWriter(
+            app.db_connections,
+            batch_size=app.config["DB_WRITE_BATCH_SIZE"],
+            flush_interval_sec=app.config["DB_WRITE_FLUSH_INTERVAL_SEC"],
+            on_insert=stats_cache.invalidate,
+        )
+        violation_writer.start()
+        atexit.register(violation_writer.stop)
+    app.violation_writer = violation_writer
+
+    # The model loads off the request path (or never, on web-only workers);
+    # callers get the DetectionService through app.detection_loader.get().
+    if detection_loader is None:
+        detection_loader = DetectionLoader(
+            app,
+            mode=app.config["DETECTION_MODE"],
+            warmup_size=app.config["MODEL_IMGSZ"],
+        )
+        if detection_loader.mode == "background":
+            detection_loader.start()
+    app.detection_loader = detection_loader
+
+    if job_manager is None:
+        job_manager = JobManager(
+            app,
+            max_workers=app.config["UPLOAD_MAX_WORKERS"],
+            max_pending=app.config["UPLOAD_MAX_PENDING_JOBS"],
+            retention_sec=app.config["UPLOAD_JOB_RETENTION_SEC"],
+        )
+        # Upload workers are non-daemon threads that concurrent.futures joins
+        # before atexit handlers run, so cancel running jobs from a threading
+        # exit hook; they stop at their next frame instead of running to the end.
+        threading._register_atexit(job_manager.shutdown)
+    app.job_manager = job_manager
 
     from .routes import main_bp
 
@@ -59,6 +100,16 @@ def create_app(config_class=Config):
     def inject_now():
         return {"now": datetime.datetime.utcnow()}
 
+    # Readiness probe for load balancers, outside the login-protected blueprint.
+    # 200 once inference is available, on web-only workers
+    # (DETECTION_MODE=disabled) and on on-demand workers that have not been
+    # asked to load yet; 503 while the model is loading or if it failed.
+    @app.route("/health/ready")
+    def readiness():
+        loader = app.detection_loader
+        ok = loader.ready or loader.state in ("disabled", "not_loaded")
+        return jsonify(loader.status()), 200 if ok else 503
+
     # Route to serve violation images
     @app.route("/violations/images/<path:filename>")
     @requires_auth
@@ -27,9 +27,73 @@ class Config:
         project_root, os.environ.get("MODEL_PATH", "models/yolov8s_ppe_custom.pt")
     )
 
+    # "ultralytics" runs MODEL_PATH through YOLO (PyTorch); "onnxruntime" runs an
+    # ONNX model on CPU. A .pt MODEL_PATH is exported to ONNX once and cached in
+    # ONNX_CACHE_DIR under the hash of the weights. ONNX thread counts of 0 let
+    # ONNX Runtime choose.
+    MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "ultralytics")
+    MODEL_CONFIDENCE = float(os.environ.get("MODEL_CONFIDENCE", 0.35))
+    MODEL_IOU = float(os.environ.get("MODEL_IOU", 0.7))
+    MODEL_IMGSZ = int(os.environ.get("MODEL_IMGSZ", 640))
+    ONNX_CACHE_DIR = os.path.join(
+        project_root, os.environ.get("ONNX_CACHE_DIR", "models/onnx_cache")
+    )
+    ONNX_INTRA_OP_THREADS = int(os.environ.get("ONNX_INTRA_OP_THREADS", 0))
+    ONNX_INTER_OP_THREADS = int(os.environ.get("ONNX_INTER_OP_THREADS", 0))
+    # Runs the model in INFERENCE_WORKERS separate processes (0 = in the web
+    # process). Frames reach a worker through shared memory: a ring of
+    # INFERENCE_SLOTS_PER_WORKER slots of INFERENCE_SLOT_MB each. Batches are
+    # split to fit a slot, but a single frame must fit in one.
+    INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", 0))
+    INFERENCE_SLOTS_PER_WORKER = int(os.environ.get("INFERENCE_SLOTS_PER_WORKER", 4))
+    INFERENCE_SLOT_MB = float(os.environ.get("INFERENCE_SLOT_MB", 32))
+    # "background" loads the model on a thread at startup, "on_demand" with the
+    # first upload or stream, "disabled" never (web/dashboard-only workers).
+    # Streams wait up to DETECTION_WAIT_SEC for a model that is still loading.
+    DETECTION_MODE = os.environ.get("DETECTION_MODE", "background")
+    DETECTION_WAIT_SEC = float(os.environ.get("DETECTION_WAIT_SEC", 60))
+    # "int8" loads the statically quantized model produced by
+    # scripts/quantize_model.py (onnxruntime backend only), from MODEL_INT8_PATH
+    # or next to the FP32 export.
+    MODEL_PRECISION = os.environ.get("MODEL_PRECISION", "fp32")
+    MODEL_INT8_PATH = os.environ.get("MODEL_INT8_PATH")
+    if MODEL_INT8_PATH:
+        MODEL_INT8_PATH = os.path.join(project_root, MODEL_INT8_PATH)
+
     TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
     TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
     NOTIFICATION_COOLDOWN = int(os.environ.get("NOTIFICATION_COOLDOWN", 60))
+    # "memory" keeps cooldowns per process; "sqlite" shares them between all
+    # worker processes through NOTIFICATION_COOLDOWN_DB. Either way at most
+    # NOTIFICATION_COOLDOWN_MAX_ENTRIES keys are kept.
+    NOTIFICATION_COOLDOWN_BACKEND = os.environ.get(
+        "NOTIFICATION_COOLDOWN_BACKEND", "memory"
+    )
+    NOTIFICATION_COOLDOWN_DB = os.path.join(
+        project_root,
+        os.environ.get(
+            "NOTIFICATION_COOLDOWN_DB", os.path.join(VIOLATION_FOLDER, "cooldowns.db")
+        ),
+    )
+    NOTIFICATION_COOLDOWN_MAX_ENTRIES = int(
+        os.environ.get("NOTIFICATION_COOLDOWN_MAX_ENTRIES", 10000)
+    )
+    # Notifications are sent by a background dispatcher. Network errors, 5xx and
+    # 429 responses are retried with exponential backoff starting at
+    # NOTIFICATION_BACKOFF_SEC (or after Telegram's retry_after, if longer);
+    # other 4xx errors are not retried.
+    NOTIFICATION_QUEUE_SIZE = int(os.environ.get("NOTIFICATION_QUEUE_SIZE", 500))
+    NOTIFICATION_MAX_RETRIES = int(os.environ.get("NOTIFICATION_MAX_RETRIES", 3))
+    NOTIFICATION_BACKOFF_SEC = float(os.environ.get("NOTIFICATION_BACKOFF_SEC", 1.0))
+    # "immediate" sends one message per violation (subject to the cooldown);
+    # "digest" collects each site's violations for NOTIFICATION_DIGEST_WINDOW_SEC
+    # and sends them as one album with a summary caption.
+    NOTIFICATION_MODE = os.environ.get("NOTIFICATION_MODE", "immediate")
+    NOTIFICATION_DIGEST_WINDOW_SEC = float(
+        os.environ.get("NOTIFICATION_DIGEST_WINDOW_SEC", 30)
+    )
+    # Override to point at a local stand-in server (scripts/fake_telegram_server.py).
+    TELEGRAM_API_BASE = os.environ.get("TELEGRAM_API_BASE", "https://api.telegram.org")
 
     try:
         PPE_CLASS_MAPPING = json.loads(os.environ.get("PPE_CLASS_MAPPING", "{}"))
@@ -50,6 +114,132 @@ class Config:
         print("Warning: Invalid AREA_REQUIREMENTS in .env file. Using empty dict.")
         AREA_REQUIREMENTS = {}
 
+    # Regions of interest: lists of polygons in normalised [0, 1] (x, y)
+    # coordinates. CAMERA_ROIS is keyed by stream URL (or upload location) and
+    # takes precedence over AREA_ROIS, keyed by area type. Only the polygons'
+    # bounding rectangle is analysed; detections centred outside are dropped.
+    try:
+        CAMERA_ROIS = json.loads(os.environ.get("CAMERA_ROIS", "{}"))
+    except json.JSONDecodeError:
+        print("Warning: Invalid CAMERA_ROIS in .env file. Using full frames.")
+        CAMERA_ROIS = {}
+
+    try:
+        AREA_ROIS = json.loads(os.environ.get("AREA_ROIS", "{}"))
+    except json.JSONDecodeError:
+        print("Warning: Invalid AREA_ROIS in .env file. Using full frames.")
+        AREA_ROIS = {}
+
+    # Frames are downscaled right after capture/decode so their longer side is at
+    # most this many pixels; the small copy is used for inference, tracking,
+    # annotation and the MJPEG preview. Snapshots still use the original
+    # resolution unless SNAPSHOT_MAX_WIDTH is smaller. 0 (the default) keeps
+    # native frames; 1280 is a good start for 4K cameras.
+    # Per-camera (stream URL or upload location) and per-area overrides:
+    INFERENCE_MAX_SIDE = int(os.environ.get("INFERENCE_MAX_SIDE", 0))
+    try:
+        CAMERA_INFERENCE_SIZES = json.loads(
+            os.environ.get("CAMERA_INFERENCE_SIZES", "{}")
+        )
+    except json.JSONDecodeError:
+        print("Warning: Invalid CAMERA_INFERENCE_SIZES in .env file. Ignoring.")
+        CAMERA_INFERENCE_SIZES = {}
+
+    try:
+        AREA_INFERENCE_SIZES = json.loads(os.environ.get("AREA_INFERENCE_SIZES", "{}"))
+    except json.JSONDecodeError:
+        print("Warning: Invalid AREA_INFERENCE_SIZES in .env file. Ignoring.")
+        AREA_INFERENCE_SIZES = {}
+
+    # Video frames are sampled on media time (seconds), so variable-frame-rate
+    # files are handled correctly. VIDEO_SAMPLE_MODE is "grab" (skip decoding of
+    # unsampled frames) or "seek" (jump directly between samples).
+    VIDEO_SAMPLE_INTERVAL_SEC = float(os.environ.get("VIDEO_SAMPLE_INTERVAL_SEC", 1.0))
+    VIDEO_SAMPLE_MODE = os.environ.get("VIDEO_SAMPLE_MODE", "grab")
+    # Sampled video frames sent to the model per call. Higher values favour
+    # throughput on long uploads, 1 restores per-frame (lowest latency) inference.
+    VIDEO_BATCH_SIZE = int(os.environ.get("VIDEO_BATCH_SIZE", 16))
+
+    # Uploads are analysed by a background worker pool; these bound how many run
+    # at once and how many may wait before /upload starts rejecting new files.
+    UPLOAD_MAX_WORKERS = int(os.environ.get("UPLOAD_MAX_WORKERS", 2))
+    UPLOAD_MAX_PENDING_JOBS = int(os.environ.get("UPLOAD_MAX_PENDING_JOBS", 10))
+    UPLOAD_JOB_RETENTION_SEC = int(os.environ.get("UPLOAD_JOB_RETENTION_SEC", 3600))
+
+    # Live stream pipeline: MJPEG preview quality and the age after which a
+    # captured frame is considered stale and skipped by the inference stage.
+    STREAM_JPEG_QUALITY = int(os.environ.get("STREAM_JPEG_QUALITY", 80))
+    STREAM_MAX_FRAME_AGE_SEC = float(os.environ.get("STREAM_MAX_FRAME_AGE_SEC", 1.0))
+    # Each stream's analysed frame rate adapts between the min and max below: it
+    # backs off when inference latency exceeds STREAM_LATENCY_BUDGET_MS and is
+    # capped by the stream's fair share of STREAM_INFERENCE_BUDGET (seconds of
+    # model time per second, shared by all streams). The MJPEG preview runs
+    # independently at up to STREAM_PREVIEW_MAX_FPS with the latest detections.
+    STREAM_MIN_INFERENCE_FPS = float(os.environ.get("STREAM_MIN_INFERENCE_FPS", 0.5))
+    STREAM_MAX_INFERENCE_FPS = float(os.environ.get("STREAM_MAX_INFERENCE_FPS", 10))
+    STREAM_LATENCY_BUDGET_MS = float(os.environ.get("STREAM_LATENCY_BUDGET_MS", 500))
+    STREAM_INFERENCE_BUDGET = float(os.environ.get("STREAM_INFERENCE_BUDGET", 1.0))
+    STREAM_PREVIEW_MAX_FPS = float(os.environ.get("STREAM_PREVIEW_MAX_FPS", 15))
+
+    # Frames from all live streams are batched into one model call. A batch runs
+    # when LIVE_BATCH_MAX_SIZE frames are pending or LIVE_BATCH_MAX_WAIT_MS after
+    # the first one arrived. A size of 1 disables cross-stream batching.
+    LIVE_BATCH_MAX_SIZE = int(os.environ.get("LIVE_BATCH_MAX_SIZE", 8))
+    LIVE_BATCH_MAX_WAIT_MS = float(os.environ.get("LIVE_BATCH_MAX_WAIT_MS", 20))
+
+    # Violation tracking: detections of the same violation type overlapping by at
+    # least TRACK_IOU_THRESHOLD across frames form one event, which ends after it
+    # has not been seen for TRACK_MAX_AGE_SEC.
+    TRACK_IOU_THRESHOLD = float(os.environ.get("TRACK_IOU_THRESHOLD", 0.3))
+    TRACK_MAX_AGE_SEC = float(os.environ.get("TRACK_MAX_AGE_SEC", 5.0))
+
+    # Violations are written behind the detection loop by a dedicated thread,
+    # committed in batches of up to DB_WRITE_BATCH_SIZE rows or every
+    # DB_WRITE_FLUSH_INTERVAL_SEC seconds, whichever comes first.
+    DB_WRITE_BATCH_SIZE = int(os.environ.get("DB_WRITE_BATCH_SIZE", 200))
+    DB_WRITE_FLUSH_INTERVAL_SEC = float(
+        os.environ.get("DB_WRITE_FLUSH_INTERVAL_SEC", 1.0)
+    )
+    # SQLite connections stay open per thread, in WAL mode so reads never block
+    # writes. Writers wait up to DB_BUSY_TIMEOUT_MS for each other; each
+    # connection has a DB_CACHE_SIZE_MB page cache, memory-maps up to
+    # DB_MMAP_SIZE_MB of the file (0 = off) and caches DB_CACHED_STATEMENTS
+    # prepared statements.
+    DB_BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", 5000))
+    DB_CACHE_SIZE_MB = float(os.environ.get("DB_CACHE_SIZE_MB", 16))
+    DB_MMAP_SIZE_MB = int(os.environ.get("DB_MMAP_SIZE_MB", 256))
+    DB_CACHED_STATEMENTS = int(os.environ.get("DB_CACHED_STATEMENTS", 256))
+    # Rows per page of the violation log and /api/violations (at most 500).
+    VIOLATIONS_PAGE_SIZE = int(os.environ.get("VIOLATIONS_PAGE_SIZE", 50))
+    # Dashboard stats are cached for DASHBOARD_STATS_TTL_SEC seconds, or until a
+    # violation is added or changes status in this process (0 = recompute on
+    # every request). Unchanged dashboards are answered with 304 Not Modified.
+    DASHBOARD_STATS_TTL_SEC = float(os.environ.get("DASHBOARD_STATS_TTL_SEC", 30))
+
+    # Violation snapshots are annotated and encoded on a background pool. When
+    # SNAPSHOT_QUEUE_SIZE snapshots are pending, "drop" skips the image and
+    # "block" waits. A violation whose image is dropped or fails to save is
+    # neither logged nor notified. SNAPSHOT_MAX_WIDTH > 0 downscales wider
+    # frames before encoding.
+    SNAPSHOT_WORKERS = int(os.environ.get("SNAPSHOT_WORKERS", 2))
+    SNAPSHOT_QUEUE_SIZE = int(os.environ.get("SNAPSHOT_QUEUE_SIZE", 32))
+    SNAPSHOT_QUEUE_POLICY = os.environ.get("SNAPSHOT_QUEUE_POLICY", "drop")
+    SNAPSHOT_JPEG_QUALITY = int(os.environ.get("SNAPSHOT_JPEG_QUALITY", 90))
+    SNAPSHOT_MAX_WIDTH = int(os.environ.get("SNAPSHOT_MAX_WIDTH", 0))
+
+    # Motion gating: frames are compared to the last analysed one as grayscale
+    # thumbnails MOTION_GATE_WIDTH pixels wide. Unless more than
+    # MOTION_GATE_MIN_CHANGED_RATIO of the pixels changed by over
+    # MOTION_GATE_PIXEL_THRESHOLD (0-255), inference is skipped and the previous
+    # detections are reused, at most for MOTION_GATE_MAX_SKIP_SEC. A ratio of 0
+    # (the default) disables the gate; 0.005 suits fixed cameras.
+    MOTION_GATE_MIN_CHANGED_RATIO = float(
+        os.environ.get("MOTION_GATE_MIN_CHANGED_RATIO", 0)
+    )
+    MOTION_GATE_PIXEL_THRESHOLD = int(os.environ.get("MOTION_GATE_PIXEL_THRESHOLD", 25))
+    MOTION_GATE_WIDTH = int(os.environ.get("MOTION_GATE_WIDTH", 160))
+    MOTION_GATE_MAX_SKIP_SEC = float(os.environ.get("MOTION_GATE_MAX_SKIP_SEC", 10.0))
+
     ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "mp4", "avi", "mov", "webm"}
     MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100 MB limit
 
@@ -1,19 +1,121 @@
+import base64
+import binascii
 import datetime
+import json
 import logging
 import sqlite3
+import threading
 
+import click
 from flask import current_app, g
+from flask.cli import with_appcontext
 
 logger = logging.getLogger(__name__)
 
+INSERT_VIOLATION_SQL = """INSERT INTO violations (timestamp, equipment_type, image_path,
+               location, area_type, severity, track_id, last_seen)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
+UPDATE_LAST_SEEN_SQL = "UPDATE violations SET last_seen = ? WHERE track_id = ?"
+
+# Recomputes violation_rollups (see schema.sql) from the violations table. Each
+# value expression matches the one the rollup triggers use for the same row.
+REBUILD_ROLLUPS_SQL = """INSERT INTO violation_rollups (dimension, value, count)
+    SELECT 'equipment', equipment_type, COUNT(*) FROM violations GROUP BY 2
+    UNION ALL
+    SELECT 'severity', IFNULL(severity, ''), COUNT(*) FROM violations GROUP BY 2
+    UNION ALL
+    SELECT 'location', IFNULL(location, ''), COUNT(*) FROM violations GROUP BY 2
+    UNION ALL
+    SELECT 'status', status, COUNT(*) FROM violations GROUP BY 2
+    UNION ALL
+    SELECT 'day', IFNULL(DATE(timestamp), ''), COUNT(*) FROM violations
+    GROUP BY DATE(timestamp)"""
+
+
+def get_db_path(app=None):
+    app = app or current_app
+    return app.config["DATABASE_URL"].replace("sqlite:///", "")
+
+
+class ConnectionManager:
+    """
+    Keeps one SQLite connection per thread open for the life of the thread, so
+    requests, jobs and the write-behind thread stop paying for connect and
+    pragma setup on every use.
+
+    The database runs in WAL mode, where readers never block the writer and the
+    writer never blocks readers; concurrent writers wait up to
+    `busy_timeout_ms` for each other instead of failing with "database is
+    locked". `synchronous=NORMAL` is durable across application crashes in WAL
+    mode and only risks the last transactions on power loss. Each connection
+    gets a `cache_size_mb` page cache, memory-maps up to `mmap_size_mb` of the
+    file and keeps `cached_statements` prepared statements.
+
+    A connection is closed when its thread ends, or with `close()`.
+    """
+
+    def __init__(
+        self,
+        db_path,
+        busy_timeout_ms=5000,
+        cache_size_mb=16,
+        mmap_size_mb=256,
+        cached_statements=256,
+    ):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_mb = cache_size_mb
+        self.mmap_size_mb = mmap_size_mb
+        self.cached_statements = cached_statements
+        self.local = threading.local()
+        self.wal_enabled = False
+        self.lock = threading.Lock()
+
+    def connect(self):
+        """Returns this thread's connection, opening it on first use."""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self.local.conn = conn
+        return conn
+
+    def close(self):
+        """Closes this thread's connection, if it has one."""
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            self.local.conn = None
+            conn.close()
+            logger.debug(f"Database connection to {self.db_path} closed.")
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            timeout=self.busy_timeout_ms / 1000,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        with self.lock:
+            if not self.wal_enabled:
+                # Stored in the database file, so this is needed only once.
+                mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+                if mode != "wal":
+                    logger.warning(f"SQLite journal mode is '{mode}', not WAL.")
+                self.wal_enabled = True
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size={-int(self.cache_size_mb * 1024)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size_mb * 1024 * 1024)}")
+        logger.debug(
+            f"Database connection to {self.db_path} opened "
+            f"for thread {threading.current_thread().name}."
+        )
+        return conn
+
 
 def get_db():
     if "db" not in g:
         try:
-            db_path = current_app.config["DATABASE_URL"].replace("sqlite:///", "")
-            g.db = sqlite3.connect(db_path, detect_types=sqlite3.PARSE_DECLTYPES)
-            g.db.row_factory = sqlite3.Row
-            logger.info(f"Database connection established to {db_path}")
+            g.db = current_app.db_connections.connect()
         except sqlite3.Error as e:
             logger.error(f"Database connection error: {e}")
             raise e
@@ -21,10 +123,74 @@ def get_db():
 
 
 def close_db(e=None):
+    """
+    Ends the app context's use of the thread's connection, which stays open.
+    A transaction left open by a failed request is rolled back.
+    """
     db = g.pop("db", None)
-    if db is not None:
-        db.close()
-        logger.info("Database connection closed.")
+    if db is not None and db.in_transaction:
+        db.rollback()
+        logger.debug("Rolled back a transaction left open at teardown.")
+
+
+# Columns added after the initial schema; existing databases are migrated in place.
+VIOLATION_COLUMN_MIGRATIONS = {
+    "track_id": "TEXT",
+    "last_seen": "TIMESTAMP",
+}
+# Columns no longer in the schema, with the indexes that have to go before them.
+VIOLATION_RETIRED_COLUMNS = {
+    "day": ("idx_violations_day",),
+}
+
+
+def migrate_violations_table(db):
+    """Adds columns missing from an existing violations table and drops retired ones."""
+    existing = {row[1] for row in db.execute("PRAGMA table_info(violations)")}
+    if not existing:
+        return  # Fresh database, schema.sql creates the full table.
+    for column, column_type in VIOLATION_COLUMN_MIGRATIONS.items():
+        if column not in existing:
+            db.execute(f"ALTER TABLE violations ADD COLUMN {column} {column_type}")
+            logger.info(f"Migrated violations table: added column '{column}'.")
+    for column, indexes in VIOLATION_RETIRED_COLUMNS.items():
+        if column in existing:
+            for index in indexes:
+                db.execute(f"DROP INDEX IF EXISTS {index}")
+            db.execute(f"ALTER TABLE violations DROP COLUMN {column}")
+            logger.info(f"Migrated violations table: dropped column '{column}'.")
+    db.commit()
+
+
+def table_exists(db, name):
+    row = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone()
+    return row is not None
+
+
+def rebuild_violation_rollups(db):
+    """Recomputes the stats rollups from the violations table in one transaction."""
+    try:
+        db.execute("DELETE FROM violation_rollups")
+        db.execute(REBUILD_ROLLUPS_SQL)
+        db.commit()
+    except sqlite3.Error:
+        db.rollback()
+        raise
+    return db.execute("SELECT COUNT(*) FROM violation_rollups").fetchone()[0]
+
+
+def apply_schema(db, script):
+    """Migrates an existing database and applies schema.sql to it."""
+    migrate_violations_table(db)
+    # Databases created before the rollups existed need them filled once.
+    rollups_missing = not table_exists(db, "violation_rollups")
+    db.executescript(script)
+    logger.info("Database schema initialized/updated.")
+    if rollups_missing:
+        groups = rebuild_violation_rollups(db)
+        logger.info(f"Built violation stats rollups ({groups} groups).")
 
 
 def init_db():
@@ -34,8 +200,7 @@ def init_db():
             # Check if script content exists before executing
             script = f.read().decode("utf8")
             if script:
-                db.executescript(script)
-                logger.info("Database schema initialized/updated.")
+                apply_schema(db, script)
             else:
                 logger.warning("schema.sql is empty or could not be read.")
     except FileNotFoundError:
@@ -59,7 +224,9 @@ def create_tables_directly(db):
              location TEXT,
              area_type TEXT,
              severity TEXT,
-             status TEXT DEFAULT 'unresolved' NOT NULL
+             status TEXT DEFAULT 'unresolved' NOT NULL,
+             track_id TEXT,
+             last_seen TIMESTAMP
          )
          """
         )
@@ -70,6 +237,13 @@ def create_tables_directly(db):
         db.rollback()
 
 
+def stats_changed():
+    """Drops the cached dashboard stats after a change to violations."""
+    cache = getattr(current_app, "stats_cache", None)
+    if cache is not None:
+        cache.invalidate()
+
+
 def add_violation(
     timestamp: datetime.datetime,
     equipment_type: str,
@@ -77,31 +251,124 @@ def add_violation(
     location: str,
     area_type: str,
     severity: str,
+    track_id: str = None,
 ):
     db = get_db()
     try:
         db.execute(
-            """INSERT INTO violations (timestamp, equipment_type, image_path, location, area_type, severity)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (timestamp, equipment_type, image_path, location, area_type, severity),
+            INSERT_VIOLATION_SQL,
+            (
+                timestamp,
+                equipment_type,
+                image_path,
+                location,
+                area_type,
+                severity,
+                track_id,
+                timestamp,
+            ),
         )
         db.commit()
+        stats_changed()
         logger.info(f"Added violation: {equipment_type} at {location}")
     except sqlite3.Error as e:
         logger.error(f"Error adding violation to database: {e}")
         db.rollback()
 
 
-def get_all_violations(limit=100):
+# Columns the violation log and API show; `SELECT *` would also read the rest.
+VIOLATION_LIST_COLUMNS = (
+    "id, timestamp, equipment_type, image_path, location, area_type, severity, "
+    "status, last_seen"
+)
+VIOLATION_STATUSES = ("unresolved", "investigating", "resolved")
+# Filters applied as `column = ?` by query_violations.
+VIOLATION_FILTERS = ("status", "severity", "location", "equipment_type")
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(row):
+    """Opaque cursor pointing just past `row` in (timestamp, id) DESC order."""
+    # str() of a datetime matches how sqlite3 stores it, so comparisons line up.
+    payload = json.dumps([str(row["timestamp"]), row["id"]]).encode("utf8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Returns (timestamp, id) from a cursor; ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(timestamp), int(row_id)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def build_violations_query(filters=None, since=None, until=None, cursor=None, limit=50):
+    """
+    SQL and parameters for one page of query_violations(), fetching one row
+    more than `limit` to tell whether another page follows.
+    """
+    conditions, params = [], []
+    for column, value in (filters or {}).items():
+        if column not in VIOLATION_FILTERS:
+            raise ValueError(f"Unknown filter: {column}")
+        conditions.append(f"{column} = ?")
+        params.append(value)
+    if since is not None:
+        conditions.append("timestamp >= ?")
+        params.append(since)
+    if until is not None:
+        conditions.append("timestamp < ?")
+        params.append(until)
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        # Spelled out rather than as a row value so the timestamp index bounds it.
+        conditions.append("timestamp <= ? AND (timestamp < ? OR id < ?)")
+        params.extend([timestamp, timestamp, row_id])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = f"""SELECT {VIOLATION_LIST_COLUMNS} FROM violations {where}
+                ORDER BY timestamp DESC, id DESC LIMIT ?"""
+    return sql, (*params, limit + 1)
+
+
+def query_violations(filters=None, since=None, until=None, cursor=None, limit=50):
+    """
+    One page of violations, newest first, using keyset pagination on
+    (timestamp, id): each page starts right after the `cursor` of the previous
+    one, so the cost per page does not grow with how far back it is. With a
+    filter, the matching (column, timestamp) index serves the filter, the time
+    range and the order at once.
+
+    `filters` maps VIOLATION_FILTERS columns to required values; `since` and
+    `until` bound the timestamp (inclusive and exclusive). Returns the rows and
+    the cursor of the next page (None on the last page). Raises ValueError for
+    an unknown filter or a malformed cursor.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    sql, params = build_violations_query(filters, since, until, cursor, limit)
     db = get_db()
     try:
-        cursor = db.execute(
-            "SELECT * FROM violations ORDER BY timestamp DESC LIMIT ?", (limit,)
-        )
-        violations = cursor.fetchall()
-        return violations
+        rows = db.execute(sql, params).fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"Error querying violations: {e}")
+        return [], None
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def get_filter_values(dimension):
+    """Distinct values recorded for a rollup dimension, e.g. 'location'."""
+    db = get_db()
+    try:
+        rows = db.execute(
+            """SELECT value FROM violation_rollups
+               WHERE dimension = ? AND count > 0 AND value != '' ORDER BY value""",
+            (dimension,),
+        ).fetchall()
+        return [row["value"] for row in rows]
     except sqlite3.Error as e:
-        logger.error(f"Error fetching violations: {e}")
+        logger.error(f"Error fetching {dimension} values: {e}")
         return []
 
 
@@ -117,8 +384,7 @@ def get_violation_by_id(violation_id):
 
 def update_violation_status(violation_id, status):
     db = get_db()
-    allowed_statuses = ["resolved", "unresolved", "investigating"]
-    if status not in allowed_statuses:
+    if status not in VIOLATION_STATUSES:
         logger.warning(f"Invalid status '{status}' provided for violation update.")
         return False
 
@@ -132,6 +398,7 @@ def update_violation_status(violation_id, status):
                 f"Attempted to update status for non-existent violation ID: {violation_id}"
             )
             return False
+        stats_changed()
         logger.info(f"Updated status for violation {violation_id} to {status}")
         return True
     except sqlite3.Error as e:
@@ -140,52 +407,44 @@ def update_violation_status(violation_id, status):
         return False
 
 
+# Columns of the stats lists and how each is ordered, per rollup dimension.
+STATS_ROLLUPS = {
+    "by_equipment": ("equipment", "equipment_type", "count DESC"),
+    "by_severity": (
+        "severity",
+        "severity",
+        "CASE value WHEN 'high' THEN 1 WHEN 'medium' THEN 2 WHEN 'low' THEN 3 "
+        "ELSE 4 END",
+    ),
+    "by_location": ("location", "location", "count DESC"),
+    "by_status": ("status", "status", "count DESC"),
+}
+
+
 def get_violation_stats():
+    """
+    Dashboard statistics, read from the violation_rollups table so the cost
+    depends on the number of groups rather than the number of violations.
+    """
     db = get_db()
     stats = {}
     try:
-        # By Equipment Type
-        cursor = db.execute(
-            """
-            SELECT equipment_type, COUNT(*) as count
-            FROM violations
-            GROUP BY equipment_type ORDER BY count DESC
-        """
-        )
-        stats["by_equipment"] = [dict(row) for row in cursor.fetchall()]
-
-        # By Severity
-        cursor = db.execute(
-            """
-            SELECT severity, COUNT(*) as count FROM violations
-            GROUP BY severity ORDER BY CASE severity WHEN 'high' THEN 1 WHEN 'medium' THEN 2 WHEN 'low' THEN 3 ELSE 4 END
-        """
-        )
-        stats["by_severity"] = [dict(row) for row in cursor.fetchall()]
-
-        # By Location
-        cursor = db.execute(
-            """
-            SELECT location, COUNT(*) as count FROM violations GROUP BY location ORDER BY count DESC
-        """
-        )
-        stats["by_location"] = [dict(row) for row in cursor.fetchall()]
-
-        # By Status
-        cursor = db.execute(
-            """
-            SELECT status, COUNT(*) as count FROM violations GROUP BY status ORDER BY count DESC
-        """
-        )
-        stats["by_status"] = [dict(row) for row in cursor.fetchall()]
+        for key, (dimension, column, order) in STATS_ROLLUPS.items():
+            cursor = db.execute(
+                f"""
+                SELECT NULLIF(value, '') AS {column}, count FROM violation_rollups
+                WHERE dimension = ? AND count > 0 ORDER BY {order}
+            """,
+                (dimension,),
+            )
+            stats[key] = [dict(row) for row in cursor.fetchall()]
 
         # Daily Trend (Last 30 days)
         cursor = db.execute(
             """
-            SELECT DATE(timestamp) as day, COUNT(*) as count
-            FROM violations
-            WHERE timestamp >= DATE('now', '-30 days')
-            GROUP BY day ORDER BY day ASC
+            SELECT value AS day, count FROM violation_rollups
+            WHERE dimension = 'day' AND value >= DATE('now', '-30 days') AND count > 0
+            ORDER BY day ASC
         """
         )
         stats["daily_trend"] = [dict(row) for row in cursor.fetchall()]
@@ -204,6 +463,22 @@ def get_violation_stats():
         }
 
 
+@click.command("rebuild-stats")
+@with_appcontext
+def rebuild_stats_command():
+    """Recomputes the dashboard stats rollups from the violations table."""
+    groups = rebuild_violation_rollups(get_db())
+    print(f"Rebuilt violation stats rollups ({groups} groups).")
+
+
 def init_app(app):
+    app.db_connections = ConnectionManager(
+        get_db_path(app),
+        busy_timeout_ms=app.config.get("DB_BUSY_TIMEOUT_MS", 5000),
+        cache_size_mb=app.config.get("DB_CACHE_SIZE_MB", 16),
+        mmap_size_mb=app.config.get("DB_MMAP_SIZE_MB", 256),
+        cached_statements=app.config.get("DB_CACHED_STATEMENTS", 256),
+    )
     app.teardown_appcontext(close_db)
+    app.cli.add_command(rebuild_stats_command)
     # No need to call init_db() here, let's call it explicitly in run.py or via a CLI command
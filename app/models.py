@@ -19,6 +19,7 @@ class Violation:
         area_type,
         severity,
         status,
+        last_seen=None,
     ):
         self.id = id
         self.timestamp = timestamp
@@ -35,10 +36,57 @@ class Violation:
         self.area_type = area_type
         self.severity = severity
         self.status = status
+        self.last_seen = last_seen
 
     def __repr__(self):
         return f"<Violation {self.id} - {self.equipment_type} at {self.timestamp}>"
 
+    @classmethod
+    def from_row(cls, row):
+        return cls(
+            id=row["id"],
+            timestamp=row["timestamp"],
+            equipment_type=row["equipment_type"],
+            image_path=row["image_path"],
+            location=row["location"],
+            area_type=row["area_type"],
+            severity=row["severity"],
+            status=row["status"],
+            last_seen=row["last_seen"],
+        )
+
+    def to_dict(self):
+        def iso(value):
+            return value.isoformat() if isinstance(value, datetime.datetime) else value
+
+        return {
+            "id": self.id,
+            "timestamp": iso(self.timestamp),
+            "equipment_type": self.equipment_type,
+            "location": self.location,
+            "area_type": self.area_type,
+            "severity": self.severity,
+            "status": self.status,
+            "last_seen": iso(self.last_seen),
+            "duration_seconds": self.duration_seconds,
+            "image_path": self.image_path,
+        }
+
+    @property
+    def image_filename(self):
+        """File name of the snapshot within VIOLATION_IMAGE_FOLDER."""
+        return os.path.basename(self.image_path) if self.image_path else None
+
+    @property
+    def duration_seconds(self):
+        """Seconds a tracked violation stayed in view, or None for single-frame events."""
+        if not isinstance(self.last_seen, datetime.datetime) or not isinstance(
+            self.timestamp, datetime.datetime
+        ):
+            return None
+        seconds = (self.last_seen - self.timestamp).total_seconds()
+        return seconds if seconds >= 1 else None
+
     @property
     def formatted_timestamp(self):
         ts = self.timestamp
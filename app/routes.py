@@ -1,21 +1,29 @@
+import datetime
 import logging
 import os
+import uuid
 
 from flask import (
     Blueprint,
+    Response,
     current_app,
     flash,
     jsonify,
+    make_response,
     redirect,
     render_template,
     request,
+    session,
     url_for,
 )
 from flask_login import current_user, login_required
+from werkzeug.http import is_resource_modified
 from werkzeug.utils import secure_filename
 
 from . import database as db
 from .models import Violation
+from .services import notification_service
+from .services.stream_pipeline import StreamPipeline, error_frame_jpeg
 
 # from .services.detection_service import detection_service # its global no import
 
@@ -44,156 +52,312 @@ def index():
     return render_template("index.html", title="PPE Detection Upload")
 
 
+def wants_json_response():
+    """True for fetch/XHR clients that asked for JSON instead of an HTML redirect."""
+    return request.accept_mimetypes.best == "application/json"
+
+
+def upload_error(message, category, status=400):
+    if wants_json_response():
+        return jsonify({"status": "error", "message": message}), status
+    flash(message, category)
+    return redirect(url_for("main.index"))
+
+
 @main_bp.route("/upload", methods=["POST"])
 def upload_and_process():
-    """Handles file uploads and initiates processing."""
+    """Saves the upload and queues it for background processing."""
     if "file" not in request.files:
-        flash("No file part in the request.", "error")
-        return redirect(request.url)
+        return upload_error("No file part in the request.", "error")
 
     file = request.files["file"]
     location = request.form.get("location", "Default Site")
     area_type = request.form.get("area_type", "default")
 
     if file.filename == "":
-        flash("No file selected for upload.", "warning")
-        return redirect(url_for("main.index"))
+        return upload_error("No file selected for upload.", "warning")
 
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(current_app.config["UPLOAD_FOLDER"], filename)
+    if not (file and allowed_file(file.filename)):
+        return upload_error("File type not allowed.", "warning")
 
-        try:
-            file.save(filepath)
-            logger.info(
-                f"File '{filename}' saved to '{filepath}'. Initiating processing."
-            )
+    if not current_app.detection_loader.available:
+        return upload_error(
+            "Detection is not available on this server.", "warning", 503
+        )
 
-            # Determine file type and process
-            _, extension = os.path.splitext(filename)
-            extension = extension.lower()
-            results = None
-
-            # Access detection service via current_app
-            detection_service = current_app.detection_service
-
-            if extension in [".jpg", ".jpeg", ".png"]:
-                results = detection_service.process_image(filepath, location, area_type)
-                result_type = "image"
-            elif extension in [".mp4", ".avi", ".mov", ".webm"]:
-                results = detection_service.process_video(filepath, location, area_type)
-                result_type = "video"
-            else:
-                flash("Unsupported file type.", "error")
-                return redirect(url_for("main.index"))
-
-            # Clean up uploaded file
+    filename = secure_filename(file.filename)
+    _, extension = os.path.splitext(filename)
+    extension = extension.lower()
+    if extension in [".jpg", ".jpeg", ".png"]:
+        media_type = "image"
+    elif extension in [".mp4", ".avi", ".mov", ".webm"]:
+        media_type = "video"
+    else:
+        return upload_error("Unsupported file type.", "error")
+
+    # Uploads are processed asynchronously, so give each saved file a unique name.
+    filepath = os.path.join(
+        current_app.config["UPLOAD_FOLDER"], f"{uuid.uuid4().hex}_{filename}"
+    )
+
+    try:
+        file.save(filepath)
+        logger.info(f"File '{filename}' saved to '{filepath}'. Queueing processing.")
+    except Exception as e:
+        logger.exception(f"Error saving uploaded file: {e}")
+        if os.path.exists(filepath):
             try:
                 os.remove(filepath)
-                logger.info(f"Cleaned up uploaded file: {filepath}")
-            except OSError as e:
-                logger.error(f"Error removing uploaded file {filepath}: {e}")
-
-            # Check results and provide feedback
-            if results and "error" in results:
-                flash(f"Processing Error: {results['error']}", "error")
-                return redirect(url_for("main.index"))
-
-            violation_count = (
-                results.get("total_violations", len(results.get("violations", [])))
-                if result_type == "video"
-                else len(results.get("violations", []))
-            )
+            except OSError:
+                pass
+        return upload_error(
+            "An unexpected error occurred while saving the upload.", "danger", 500
+        )
 
-            if violation_count > 0:
-                flash(
-                    f"Processing complete. {violation_count} violation(s) detected and logged.",
-                    "success",
-                )
-            else:
-                flash("Processing complete. No violations detected.", "info")
-
-            # Redirect to violations page to see the results
-            return redirect(url_for("main.violations_log"))
-
-        except Exception as e:
-            logger.exception(f"Error during file upload or processing: {e}")
-            flash("An unexpected error occurred during processing.", "danger")
-            # Clean up partial uploads
-            if os.path.exists(filepath):
-                try:
-                    os.remove(filepath)
-                except OSError:
-                    pass
-            return redirect(url_for("main.index"))
+    job = current_app.job_manager.submit(filepath, media_type, location, area_type)
+    if job is None:
+        try:
+            os.remove(filepath)
+        except OSError:
+            pass
+        return upload_error(
+            "The processing queue is full. Please try again in a few minutes.",
+            "warning",
+            503,
+        )
 
-    else:
-        flash("File type not allowed.", "warning")
-        return redirect(url_for("main.index"))
+    if wants_json_response():
+        return (
+            jsonify(
+                {
+                    "status": "queued",
+                    "job_id": job.id,
+                    "status_url": url_for("main.job_status", job_id=job.id),
+                    "result_url": url_for("main.job_result", job_id=job.id),
+                    "cancel_url": url_for("main.cancel_job", job_id=job.id),
+                }
+            ),
+            202,
+        )
+
+    flash(
+        f"'{filename}' queued for analysis (job {job.id}). "
+        "Results will appear in the Violation Log.",
+        "info",
+    )
+    return redirect(url_for("main.violations_log"))
+
+
+@main_bp.route("/jobs/<job_id>")
+def job_status(job_id):
+    """Returns status and progress of an upload processing job."""
+    job = current_app.job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found."}), 404
+    return jsonify(job.to_dict())
+
+
+@main_bp.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    """Returns the detection results of a finished job."""
+    job = current_app.job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found."}), 404
+    if not job.finished:
+        return (
+            jsonify(
+                {
+                    "status": "error",
+                    "message": f"Job is {job.status}.",
+                    "job": job.to_dict(),
+                }
+            ),
+            409,
+        )
+    return jsonify({"job": job.to_dict(), "result": job.result})
+
+
+@main_bp.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    """Requests cancellation of a queued or running job."""
+    if not current_app.job_manager.cancel(job_id):
+        return (
+            jsonify(
+                {
+                    "status": "error",
+                    "message": f"Job {job_id} not found or already finished.",
+                }
+            ),
+            404,
+        )
+    return jsonify({"status": "success", "message": f"Job {job_id} cancelling."})
+
+
+EMPTY_STATS = {
+    "by_equipment": [],
+    "by_severity": [],
+    "by_location": [],
+    "by_status": [],
+    "daily_trend": [],
+}
 
 
 @main_bp.route("/dashboard")
 def dashboard():
-    """Displays statistics and charts."""
+    """
+    Displays statistics and charts. The stats come from the shared cache, and
+    browsers revalidating an unchanged dashboard get 304 without a re-render.
+    """
     try:
-        stats_data = db.get_violation_stats()
+        cached = current_app.stats_cache.get(db.get_violation_stats)
+        stats_data = cached.stats
         if "error" in stats_data:
             flash(f"Error fetching statistics: {stats_data['error']}", "danger")
             # Provide empty data structure to avoid template errors
-            stats_data = {
-                "by_equipment": [],
-                "by_severity": [],
-                "by_location": [],
-                "by_status": [],
-                "daily_trend": [],
-            }
-
-        # Pass raw data to template for Chart.js
-        return render_template("dashboard.html", title="Dashboard", stats=stats_data)
+            return render_template(
+                "dashboard.html", title="Dashboard", stats=EMPTY_STATS
+            )
+
+        # The page also shows the user and any pending flash messages.
+        etag = f"{cached.etag}-{current_user.get_id()}"
+        pending_flashes = bool(session.get("_flashes"))
+        if not pending_flashes and not is_resource_modified(
+            request.environ, etag=etag, last_modified=cached.last_modified
+        ):
+            response = Response(status=304)
+        else:
+            # Pass raw data to template for Chart.js
+            response = make_response(
+                render_template("dashboard.html", title="Dashboard", stats=stats_data)
+            )
+        response.set_etag(etag)
+        response.last_modified = cached.last_modified
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
     except Exception as e:
         logger.exception("Error loading dashboard data.")
         flash("Could not load dashboard statistics.", "danger")
         # Pass empty data on general exception
-        return render_template(
-            "dashboard.html",
-            title="Dashboard",
-            stats={
-                "by_equipment": [],
-                "by_severity": [],
-                "by_location": [],
-                "by_status": [],
-                "daily_trend": [],
-            },
-        )
+        return render_template("dashboard.html", title="Dashboard", stats=EMPTY_STATS)
+
+
+def parse_time_bound(value, end_of_day=False):
+    """
+    Parses an ISO date or datetime query parameter into a naive local datetime,
+    as timestamps are stored. A bare date used as an upper bound means the end
+    of that day.
+    """
+    if not value:
+        return None
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    if end_of_day and len(value) == 10:
+        parsed += datetime.timedelta(days=1)
+    return parsed
+
+
+def violation_query_args(args):
+    """
+    Builds query_violations() arguments from the request's query string:
+    status, severity, location, equipment_type, since, until, cursor and
+    limit. Raises ValueError on invalid values.
+    """
+    filters = {
+        column: args[column] for column in db.VIOLATION_FILTERS if args.get(column)
+    }
+    status = filters.get("status")
+    if status is not None and status not in db.VIOLATION_STATUSES:
+        raise ValueError(f"Invalid status: {status}")
+    try:
+        since = parse_time_bound(args.get("since"))
+        until = parse_time_bound(args.get("until"), end_of_day=True)
+    except ValueError as e:
+        raise ValueError(f"Invalid date: {e}") from e
+    limit = args.get(
+        "limit", current_app.config.get("VIOLATIONS_PAGE_SIZE", 50), type=int
+    )
+    return {
+        "filters": filters,
+        "since": since,
+        "until": until,
+        "cursor": args.get("cursor"),
+        "limit": limit,
+    }
 
 
 @main_bp.route("/violations")
 def violations_log():
-    """Displays the list of recorded violations."""
+    """Displays one page of recorded violations, filtered by the query string."""
+    filter_options = {
+        "statuses": db.VIOLATION_STATUSES,
+        "severities": db.get_filter_values("severity"),
+        "locations": db.get_filter_values("location"),
+        "equipment_types": db.get_filter_values("equipment"),
+    }
+    # The current filters without the cursor, for the pager and the filter form.
+    params = {key: value for key, value in request.args.items() if value}
+    params.pop("cursor", None)
     try:
-        violations_raw = db.get_all_violations(limit=200)  # Get more for display
-        # Map raw rows to Violation objects for easier template access
-        violations = [
-            Violation(
-                id=row["id"],
-                timestamp=row["timestamp"],
-                equipment_type=row["equipment_type"],
-                image_path=row["image_path"],
-                location=row["location"],
-                area_type=row["area_type"],
-                severity=row["severity"],
-                status=row["status"],
-            )
-            for row in violations_raw
-        ]
+        rows, next_cursor = db.query_violations(**violation_query_args(request.args))
+        violations = [Violation.from_row(row) for row in rows]
 
         return render_template(
-            "violations.html", title="Violation Log", violations=violations
+            "violations.html",
+            title="Violation Log",
+            violations=violations,
+            next_cursor=next_cursor,
+            params=params,
+            paged=bool(request.args.get("cursor")),
+            **filter_options,
         )
+    except ValueError as e:
+        flash(str(e), "warning")
     except Exception as e:
         logger.exception("Error loading violations log.")
         flash("Could not load violation log.", "danger")
-        return render_template("violations.html", title="Violation Log", violations=[])
+    return render_template(
+        "violations.html",
+        title="Violation Log",
+        violations=[],
+        next_cursor=None,
+        params=params,
+        paged=False,
+        **filter_options,
+    )
+
+
+@main_bp.route("/api/violations")
+def violations_api():
+    """
+    Violations as JSON, newest first, filtered in SQL. Pass `next_cursor` from
+    the response as `cursor` to get the following page.
+    """
+    try:
+        query = violation_query_args(request.args)
+        rows, next_cursor = db.query_violations(**query)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    violations = []
+    for row in rows:
+        violation = Violation.from_row(row)
+        record = violation.to_dict()
+        del record["image_path"]
+        record["image_url"] = (
+            url_for("serve_violation_image", filename=violation.image_filename)
+            if violation.image_filename
+            else None
+        )
+        violations.append(record)
+    return jsonify(
+        {
+            "violations": violations,
+            "count": len(violations),
+            "next_cursor": next_cursor,
+        }
+    )
 
 
 @main_bp.route("/violations/update/<int:violation_id>", methods=["POST"])
@@ -201,9 +365,13 @@ def violations_log():
 def update_violation_status_route(violation_id):
     """Updates the status of a specific violation."""
     new_status = request.form.get("status")
+    # Back to the page (filters and cursor) the form was submitted from.
+    next_url = request.form.get("next", "")
+    if not next_url.startswith("/violations"):
+        next_url = url_for("main.violations_log")
     if not new_status:
         flash("No status provided for update.", "warning")
-        return redirect(url_for("main.violations_log"))
+        return redirect(next_url)
 
     try:
         success = db.update_violation_status(violation_id, new_status)
@@ -220,97 +388,66 @@ def update_violation_status_route(violation_id):
         logger.exception(f"Error updating status for violation {violation_id}.")
         flash("An error occurred while updating violation status.", "danger")
 
-    return redirect(url_for("main.violations_log"))
+    return redirect(next_url)
 
 
-active_streams = {}
+active_streams = {}  # stream_id -> StreamPipeline
 stream_frame_generators = {}
 
 
-def generate_stream_frames(stream_url, stream_id, area_type):
+def mjpeg_part(jpeg_bytes):
+    return b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + jpeg_bytes + b"\r\n"
+
+
+def generate_stream_frames(app, stream_url, stream_id, area_type):
     """
-    Generator function to capture frames from a live stream, process them,
-    and yield them as JPEG bytes for MJPEG streaming.
+    Generator that runs the capture / inference / encode pipeline for a live
+    stream and yields its JPEG frames for MJPEG streaming.
     """
-    cap = None
-    detection_service = current_app.detection_service
-    stream_label = f"Stream_{stream_id}"
+    detection_service = app.detection_loader.get(
+        timeout=app.config["DETECTION_WAIT_SEC"]
+    )
+    if detection_service is None:
+        stream_frame_generators.pop(stream_id, None)
+        jpeg = error_frame_jpeg("Error: Detection model not available.")
+        if jpeg:
+            yield mjpeg_part(jpeg)
+        return
+
+    pipeline = StreamPipeline(
+        app,
+        detection_service,
+        stream_url,
+        stream_id,
+        area_type=area_type,
+        jpeg_quality=app.config["STREAM_JPEG_QUALITY"],
+        max_frame_age_sec=app.config["STREAM_MAX_FRAME_AGE_SEC"],
+        min_fps=app.config["STREAM_MIN_INFERENCE_FPS"],
+        max_fps=app.config["STREAM_MAX_INFERENCE_FPS"],
+        latency_budget_sec=app.config["STREAM_LATENCY_BUDGET_MS"] / 1000.0,
+        preview_max_fps=app.config["STREAM_PREVIEW_MAX_FPS"],
+    )
+    active_streams[stream_id] = pipeline
 
     try:
-        logger.info(f"Attempting to connect to stream ({stream_id}): {stream_url}")
-        cap = cv2.VideoCapture(stream_url)
-        active_streams[stream_id] = cap  # Store the capture object
-
-        if not cap.isOpened():
-            logger.error(f"Cannot open stream ({stream_id}): {stream_url}")
-            # Yield a placeholder image or error message
-            # For simplicity, we'll just let the loop not run / break
-            error_msg = "Error: Could not connect to stream."
-            frame = np.zeros((480, 640, 3), dtype=np.uint8)
-            cv2.putText(
-                frame,
-                error_msg,
-                (50, 240),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                1,
-                (255, 255, 255),
-                2,
-            )
-            (flag, encodedImage) = cv2.imencode(".jpg", frame)
-            if flag:
-                yield (
-                    b"--frame\r\n"
-                    b"Content-Type: image/jpeg\r\n\r\n"
-                    + bytearray(encodedImage)
-                    + b"\r\n"
-                )
+        pipeline.start()
+        if not pipeline.wait_until_connected():
+            jpeg = error_frame_jpeg("Error: Could not connect to stream.")
+            if jpeg:
+                yield mjpeg_part(jpeg)
             return
 
         logger.info(
-            f"Successfully connected to stream ({stream_id}): {stream_url}. Starting frame generation."
+            f"Stream ({stream_id}) pipeline running. Starting frame generation."
         )
-        frame_time_offset = 0  # Simple counter or time tracker
-        last_processed_time = time.time()
-
-        while cap.isOpened() and stream_id in active_streams:
-            ret, frame = cap.read()
-            if not ret:
-                logger.warning(f"Stream ({stream_id}) ended or frame not read.")
-                break
-
-            # Throttle processing to avoid overwhelming CPU if desired, e.g., 5 FPS
-            # current_time = time.time()
-            # if current_time - last_processed_time < 0.2: # (1/5 FPS)
-            #     time.sleep(0.05) # Small sleep
-            #     continue
-            # last_processed_time = current_time
-
-            annotated_frame, violations = detection_service.process_live_stream_frame(
-                frame,
-                stream_url_label=stream_label,
-                area_type=area_type,
-                frame_time_offset=frame_time_offset,
-            )
-            frame_time_offset += 1
-
-            (flag, encodedImage) = cv2.imencode(".jpg", annotated_frame)
-            if not flag:
-                logger.warning(
-                    f"Stream ({stream_id}): JPEG encoding failed for a frame."
-                )
-                continue
-
-            yield (
-                b"--frame\r\n"
-                b"Content-Type: image/jpeg\r\n\r\n" + bytearray(encodedImage) + b"\r\n"
-            )
+        for jpeg in pipeline.frames():
+            yield mjpeg_part(jpeg)
 
     except Exception as e:
         logger.exception(f"Exception in stream ({stream_id}) generator: {e}")
     finally:
-        if cap and cap.isOpened():
-            cap.release()
-        if stream_id in active_streams:
+        pipeline.stop()
+        if active_streams.get(stream_id) is pipeline:
             del active_streams[stream_id]
         if stream_id in stream_frame_generators:
             del stream_frame_generators[stream_id]
@@ -329,11 +466,40 @@ def video_feed(stream_id):
 
     logger.info(f"Serving video_feed for stream_id: {stream_id}")
     return Response(
-        stream_frame_generators[stream_id](),
+        stream_frame_generators[stream_id](current_app._get_current_object()),
         mimetype="multipart/x-mixed-replace; boundary=frame",
     )
 
 
+@main_bp.route("/streams/<stream_id>/stats")
+@login_required
+def stream_stats(stream_id):
+    """Reports per-stage FPS, drops and latency of a running stream."""
+    pipeline = active_streams.get(stream_id)
+    if pipeline is None:
+        return (
+            jsonify({"status": "error", "message": f"Stream {stream_id} not running."}),
+            404,
+        )
+    stats = pipeline.stats()
+    motion = pipeline.detection_service.motion_stats(pipeline.stream_label)
+    if motion is not None:
+        stats["motion_gate"] = motion
+    scheduler = pipeline.detection_service.scheduler
+    if scheduler is not None:
+        stats["scheduler"] = scheduler.stats()
+    return jsonify(stats)
+
+
+@main_bp.route("/notifications/stats")
+def notification_stats():
+    """Reports notification queue depth, delivery counts and send latency."""
+    stats = notification_service.get_dispatcher().stats()
+    if current_app.config.get("NOTIFICATION_MODE") == "digest":
+        stats["digest"] = notification_service.get_coalescer().stats()
+    return jsonify(stats)
+
+
 @main_bp.route("/start_stream", methods=["POST"])
 @login_required
 def start_stream():
@@ -345,6 +511,17 @@ def start_stream():
     if not data or "stream_url" not in data:
         return jsonify({"status": "error", "message": "stream_url not provided"}), 400
 
+    if not current_app.detection_loader.available:
+        return (
+            jsonify(
+                {
+                    "status": "error",
+                    "message": "Detection is not available on this server.",
+                }
+            ),
+            503,
+        )
+
     stream_url = data["stream_url"]
     area_type = data.get("area_type", "default")
     # Validate stream_url format (basic check)
@@ -367,12 +544,10 @@ def start_stream():
                 400,
             )
 
-    import uuid
-
     stream_id = str(uuid.uuid4())
 
-    stream_frame_generators[stream_id] = lambda: generate_stream_frames(
-        stream_url, stream_id, area_type
+    stream_frame_generators[stream_id] = lambda app: generate_stream_frames(
+        app, stream_url, stream_id, area_type
     )
 
     logger.info(
@@ -392,9 +567,8 @@ def start_stream():
 def stop_stream(stream_id):
     """API endpoint to stop an active stream."""
     if stream_id in active_streams:
-        cap = active_streams.pop(stream_id)
-        if cap and cap.isOpened():
-            cap.release()
+        pipeline = active_streams.pop(stream_id)
+        pipeline.stop()
         if stream_id in stream_frame_generators:
             del stream_frame_generators[stream_id]
         logger.info(f"Stream {stream_id} stopped by user request.")
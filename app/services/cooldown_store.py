@@ -0,0 +1,171 @@
+import abc
+import collections
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CooldownStore(abc.ABC):
+    """
+    Tracks when a notification key last fired. `acquire` is an atomic
+    check-and-set: it returns True (and records `now`) only if the key has not
+    fired within `cooldown_sec`.
+    """
+
+    @abc.abstractmethod
+    def acquire(self, key, cooldown_sec, now=None):
+        pass
+
+    @abc.abstractmethod
+    def release(self, key):
+        """Forgets `key`, e.g. when the notification it guarded was not sent."""
+
+    @abc.abstractmethod
+    def __len__(self):
+        pass
+
+    @staticmethod
+    def _key(key):
+        if isinstance(key, tuple):
+            return "\x1f".join(str(part) for part in key)
+        return str(key)
+
+
+class MemoryCooldownStore(CooldownStore):
+    """
+    Per-process store. Entries expire after `ttl_sec` and the least recently
+    fired entries are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, ttl_sec=3600, max_entries=10000):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()  # key -> last fired, oldest first
+        self.lock = threading.Lock()
+
+    def acquire(self, key, cooldown_sec, now=None):
+        key = self._key(key)
+        now = time.time() if now is None else now
+        with self.lock:
+            last = self.entries.get(key)
+            if last is not None and now - last < cooldown_sec:
+                return False
+            self.entries[key] = now
+            self.entries.move_to_end(key)
+            self._evict(now)
+            return True
+
+    def release(self, key):
+        with self.lock:
+            self.entries.pop(self._key(key), None)
+
+    def _evict(self, now):
+        while self.entries:
+            key, last = next(iter(self.entries.items()))
+            if len(self.entries) > self.max_entries or now - last > self.ttl_sec:
+                self.entries.popitem(last=False)
+            else:
+                break
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+
+class SQLiteCooldownStore(CooldownStore):
+    """
+    Store shared by every worker process on the host through a small SQLite file
+    in WAL mode. The check-and-set is a single UPSERT, so concurrent workers
+    cannot both fire for the same key. Each thread keeps its own connection;
+    expired and excess entries are pruned every `prune_interval_sec`.
+    """
+
+    def __init__(self, db_path, ttl_sec=3600, max_entries=10000, prune_interval_sec=60):
+        self.db_path = db_path
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self.prune_interval_sec = prune_interval_sec
+        self.local = threading.local()
+        self.last_prune = 0.0
+        conn = self._connect()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS cooldowns (
+                   key TEXT PRIMARY KEY,
+                   last_fired REAL NOT NULL
+               )"""
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cooldowns_last_fired "
+            "ON cooldowns (last_fired)"
+        )
+
+    def _connect(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def acquire(self, key, cooldown_sec, now=None):
+        key = self._key(key)
+        now = time.time() if now is None else now
+        try:
+            conn = self._connect()
+            cursor = conn.execute(
+                """INSERT INTO cooldowns (key, last_fired) VALUES (?, ?)
+                   ON CONFLICT(key) DO UPDATE SET last_fired = excluded.last_fired
+                   WHERE cooldowns.last_fired <= ?""",
+                (key, now, now - cooldown_sec),
+            )
+            acquired = cursor.rowcount == 1
+            if now - self.last_prune > self.prune_interval_sec:
+                self.last_prune = now
+                self._prune(conn, now)
+            return acquired
+        except sqlite3.Error as e:
+            # Failing open risks a duplicate alert; failing closed would lose it.
+            logger.error(f"Cooldown store error for {key!r}: {e}")
+            return True
+
+    def release(self, key):
+        try:
+            self._connect().execute(
+                "DELETE FROM cooldowns WHERE key = ?", (self._key(key),)
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Cooldown store error releasing {key!r}: {e}")
+
+    def _prune(self, conn, now):
+        conn.execute(
+            "DELETE FROM cooldowns WHERE last_fired < ?", (now - self.ttl_sec,)
+        )
+        conn.execute(
+            """DELETE FROM cooldowns WHERE key IN (
+                   SELECT key FROM cooldowns ORDER BY last_fired DESC LIMIT -1 OFFSET ?
+               )""",
+            (self.max_entries,),
+        )
+
+    def __len__(self):
+        cursor = self._connect().execute("SELECT COUNT(*) FROM cooldowns")
+        return cursor.fetchone()[0]
+
+
+def create_cooldown_store(config):
+    """Builds the store selected by NOTIFICATION_COOLDOWN_BACKEND."""
+    backend = config.get("NOTIFICATION_COOLDOWN_BACKEND", "memory")
+    # Entries older than the cooldown can never block a notification again.
+    ttl_sec = max(int(config.get("NOTIFICATION_COOLDOWN", 60)), 1)
+    max_entries = int(config.get("NOTIFICATION_COOLDOWN_MAX_ENTRIES", 10000))
+    if backend == "sqlite":
+        return SQLiteCooldownStore(
+            config["NOTIFICATION_COOLDOWN_DB"], ttl_sec=ttl_sec, max_entries=max_entries
+        )
+    if backend != "memory":
+        logger.warning(f"Unknown cooldown backend '{backend}'. Using 'memory'.")
+    return MemoryCooldownStore(ttl_sec=ttl_sec, max_entries=max_entries)
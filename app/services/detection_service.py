@@ -1,14 +1,23 @@
-import datetime
+import atexit
 import logging
 import os
 import time
 
 import cv2
 from flask import current_app
-from ultralytics import YOLO
 
-from .. import database as db
+from .frame_sampler import FrameSampler
+from .frame_scaling import downscale_frame
+from .inference_pool import InferencePool
+from .inference_scheduler import InferenceScheduler
+from .model_backends import create_backend
+from .motion_gate import MotionGate
 from .notification_service import notify_violation
+from .postprocessing import Detections, PostProcessor
+from .rate_controller import StreamRateCoordinator
+from .roi import load_rois
+from .snapshot_service import SnapshotWriter
+from .tracker import ViolationTracker
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +30,30 @@ class DetectionService:
         self.violation_classes = current_app.config["VIOLATION_CLASSES"]
         self.area_requirements = current_app.config["AREA_REQUIREMENTS"]
         self.violation_image_folder = current_app.config["VIOLATION_IMAGE_FOLDER"]
+        self.violation_writer = current_app.violation_writer
+        self.snapshot_writer = SnapshotWriter(
+            current_app._get_current_object(),
+            self.violation_image_folder,
+            max_workers=current_app.config.get("SNAPSHOT_WORKERS", 2),
+            max_pending=current_app.config.get("SNAPSHOT_QUEUE_SIZE", 32),
+            jpeg_quality=current_app.config.get("SNAPSHOT_JPEG_QUALITY", 90),
+            max_width=current_app.config.get("SNAPSHOT_MAX_WIDTH", 0),
+            policy=current_app.config.get("SNAPSHOT_QUEUE_POLICY", "drop"),
+        )
+        # Registered after create_app's violation_writer.stop, so it runs first
+        # (atexit is LIFO) and the last snapshots' rows are queued before the
+        # writer's final flush.
+        atexit.register(self.snapshot_writer.shutdown)
+
+        # Live streams share one model; the scheduler batches their frames together.
+        self.scheduler = None
+        if current_app.config.get("LIVE_BATCH_MAX_SIZE", 8) > 1:
+            self.scheduler = InferenceScheduler(
+                self._predict,
+                max_batch_size=current_app.config.get("LIVE_BATCH_MAX_SIZE", 8),
+                max_wait_ms=current_app.config.get("LIVE_BATCH_MAX_WAIT_MS", 20),
+                concurrency=max(1, current_app.config.get("INFERENCE_WORKERS", 0)),
+            )
 
         if not self.ppe_class_mapping:
             logger.warning(
@@ -33,19 +66,110 @@ class DetectionService:
         if not self.area_requirements:
             logger.warning("Area Requirements are not defined. Using default only.")
 
+        self.postprocessor = PostProcessor(
+            self.ppe_class_mapping, self.violation_classes, self._determine_severity
+        )
+
+        # One violation tracker per live stream, keyed by stream label.
+        self.trackers = {}
+        self.track_iou_threshold = current_app.config.get("TRACK_IOU_THRESHOLD", 0.3)
+        self.track_max_age_sec = current_app.config.get("TRACK_MAX_AGE_SEC", 5.0)
+
+        # Live streams divide the model's time between them through the
+        # coordinator; the latest overlay per stream annotates preview frames
+        # that were not analysed.
+        self.rate_coordinator = StreamRateCoordinator(
+            budget=current_app.config.get("STREAM_INFERENCE_BUDGET", 1.0)
+        )
+        self.live_overlays = {}
+
+        # Regions of interest per camera (stream URL or upload location) and per
+        # area type; only the region's bounding rectangle goes to the model.
+        self.camera_rois, self.area_rois = load_rois(current_app.config)
+
+        # Frames are downscaled once to the inference size (longer side, pixels)
+        # and that copy is used for inference, tracking and annotation.
+        self.inference_max_side = current_app.config.get("INFERENCE_MAX_SIDE", 0)
+        self.camera_inference_sizes = current_app.config.get(
+            "CAMERA_INFERENCE_SIZES", {}
+        )
+        self.area_inference_sizes = current_app.config.get("AREA_INFERENCE_SIZES", {})
+
+        # One motion gate per live stream, keyed by stream label.
+        self.motion_gates = {}
+        self.motion_min_changed_ratio = current_app.config.get(
+            "MOTION_GATE_MIN_CHANGED_RATIO", 0
+        )
+        self.motion_pixel_threshold = current_app.config.get(
+            "MOTION_GATE_PIXEL_THRESHOLD", 25
+        )
+        self.motion_width = current_app.config.get("MOTION_GATE_WIDTH", 160)
+        self.motion_max_skip_sec = current_app.config.get(
+            "MOTION_GATE_MAX_SKIP_SEC", 10.0
+        )
+
     def load_model(self):
         model_path = current_app.config["MODEL_PATH"]
         if not os.path.exists(model_path):
             logger.error(f"YOLO Model file not found at: {model_path}")
             self.model = None
             return
+        workers = current_app.config.get("INFERENCE_WORKERS", 0)
         try:
-            self.model = YOLO(model_path)
-            logger.info(f"YOLOv8 model loaded successfully from {model_path}")
+            if workers > 0:
+                self.model = InferencePool(
+                    current_app.config,
+                    workers=workers,
+                    slots_per_worker=current_app.config.get(
+                        "INFERENCE_SLOTS_PER_WORKER", 4
+                    ),
+                    slot_mb=current_app.config.get("INFERENCE_SLOT_MB", 32),
+                )
+                atexit.register(self.model.close)
+            else:
+                self.model = create_backend(current_app.config)
+            logger.info(f"YOLOv8 model loaded successfully: {self.model.describe()}")
         except Exception as e:
             logger.exception(f"Failed to load YOLO model from {model_path}: {e}")
             self.model = None
 
+    def _predict(self, frames):
+        """Runs the model over a list of frames and returns one Detections per frame."""
+        return self.model.predict(frames)
+
+    def roi_for(self, area_type, camera=None):
+        """Returns the RegionOfInterest for a camera or area type, or None."""
+        roi = self.camera_rois.get(camera) if camera is not None else None
+        return roi if roi is not None else self.area_rois.get(area_type)
+
+    def inference_size_for(self, area_type, camera=None):
+        """Longer-side pixel size frames are downscaled to (0 keeps them native)."""
+        if camera is not None and camera in self.camera_inference_sizes:
+            return int(self.camera_inference_sizes[camera])
+        return int(self.area_inference_sizes.get(area_type, self.inference_max_side))
+
+    def snapshot_frame_for(self, frame, full_frame):
+        """
+        Returns `full_frame` if violation snapshots should be taken from it
+        rather than from the downscaled `frame`, otherwise None.
+        """
+        if full_frame is frame:
+            return None
+        max_width = self.snapshot_writer.max_width
+        if max_width and max_width <= frame.shape[1]:
+            return None
+        return full_frame
+
+    def _predict_regions(self, frames, roi=None):
+        """Like `_predict`, but only on each frame's region of interest."""
+        if roi is None:
+            return self._predict(frames)
+        results = self._predict([roi.crop(frame) for frame in frames])
+        return [
+            roi.restore(detections, frame.shape)
+            for frame, detections in zip(frames, results)
+        ]
+
     def _determine_severity(self, equipment_type):
         if "NO-Hardhat" in equipment_type:
             return "high"
@@ -57,36 +181,100 @@ class DetectionService:
             return "medium"
         return "medium"
 
-    def _save_violation_image(self, image, violation_details, location, area_type):
-        """Saves annotated image and returns the relative path."""
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        filename = f"violation_{location}_{area_type}_{timestamp}.jpg"
-        absolute_filepath = os.path.join(self.violation_image_folder, filename)
-
-        annotated_img = image.copy()
-        # This needs refinement based on actual detection results structure
-        for detail in violation_details:
-            if "bbox" in detail and len(detail["bbox"]) == 4:
-                x1, y1, x2, y2 = map(int, detail["bbox"])
-                cv2.rectangle(annotated_img, (x1, y1), (x2, y2), (0, 0, 255), 2)
-                cv2.putText(
-                    annotated_img,
-                    f"Violation: {detail.get('type', 'Unknown')}",
-                    (x1, y1 - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.6,
-                    (0, 0, 255),
-                    2,
-                )
+    def _new_tracker(self):
+        return ViolationTracker(
+            iou_threshold=self.track_iou_threshold, max_age_sec=self.track_max_age_sec
+        )
 
-        try:
-            cv2.imwrite(absolute_filepath, annotated_img)
-            logger.info(f"Violation image saved: {absolute_filepath}")
-            relative_filepath = os.path.join("images", filename)
-            return relative_filepath
-        except Exception as e:
-            logger.error(f"Error saving violation image {absolute_filepath}: {e}")
+    def _new_motion_gate(self):
+        """Returns a MotionGate, or None when motion gating is disabled."""
+        if not self.motion_min_changed_ratio or self.motion_min_changed_ratio <= 0:
             return None
+        return MotionGate(
+            width=self.motion_width,
+            pixel_threshold=self.motion_pixel_threshold,
+            min_changed_ratio=self.motion_min_changed_ratio,
+            max_skip_sec=self.motion_max_skip_sec,
+        )
+
+    def motion_stats(self, stream_url_label):
+        gate = self.motion_gates.get(stream_url_label)
+        return gate.stats() if gate is not None else None
+
+    def _close_tracks(self, tracks):
+        """Stores the last-seen time of tracks that outlived their first frame."""
+        for track in tracks:
+            if track.hits > 1:
+                self.violation_writer.update_last_seen(track.id, track.last_seen_at)
+
+    def close_stream(self, stream_url_label):
+        """Finalises the open violation tracks of a stopped live stream."""
+        self.motion_gates.pop(stream_url_label, None)
+        self.live_overlays.pop(stream_url_label, None)
+        tracker = self.trackers.pop(stream_url_label, None)
+        if tracker is not None:
+            self._close_tracks(tracker.close_all())
+
+    def _record_violations(
+        self, frame, violations, location, area_type, snapshot_frame=None
+    ):
+        """
+        Queues an annotated snapshot; the violations are logged and notified once
+        it is written. If the snapshot is dropped (queue full) or fails to save,
+        they are neither logged nor notified. The snapshot is taken from
+        `snapshot_frame`, a higher-resolution copy of `frame`, if given.
+        """
+
+        def on_saved(image_path):
+            if image_path is None:
+                logger.error(
+                    f"Failed to save violation image for {location}, "
+                    "skipping DB logging and notification."
+                )
+                self._discard_violations(violations)
+                return
+            self._log_and_notify(violations, image_path, location, area_type)
+
+        # The tracks may close before the snapshot is written.
+        for violation in violations:
+            if violation.get("track_id") is not None:
+                self.violation_writer.expect_track(violation["track_id"])
+
+        image, bbox_scale = frame, 1.0
+        if snapshot_frame is not None:
+            image, bbox_scale = snapshot_frame, snapshot_frame.shape[1] / frame.shape[1]
+        if not self.snapshot_writer.submit(
+            image, violations, location, area_type, on_saved, bbox_scale=bbox_scale
+        ):
+            logger.error(
+                f"Violation image for {location} was dropped, "
+                "skipping DB logging and notification."
+            )
+            self._discard_violations(violations)
+
+    def _discard_violations(self, violations):
+        for violation in violations:
+            if violation.get("track_id") is not None:
+                self.violation_writer.discard_track(violation["track_id"])
+
+    def _log_and_notify(self, violations, image_path, location, area_type):
+        for violation in violations:
+            self.violation_writer.add_violation(
+                timestamp=violation["timestamp"],
+                equipment_type=violation["type"],
+                image_path=image_path,
+                location=location,
+                area_type=area_type,
+                severity=violation["severity"],
+                track_id=violation.get("track_id"),
+            )
+            notify_violation(
+                violation_type=violation["type"],
+                location=location,
+                area_type=area_type,
+                severity=violation["severity"],
+                image_path=image_path,
+            )
 
     def process_image(self, image_path, location="Unknown", area_type="default"):
         if not self.model:
@@ -99,69 +287,34 @@ class DetectionService:
                 logger.error(f"Failed to read image file: {image_path}")
                 return {"error": "Failed to read image"}
 
-            results = self.model(image, conf=0.35)
-
-            detected_violations = []
-            processed_frame_info = {"detections": [], "violations": []}
-
-            if results and results[0].boxes is not None:
-                boxes = results[0].boxes
-                for i in range(len(boxes)):
-                    cls_id = int(boxes.cls[i].item())
-                    label = self.ppe_class_mapping.get(cls_id, f"Unknown_{cls_id}")
-                    confidence = boxes.conf[i].item()
-                    bbox_coords = boxes.xyxy[i].tolist()  # [x1, y1, x2, y2]
-
-                    processed_frame_info["detections"].append(
-                        {"label": label, "confidence": confidence, "bbox": bbox_coords}
-                    )
-
-                    if label in self.violation_classes:
-                        severity = self._determine_severity(label)
-                        violation_detail = {
-                            "type": label,
-                            "severity": severity,
-                            "confidence": confidence,
-                            "bbox": bbox_coords,
-                            "timestamp": datetime.datetime.now(),
-                        }
-                        detected_violations.append(violation_detail)
-                        processed_frame_info["violations"].append(violation_detail)
-
-            if detected_violations:
-                saved_image_path_relative = self._save_violation_image(
-                    image, detected_violations, location, area_type
-                )
-
-                if saved_image_path_relative:
-                    for violation in detected_violations:
-                        db.add_violation(
-                            timestamp=violation["timestamp"],
-                            equipment_type=violation["type"],
-                            image_path=saved_image_path_relative,
-                            location=location,
-                            area_type=area_type,
-                            severity=violation["severity"],
-                        )
-                        notify_violation(
-                            violation_type=violation["type"],
-                            location=location,
-                            area_type=area_type,
-                            severity=violation["severity"],
-                            image_path=saved_image_path_relative,
-                        )
-                else:
-                    logger.error(
-                        "Failed to save violation image, skipping DB logging and notification for this image."
-                    )
-
-            return processed_frame_info
+            frame = downscale_frame(image, self.inference_size_for(area_type, location))
+            roi = self.roi_for(area_type, location)
+            detections = self._predict_regions([frame], roi)[0]
+            return self._handle_detections(
+                frame,
+                detections,
+                location,
+                area_type,
+                snapshot_frame=self.snapshot_frame_for(frame, image),
+            )
 
         except Exception as e:
             logger.exception(f"Error processing image {image_path}: {e}")
             return {"error": str(e)}
 
-    def process_video(self, video_path, location="Unknown", area_type="default"):
+    def process_video(
+        self,
+        video_path,
+        location="Unknown",
+        area_type="default",
+        progress_callback=None,
+        cancel_event=None,
+    ):
+        """
+        Analyses sampled frames of a video file.
+        `progress_callback(frames_analyzed, total_frames)` is called after each batch;
+        setting `cancel_event` stops processing at the next sampled frame.
+        """
         if not self.model:
             logger.error("Model not loaded. Cannot process video.")
             return {"error": "Model not loaded", "total_violations": 0}
@@ -173,9 +326,16 @@ class DetectionService:
 
         fps = cap.get(cv2.CAP_PROP_FPS)
         frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        frame_step = max(1, int(fps if fps > 0 else 30))
+        sampler = FrameSampler(
+            cap,
+            interval_sec=current_app.config.get("VIDEO_SAMPLE_INTERVAL_SEC", 1.0),
+            mode=current_app.config.get("VIDEO_SAMPLE_MODE", "grab"),
+        )
+        # Larger batches amortise the per-call model overhead (higher throughput)
+        # at the cost of holding more frames and reporting results later.
+        batch_size = max(1, int(current_app.config.get("VIDEO_BATCH_SIZE", 16)))
         logger.info(
-            f"Processing video: {video_path}, FPS: {fps:.2f}, Frame Step: {frame_step}"
+            f"Processing video: {video_path}, FPS: {fps:.2f}, Sampling: {sampler.describe()}, Batch Size: {batch_size}"
         )
 
         total_violations_count = 0
@@ -188,300 +348,345 @@ class DetectionService:
             "violations_by_frame": [],
         }
 
+        total_samples = sampler.estimated_samples(frame_count)
+        # Tracks run on media time so a violation visible across many sampled
+        # frames is logged once.
+        tracker = self._new_tracker()
+        # Frames that barely differ from the last analysed one reuse its detections.
+        motion_gate = self._new_motion_gate()
+        roi = self.roi_for(area_type, location)
+        inference_size = self.inference_size_for(area_type, location)
+        violation_events = 0
+
+        def flush_batch(batch):
+            nonlocal total_violations_count, violation_events
+            for frame_idx, frame_time, frame_result in self._process_frame_batch(
+                batch, location, area_type, tracker, motion_gate, roi
+            ):
+                violation_events += frame_result.get("new_violations", 0)
+                if frame_result.get("violations"):
+                    num_violations_in_frame = len(frame_result["violations"])
+                    total_violations_count += num_violations_in_frame
+                    all_results["violations_by_frame"].append(
+                        {
+                            "frame_index": frame_idx,
+                            "timestamp_sec": frame_time,
+                            "violations": frame_result["violations"],
+                        }
+                    )
+            if progress_callback:
+                progress_callback(processed_frames, total_samples)
+
         try:
-            frame_idx = 0
-            while True:
-                ret, frame = cap.read()
-                if not ret:
+            batch = []  # (frame_idx, frame_time, frame, snapshot_frame)
+            for frame_idx, frame_time, full_frame in sampler:
+                if cancel_event is not None and cancel_event.is_set():
+                    logger.info(f"Video processing cancelled: {video_path}")
+                    all_results["cancelled"] = True
                     break
 
-                if frame_idx % frame_step == 0:
-                    processed_frames += 1
-                    frame_time = frame_idx / fps if fps > 0 else 0
-
-                    frame_result = self.process_image_frame(
-                        frame, location, area_type, frame_time
+                processed_frames += 1
+                frame = downscale_frame(full_frame, inference_size)
+                batch.append(
+                    (
+                        frame_idx,
+                        frame_time,
+                        frame,
+                        self.snapshot_frame_for(frame, full_frame),
                     )
+                )
 
-                    if frame_result.get("violations"):
-                        num_violations_in_frame = len(frame_result["violations"])
-                        total_violations_count += num_violations_in_frame
-                        all_results["violations_by_frame"].append(
-                            {
-                                "frame_index": frame_idx,
-                                "timestamp_sec": frame_time,
-                                "violations": frame_result["violations"],
-                            }
-                        )
+                if len(batch) >= batch_size:
+                    flush_batch(batch)
+                    batch = []
 
-                frame_idx += 1
+            if batch and not all_results.get("cancelled"):
+                flush_batch(batch)
 
         except Exception as e:
             logger.exception(f"Error during video processing: {e}")
             all_results["error"] = str(e)
         finally:
             cap.release()
+            self._close_tracks(tracker.close_all())
 
         end_time = time.time()
         processing_duration = end_time - start_time
         all_results["frames_analyzed"] = processed_frames
         all_results["total_violations"] = total_violations_count
+        all_results["violation_events"] = violation_events
+        skipped = motion_gate.skipped if motion_gate is not None else 0
+        all_results["frames_skipped_no_motion"] = skipped
         logger.info(
-            f"Video processing finished. Analyzed {processed_frames} frames in {processing_duration:.2f}s. Found {total_violations_count} violations."
+            f"Video processing finished. Analyzed {processed_frames} frames in {processing_duration:.2f}s "
+            f"({skipped} without motion reused earlier detections). "
+            f"Found {total_violations_count} violations ({violation_events} distinct events)."
         )
 
         return all_results
 
-    def process_image_frame(self, frame, location, area_type, frame_time_sec):
-        """Processes a single video frame (similar to process_image but takes frame array)."""
-        if not self.model:
-            return {"error": "Model not loaded"}
+    def _process_frame_batch(
+        self, batch, location, area_type, tracker=None, motion_gate=None, roi=None
+    ):
+        """
+        Runs one model call over a batch of
+        (frame_idx, frame_time, frame, snapshot_frame) tuples.
 
+        With a `motion_gate`, only frames that changed go to the model; the others
+        reuse the detections of the last analysed frame. With a `roi`, only the
+        region of interest is compared and analysed.
+        Returns a list of (frame_idx, frame_time, frame_result) in input order.
+        """
+        if motion_gate is None:
+            analyse = [True] * len(batch)
+        else:
+            analyse = [
+                motion_gate.should_analyse(
+                    roi.crop(frame) if roi is not None else frame, frame_time
+                )
+                for _, frame_time, frame, _ in batch
+            ]
+        frames = [frame for (_, _, frame, _), needed in zip(batch, analyse) if needed]
         try:
-            results = self.model(frame, conf=0.35)
-            detected_violations = []
-            processed_frame_info = {"detections": [], "violations": []}
-
-            if results and results[0].boxes is not None:
-                boxes = results[0].boxes
-                for i in range(len(boxes)):
-                    cls_id = int(boxes.cls[i].item())
-                    label = self.ppe_class_mapping.get(cls_id, f"Unknown_{cls_id}")
-                    confidence = boxes.conf[i].item()
-                    bbox_coords = boxes.xyxy[i].tolist()
-
-                    processed_frame_info["detections"].append(
-                        {"label": label, "confidence": confidence, "bbox": bbox_coords}
-                    )
-
-                    if label in self.violation_classes:
-                        severity = self._determine_severity(label)
-                        violation_detail = {
-                            "type": label,
-                            "severity": severity,
-                            "confidence": confidence,
-                            "bbox": bbox_coords,
-                            "timestamp": datetime.datetime.now(),
-                            "frame_time_sec": frame_time_sec,
-                        }
-                        detected_violations.append(violation_detail)
-                        processed_frame_info["violations"].append(violation_detail)
-
-            if detected_violations:
-                saved_image_path_relative = self._save_violation_image(
-                    frame, detected_violations, location, area_type
+            predicted = iter(self._predict_regions(frames, roi) if frames else [])
+        except Exception as e:
+            if motion_gate is not None:
+                motion_gate.invalidate()
+            logger.exception(
+                f"Batched inference failed for {len(frames)} frames, falling back to per-frame: {e}"
+            )
+            return [
+                (
+                    frame_idx,
+                    frame_time,
+                    self.process_image_frame(
+                        frame,
+                        location,
+                        area_type,
+                        frame_time,
+                        tracker,
+                        roi,
+                        snapshot_frame,
+                    ),
                 )
-                if saved_image_path_relative:
-                    for violation in detected_violations:
-                        db.add_violation(
-                            timestamp=violation["timestamp"],
-                            equipment_type=violation["type"],
-                            image_path=saved_image_path_relative,
-                            location=location,
-                            area_type=area_type,
-                            severity=violation["severity"],
-                        )
-                        notify_violation(
-                            violation_type=violation["type"],
-                            location=location,
-                            area_type=area_type,
-                            severity=violation["severity"],
-                            image_path=saved_image_path_relative,
-                        )
-                else:
-                    logger.error(
-                        "Failed to save violation image for frame, skipping DB/notification."
-                    )
+                for frame_idx, frame_time, frame, snapshot_frame in batch
+            ]
+
+        batch_detections = []
+        for needed in analyse:
+            if needed:
+                detections = next(predicted)
+                if motion_gate is not None:
+                    motion_gate.detections = detections
+            else:
+                detections = motion_gate.detections
+                if detections is None:
+                    detections = Detections.empty()
+            batch_detections.append(detections)
+
+        return [
+            (
+                frame_idx,
+                frame_time,
+                self._handle_detections(
+                    frame,
+                    detections,
+                    location,
+                    area_type,
+                    tracker=tracker,
+                    clock=frame_time,
+                    snapshot_frame=snapshot_frame,
+                    frame_time_sec=frame_time,
+                ),
+            )
+            for (frame_idx, frame_time, frame, snapshot_frame), detections in zip(
+                batch, batch_detections
+            )
+        ]
 
-            return processed_frame_info
+    def process_image_frame(
+        self,
+        frame,
+        location,
+        area_type,
+        frame_time_sec,
+        tracker=None,
+        roi=None,
+        snapshot_frame=None,
+    ):
+        """Processes a single video frame (similar to process_image but takes frame array)."""
+        if not self.model:
+            return {"error": "Model not loaded"}
 
+        try:
+            detections = self._predict_regions([frame], roi)[0]
+            return self._handle_detections(
+                frame,
+                detections,
+                location,
+                area_type,
+                tracker=tracker,
+                clock=frame_time_sec,
+                snapshot_frame=snapshot_frame,
+                frame_time_sec=frame_time_sec,
+            )
         except Exception as e:
             logger.exception(f"Error processing frame at ~{frame_time_sec:.2f}s: {e}")
             return {"error": str(e)}
 
+    def _handle_detections(
+        self,
+        frame,
+        detections,
+        location,
+        area_type,
+        tracker=None,
+        clock=None,
+        snapshot_frame=None,
+        **extra,
+    ):
+        """Builds detection/violation records for a frame and logs its violations."""
+        detection_records, violations, _, _ = self.postprocessor.build(
+            detections, **extra
+        )
+        new_violations = self._log_violations(
+            frame, violations, location, area_type, tracker, clock, snapshot_frame
+        )
+        return {
+            "detections": detection_records,
+            "violations": violations,
+            "new_violations": len(new_violations),
+        }
+
+    def _log_violations(
+        self,
+        frame,
+        violations,
+        location,
+        area_type,
+        tracker,
+        clock,
+        snapshot_frame=None,
+    ):
+        """
+        Records violations, deduplicated through `tracker` when given so only
+        violations that start a new track are stored. Returns those recorded.
+        """
+        if tracker is not None:
+            # Update even without violations so stale tracks expire.
+            violations, closed_tracks = tracker.update(violations, clock)
+            self._close_tracks(closed_tracks)
+        if violations:
+            self._record_violations(
+                frame, violations, location, area_type, snapshot_frame
+            )
+        return violations
+
+    def _annotate(self, frame, detections, labels, violation_mask):
+        """Draws all detections on a copy of the frame, violations in red."""
+        annotated_frame = frame.copy()
+        boxes = detections.boxes.astype(int).tolist()
+        confidences = detections.confidences.tolist()
+        for (x1, y1, x2, y2), label, confidence, is_violation in zip(
+            boxes, labels, confidences, violation_mask.tolist()
+        ):
+            color = (0, 0, 255) if is_violation else (0, 255, 0)
+            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(
+                annotated_frame,
+                f"{label} ({confidence:.2f})",
+                (x1, y1 - 10),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.5,
+                color,
+                2,
+            )
+        return annotated_frame
+
     def process_live_stream_frame(
         self,
         frame,
         stream_url_label="LiveStream",
         area_type="default",
         frame_time_offset=0,
+        annotate=True,
+        roi=None,
+        snapshot_frame=None,
     ):
         """
-        Processes a single frame from a live stream.
-        This is very similar to process_image_frame but tailored for streams.
-        Returns the annotated frame and any detected violations for this frame.
-        """
-        if not self.model:
-            logger.error("Live stream: Model not loaded.")
-            return frame, []
-        """
-        Processes a single frame from a live stream.
-        This is very similar to process_image_frame but tailored for streams.
-        Returns the annotated frame and any detected violations for this frame.
+        Processes a single frame from a live stream, restricted to `roi` if given.
+        `snapshot_frame` is the full-resolution original of a downscaled `frame`.
+        Returns the annotated frame (the frame itself if `annotate` is False) and
+        any detected violations for this frame.
         """
         if not self.model:
             logger.error("Live stream: Model not loaded.")
             return frame, []
 
-        annotated_frame = frame.copy()
-        detected_violations_in_frame = []
+        gate = self.motion_gates.get(stream_url_label)
+        if gate is None:
+            gate = self._new_motion_gate()
+            if gate is not None:
+                self.motion_gates[stream_url_label] = gate
 
         try:
-            results = self.model(frame, conf=0.35)
-
-            if results and results[0].boxes is not None:
-                boxes = results[0].boxes
-                for i in range(len(boxes)):
-                    cls_id = int(boxes.cls[i].item())
-                    label = self.ppe_class_mapping.get(cls_id, f"Unknown_{cls_id}")
-                    confidence = boxes.conf[i].item()
-                    bbox_coords = boxes.xyxy[i].tolist()
-                    x1, y1, x2, y2 = map(int, bbox_coords)
-
-                    color = (0, 255, 0)
-                    if label in self.violation_classes:
-                        color = (0, 0, 255)
-
-                    cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
-                    cv2.putText(
-                        annotated_frame,
-                        f"{label} ({confidence:.2f})",
-                        (x1, y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.5,
-                        color,
-                        2,
-                    )
-
-                    if label in self.violation_classes:
-                        severity = self._determine_severity(label)
-                        violation_detail = {
-                            "type": label,
-                            "severity": severity,
-                            "confidence": confidence,
-                            "bbox": bbox_coords,
-                            "timestamp": datetime.datetime.now(),
-                            "stream_url": stream_url_label,
-                            "frame_time_offset": frame_time_offset,
-                        }
-                        detected_violations_in_frame.append(violation_detail)
-
-            if detected_violations_in_frame:
-                # Save an image for the first detected violation in this batch of violations
-                # To avoid saving too many images from a continuous stream
-                # Cooldown for saving images from the same stream can be added
-                saved_image_path_relative = self._save_violation_image(
-                    frame, detected_violations_in_frame, stream_url_label, area_type
-                )
-                if saved_image_path_relative:
-                    for violation in detected_violations_in_frame:
-                        db.add_violation(
-                            timestamp=violation["timestamp"],
-                            equipment_type=violation["type"],
-                            image_path=saved_image_path_relative,
-                            location=stream_url_label,
-                            area_type=area_type,
-                            severity=violation["severity"],
-                        )
-                        notify_violation(
-                            violation_type=violation["type"],
-                            location=stream_url_label,
-                            area_type=area_type,
-                            severity=violation["severity"],
-                            image_path=saved_image_path_relative,
-                        )
+            region = roi.crop(frame) if roi is not None else frame
+            if (
+                gate is not None
+                and not gate.should_analyse(region, time.monotonic())
+                and gate.detections is not None
+            ):
+                # Nothing moved; the previous detections still describe the scene.
+                detections = gate.detections
+            else:
+                if self.scheduler is not None:
+                    detections = self.scheduler.infer(region)
                 else:
-                    logger.error(
-                        f"Live stream ({stream_url_label}): Failed to save violation image for frame."
-                    )
-
-            return annotated_frame, detected_violations_in_frame
-
-        except Exception as e:
-            logger.exception(
-                f"Live stream ({stream_url_label}): Error processing frame: {e}"
+                    detections = self._predict([region])[0]
+                if roi is not None:
+                    detections = roi.restore(detections, frame.shape)
+                if gate is not None:
+                    gate.detections = detections
+
+            _, violations, labels, violation_mask = self.postprocessor.build(
+                detections,
+                stream_url=stream_url_label,
+                frame_time_offset=frame_time_offset,
             )
-            return frame, []
-
-        annotated_frame = frame.copy()  # Work on a copy
-        detected_violations_in_frame = []
-
-        try:
-            results = self.model(
-                frame, conf=0.35
-            )  # Use the original frame for detection
-
-            if results and results[0].boxes is not None:
-                boxes = results[0].boxes
-                for i in range(len(boxes)):
-                    cls_id = int(boxes.cls[i].item())
-                    label = self.ppe_class_mapping.get(cls_id, f"Unknown_{cls_id}")
-                    confidence = boxes.conf[i].item()
-                    bbox_coords = boxes.xyxy[i].tolist()
-                    x1, y1, x2, y2 = map(int, bbox_coords)
-
-                    # Annotate the copied frame
-                    color = (0, 255, 0)  # Green for all detections initially
-                    if label in self.violation_classes:
-                        color = (0, 0, 255)  # Red for violations
-
-                    cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
-                    cv2.putText(
-                        annotated_frame,
-                        f"{label} ({confidence:.2f})",
-                        (x1, y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.5,
-                        color,
-                        2,
-                    )
-
-                    if label in self.violation_classes:
-                        severity = self._determine_severity(label)
-                        violation_detail = {
-                            "type": label,
-                            "severity": severity,
-                            "confidence": confidence,
-                            "bbox": bbox_coords,
-                            "timestamp": datetime.datetime.now(),
-                            "stream_url": stream_url_label,  # Identify the stream
-                            "frame_time_offset": frame_time_offset,  # If keeping track
-                        }
-                        detected_violations_in_frame.append(violation_detail)
-
-            if detected_violations_in_frame:
-                # Save an image for the first detected violation in this batch of violations
-                # To avoid saving too many images from a continuous stream
-                # Cooldown for saving images from the same stream can be added
-                saved_image_path_relative = self._save_violation_image(
-                    frame, detected_violations_in_frame, stream_url_label, area_type
+            self.live_overlays[stream_url_label] = (detections, labels, violation_mask)
+            annotated_frame = frame
+            if annotate:
+                annotated_frame = self._annotate(
+                    frame, detections, labels, violation_mask
                 )
-                if saved_image_path_relative:
-                    for violation in detected_violations_in_frame:
-                        db.add_violation(
-                            timestamp=violation["timestamp"],
-                            equipment_type=violation["type"],
-                            image_path=saved_image_path_relative,
-                            location=stream_url_label,  # Use stream label as location
-                            area_type=area_type,
-                            severity=violation["severity"],
-                        )
-                        notify_violation(  # Notification service handles its own cooldown
-                            violation_type=violation["type"],
-                            location=stream_url_label,
-                            area_type=area_type,
-                            severity=violation["severity"],
-                            image_path=saved_image_path_relative,
-                        )
-                else:
-                    logger.error(
-                        f"Live stream ({stream_url_label}): Failed to save violation image for frame."
-                    )
 
-            return annotated_frame, detected_violations_in_frame
+            tracker = self.trackers.get(stream_url_label)
+            if tracker is None:
+                tracker = self.trackers[stream_url_label] = self._new_tracker()
+            self._log_violations(
+                frame,
+                violations,
+                stream_url_label,
+                area_type,
+                tracker,
+                time.monotonic(),
+                snapshot_frame,
+            )
+
+            return annotated_frame, violations
 
         except Exception as e:
+            if gate is not None:
+                # The gate's reference may be a frame that was never analysed.
+                gate.invalidate()
             logger.exception(
                 f"Live stream ({stream_url_label}): Error processing frame: {e}"
             )
             return frame, []
+
+    def annotate_live_frame(self, frame, stream_url_label):
+        """Draws the stream's most recent detections on a frame that was not analysed."""
+        overlay = self.live_overlays.get(stream_url_label)
+        if overlay is None:
+            return frame
+        return self._annotate(frame, *overlay)
@@ -0,0 +1,109 @@
+import logging
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_MODES = ("grab", "seek")
+
+
+class FrameSampler:
+    """
+    Iterates over a cv2.VideoCapture yielding only the frames selected for analysis
+    as (frame_idx, timestamp_sec, frame) tuples.
+
+    Frames are selected either every `frame_step` frames or every `interval_sec`
+    seconds of media time. Interval sampling reads the container timestamps
+    (CAP_PROP_POS_MSEC), so variable-frame-rate files are sampled on wall-clock
+    time rather than on frame index.
+
+    Modes:
+      - "grab": every frame is grabbed (demuxed) but only selected frames are
+        retrieved, i.e. decoded and colour-converted.
+      - "seek": jumps straight to the next selected position. Best for very
+        sparse sampling of files with frequent keyframes; some codecs seek
+        imprecisely, so "grab" is the default.
+    """
+
+    def __init__(self, cap, interval_sec=None, frame_step=None, mode="grab"):
+        if mode not in SAMPLE_MODES:
+            logger.warning(f"Unknown video sample mode '{mode}'. Using 'grab'.")
+            mode = "grab"
+        self.cap = cap
+        self.mode = mode
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 0
+        self.interval_sec = interval_sec if interval_sec and interval_sec > 0 else None
+        if frame_step is None:
+            frame_step = int(self.fps) if self.fps > 0 else 30
+        self.frame_step = max(1, int(frame_step))
+
+    def describe(self):
+        if self.interval_sec:
+            return f"every {self.interval_sec:g}s ({self.mode})"
+        return f"every {self.frame_step} frames ({self.mode})"
+
+    def estimated_samples(self, frame_count):
+        """Expected number of sampled frames, used for progress reporting."""
+        if frame_count <= 0:
+            return 0
+        if self.interval_sec and self.fps > 0:
+            return int((frame_count / self.fps) // self.interval_sec) + 1
+        return (frame_count + self.frame_step - 1) // self.frame_step
+
+    def __iter__(self):
+        if self.mode == "seek":
+            return self._iter_seek()
+        return self._iter_grab()
+
+    def _timestamp_sec(self, frame_idx):
+        """Media time of the most recently grabbed/read frame."""
+        pos_msec = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        if pos_msec and pos_msec > 0:
+            return pos_msec / 1000.0
+        # Some backends do not report timestamps; fall back to nominal FPS.
+        return frame_idx / self.fps if self.fps > 0 else 0.0
+
+    def _iter_grab(self):
+        frame_idx = 0
+        next_due_sec = 0.0
+        while self.cap.grab():
+            if self.interval_sec:
+                timestamp_sec = self._timestamp_sec(frame_idx)
+                selected = timestamp_sec >= next_due_sec
+                if selected:
+                    while next_due_sec <= timestamp_sec:
+                        next_due_sec += self.interval_sec
+            else:
+                selected = frame_idx % self.frame_step == 0
+                timestamp_sec = self._timestamp_sec(frame_idx) if selected else None
+
+            if selected:
+                ret, frame = self.cap.retrieve()
+                if not ret:
+                    logger.warning(f"Failed to decode frame {frame_idx}, skipping.")
+                else:
+                    yield frame_idx, timestamp_sec, frame
+            frame_idx += 1
+
+    def _iter_seek(self):
+        frame_idx = 0
+        target_sec = 0.0
+        while True:
+            if self.interval_sec:
+                self.cap.set(cv2.CAP_PROP_POS_MSEC, target_sec * 1000.0)
+            else:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+
+            # read() advanced the position past the decoded frame.
+            frame_idx = max(int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) - 1, frame_idx)
+            timestamp_sec = self._timestamp_sec(frame_idx)
+            yield frame_idx, timestamp_sec, frame
+
+            if self.interval_sec:
+                target_sec = max(target_sec, timestamp_sec) + self.interval_sec
+            else:
+                frame_idx += self.frame_step
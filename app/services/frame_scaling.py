@@ -0,0 +1,18 @@
+import cv2
+
+
+def downscale_frame(frame, max_side):
+    """
+    Shrinks a frame so its longer side is at most `max_side` pixels, keeping the
+    aspect ratio. Frames already small enough (or max_side 0) are returned
+    as-is, without a copy.
+    """
+    if not max_side:
+        return frame
+    height, width = frame.shape[:2]
+    longest = max(height, width)
+    if longest <= max_side:
+        return frame
+    factor = max_side / longest
+    size = (max(1, int(round(width * factor))), max(1, int(round(height * factor))))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
@@ -0,0 +1,362 @@
+import itertools
+import logging
+import os
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+
+import numpy as np
+
+from .model_backends import ModelBackend, resolve_onnx_model
+from .postprocessing import Detections
+
+logger = logging.getLogger(__name__)
+
+# Settings a worker needs to build its own backend with create_backend().
+BACKEND_CONFIG_KEYS = (
+    "MODEL_PATH",
+    "MODEL_BACKEND",
+    "MODEL_CONFIDENCE",
+    "MODEL_IOU",
+    "MODEL_IMGSZ",
+    "MODEL_PRECISION",
+    "MODEL_INT8_PATH",
+    "ONNX_CACHE_DIR",
+    "ONNX_INTRA_OP_THREADS",
+    "ONNX_INTER_OP_THREADS",
+)
+
+# Frames in a slot start on cache-line boundaries.
+FRAME_ALIGN = 64
+
+PROJECT_ROOT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+WORKER_MODULE = f"{__package__}.inference_worker"
+
+
+def pack_detections(detections_list):
+    """
+    Packs the Detections of several frames into per-frame counts and a single
+    (total, 6) float32 array of [x1, y1, x2, y2, confidence, class id] rows.
+    """
+    counts = [len(detections) for detections in detections_list]
+    packed = np.empty((sum(counts), 6), dtype=np.float32)
+    row = 0
+    for detections, count in zip(detections_list, counts):
+        packed[row : row + count, :4] = detections.boxes
+        packed[row : row + count, 4] = detections.confidences
+        packed[row : row + count, 5] = detections.cls_ids
+        row += count
+    return counts, packed
+
+
+def unpack_detections(counts, packed):
+    detections_list, row = [], 0
+    for count in counts:
+        rows = packed[row : row + count]
+        detections_list.append(Detections(rows[:, 5], rows[:, 4], rows[:, :4]))
+        row += count
+    return detections_list
+
+
+def frame_layout(frames):
+    """(offset, shape) of each frame within a slot, and the bytes they need."""
+    layout, offset = [], 0
+    for frame in frames:
+        offset = -(-offset // FRAME_ALIGN) * FRAME_ALIGN
+        layout.append((offset, frame.shape))
+        offset += frame.nbytes
+    return layout, offset
+
+
+class _Worker:
+    """Parent-side handle of one worker process and its shared-memory ring."""
+
+    def __init__(self, index, slots, slot_bytes):
+        self.index = index
+        self.slots = slots
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self.free_slots = queue.Queue()
+        for slot in range(slots):
+            self.free_slots.put(slot)
+        self.pending = {}  # request id -> (future, slot)
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.process = None
+        self.conn = None
+        self.ready = False
+        self.started = None  # Future resolved by the worker's ready/failed reply
+        self.description = None
+        self.frames_run = 0
+        self.restarts = 0
+
+    def in_flight(self):
+        return self.slots - self.free_slots.qsize()
+
+
+class InferencePool(ModelBackend):
+    """
+    Runs the detector in `workers` separate processes, each with its own copy of
+    the model, so pre- and post-processing run on all cores instead of behind
+    the web process's GIL.
+
+    Every worker owns a ring of `slots_per_worker` shared-memory slots. Frames
+    are written straight into a free slot and the worker reads them in place,
+    so only a small header crosses the socket; detections come back packed
+    into one float32 array per request. A free slot is what admits a request,
+    which bounds the work queued at each worker.
+
+    `predict()` spreads a batch over the workers, so a single caller already
+    uses all of them. A worker that dies is restarted and the requests it held
+    fail with RuntimeError.
+    """
+
+    name = "process_pool"
+
+    def __init__(
+        self,
+        config,
+        workers=2,
+        slots_per_worker=4,
+        slot_mb=32,
+        start_timeout_sec=600,
+    ):
+        self.num_workers = max(1, int(workers))
+        self.slot_bytes = int(slot_mb * 1024 * 1024)
+        self.backend_config = self._worker_config(config)
+        self.request_ids = itertools.count()
+        self.closed = False
+        self.workers = [
+            _Worker(index, max(1, int(slots_per_worker)), self.slot_bytes)
+            for index in range(self.num_workers)
+        ]
+        try:
+            for worker in self.workers:
+                self._start_worker(worker)
+            for worker in self.workers:
+                worker.started.result(timeout=start_timeout_sec)
+        except Exception:
+            self.close()
+            raise
+        logger.info(
+            f"Inference pool ready: {self.num_workers} workers running "
+            f"{self.workers[0].description}."
+        )
+
+    def _worker_config(self, config):
+        backend_config = {key: config.get(key) for key in BACKEND_CONFIG_KEYS}
+        if backend_config["MODEL_BACKEND"] == "onnxruntime":
+            # Export once here rather than racing the export in every worker.
+            backend_config["MODEL_PATH"] = resolve_onnx_model(config)
+        # Split the cores between the workers unless told otherwise.
+        threads = max(1, (os.cpu_count() or 1) // self.num_workers)
+        if not backend_config["ONNX_INTRA_OP_THREADS"]:
+            backend_config["ONNX_INTRA_OP_THREADS"] = threads
+        self.torch_threads = threads
+        return backend_config
+
+    def _start_worker(self, worker):
+        parent_sock, child_sock = socket.socketpair()
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            filter(None, [PROJECT_ROOT, env.get("PYTHONPATH")])
+        )
+        env.setdefault("OMP_NUM_THREADS", str(self.torch_threads))
+        try:
+            worker.process = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    WORKER_MODULE,
+                    str(worker.index),
+                    str(child_sock.fileno()),
+                ],
+                pass_fds=(child_sock.fileno(),),
+                cwd=PROJECT_ROOT,
+                env=env,
+            )
+        finally:
+            child_sock.close()
+        worker.conn = Connection(parent_sock.detach())
+        worker.started = Future()
+        worker.conn.send(
+            ("init", self.backend_config, worker.shm.name, self.slot_bytes)
+        )
+        threading.Thread(
+            target=self._read_results,
+            args=(worker, worker.conn),
+            name=f"inference-pool-{worker.index}",
+            daemon=True,
+        ).start()
+
+    def _read_results(self, worker, conn):
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            kind = message[0]
+            if kind == "result":
+                _, request_id, counts, packed = message
+                future = self._finish(worker, request_id)
+                worker.frames_run += len(counts)
+                if future is not None:
+                    future.set_result(unpack_detections(counts, packed))
+            elif kind == "error":
+                _, request_id, error = message
+                future = self._finish(worker, request_id)
+                if future is not None:
+                    future.set_exception(RuntimeError(error))
+            elif kind == "ready":
+                _, worker.description, warmup_ms = message
+                worker.ready = True
+                logger.info(
+                    f"Inference worker {worker.index} (pid {worker.process.pid}) "
+                    f"ready: {worker.description}, warm-up {warmup_ms:.0f}ms."
+                )
+                worker.started.set_result(True)
+            elif kind == "failed":
+                logger.error(f"Inference worker {worker.index} failed: {message[1]}")
+                worker.started.set_exception(
+                    RuntimeError(f"Inference worker {worker.index}: {message[1]}")
+                )
+        self._worker_exited(worker, conn)
+
+    def _finish(self, worker, request_id):
+        with worker.lock:
+            future, slot = worker.pending.pop(request_id, (None, None))
+        if slot is not None:
+            worker.free_slots.put(slot)
+        return future
+
+    def _worker_exited(self, worker, conn):
+        with worker.lock:
+            if conn is not worker.conn:
+                return
+            was_ready, worker.ready = worker.ready, False
+            pending, worker.pending = worker.pending, {}
+        conn.close()
+        code = worker.process.wait()
+        error = RuntimeError(f"Inference worker {worker.index} exited (code {code})")
+        if not worker.started.done():
+            worker.started.set_exception(error)
+        for future, slot in pending.values():
+            worker.free_slots.put(slot)
+            future.set_exception(error)
+        if self.closed:
+            return
+        logger.error(f"{error}; {len(pending)} requests failed.")
+        if was_ready:
+            # Only restart workers that managed to load the model before.
+            worker.restarts += 1
+            self._start_worker(worker)
+
+    def _pick_worker(self):
+        ready = [worker for worker in self.workers if worker.ready]
+        if not ready:
+            raise RuntimeError("No inference worker is available")
+        return min(ready, key=lambda worker: worker.in_flight())
+
+    def submit(self, frames):
+        """
+        Copies `frames` (uint8 arrays) into a free slot of the least busy worker
+        and returns a Future resolving to their Detections. Blocks while that
+        worker's slots are all in use.
+        """
+        layout, size = frame_layout(frames)
+        if size > self.slot_bytes:
+            raise ValueError(
+                f"{len(frames)} frames need {size} bytes; a slot holds "
+                f"{self.slot_bytes} (raise INFERENCE_SLOT_MB)"
+            )
+        worker = self._pick_worker()
+        slot = worker.free_slots.get()
+        base = slot * self.slot_bytes
+        for frame, (offset, shape) in zip(frames, layout):
+            target = np.ndarray(
+                shape, dtype=np.uint8, buffer=worker.shm.buf, offset=base + offset
+            )
+            target[...] = frame
+
+        future = Future()
+        request_id = next(self.request_ids)
+        with worker.lock:
+            if not worker.ready:
+                worker.free_slots.put(slot)
+                raise RuntimeError(f"Inference worker {worker.index} is restarting")
+            worker.pending[request_id] = (future, slot)
+            conn = worker.conn
+        try:
+            with worker.send_lock:
+                conn.send(("predict", request_id, slot, layout))
+        except OSError:
+            # The reader thread fails the request once it sees the worker exit.
+            pass
+        return future
+
+    def _chunks(self, frames):
+        """Splits a batch evenly over the workers, within the slot size."""
+        per_worker = -(-len(frames) // self.num_workers)
+        chunk, size = [], 0
+        for frame in frames:
+            offset = -(-size // FRAME_ALIGN) * FRAME_ALIGN
+            if chunk and (
+                len(chunk) == per_worker or offset + frame.nbytes > self.slot_bytes
+            ):
+                yield chunk
+                chunk, offset = [], 0
+            chunk.append(frame)
+            size = offset + frame.nbytes
+        if chunk:
+            yield chunk
+
+    def predict(self, frames):
+        if not frames:
+            return []
+        futures = [self.submit(chunk) for chunk in self._chunks(frames)]
+        detections = []
+        for future in futures:
+            detections.extend(future.result())
+        return detections
+
+    def describe(self):
+        return f"{self.name} ({self.num_workers} x {self.workers[0].description})"
+
+    def stats(self):
+        return {
+            "workers": self.num_workers,
+            "ready": sum(worker.ready for worker in self.workers),
+            "in_flight": sum(worker.in_flight() for worker in self.workers),
+            "frames_run": sum(worker.frames_run for worker in self.workers),
+            "restarts": sum(worker.restarts for worker in self.workers),
+        }
+
+    def close(self, timeout=5.0):
+        """Stops the workers and releases the shared memory."""
+        if self.closed:
+            return
+        self.closed = True
+        for worker in self.workers:
+            if worker.conn is not None:
+                try:
+                    with worker.send_lock:
+                        worker.conn.send(None)
+                except OSError:
+                    pass
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            if worker.process is not None:
+                try:
+                    worker.process.wait(max(0.0, deadline - time.monotonic()))
+                except subprocess.TimeoutExpired:
+                    worker.process.kill()
+                    worker.process.wait()
+            worker.shm.close()
+            worker.shm.unlink()
@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceScheduler:
+    """
+    Collects frames submitted by all live streams and runs them through the model
+    together. A batch is dispatched as soon as `max_batch_size` frames are pending
+    or `max_wait_ms` after its first frame arrived, whichever comes first, and each
+    stream gets back the result for its own frame.
+
+    `predict_fn(frames)` must return one result per input frame, in order. With
+    `concurrency` > 1 that many batches can be in flight at once, for a
+    `predict_fn` backed by several model instances.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=8, max_wait_ms=20, concurrency=1):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_sec = max(0.0, max_wait_ms / 1000.0)
+        self.concurrency = max(1, int(concurrency))
+        self.pending = []  # (frame, future)
+        self.cond = threading.Condition()
+        self.threads = []
+        self.stopped = False
+
+        self.batches_run = 0
+        self.frames_run = 0
+        self.last_batch_ms = 0.0
+
+    def submit(self, frame):
+        """Queues a frame and returns a Future resolving to its model result."""
+        future = Future()
+        with self.cond:
+            if self.stopped:
+                raise RuntimeError("Inference scheduler is stopped")
+            if not self.threads:
+                for i in range(self.concurrency):
+                    thread = threading.Thread(
+                        target=self._run, name=f"inference-scheduler-{i}", daemon=True
+                    )
+                    thread.start()
+                    self.threads.append(thread)
+            self.pending.append((frame, future))
+            self.cond.notify()
+        return future
+
+    def infer(self, frame, timeout=None):
+        return self.submit(frame).result(timeout=timeout)
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            queue_depth = len(self.pending)
+        return {
+            "queue_depth": queue_depth,
+            "batches_run": self.batches_run,
+            "frames_run": self.frames_run,
+            "avg_batch_size": (
+                round(self.frames_run / self.batches_run, 2) if self.batches_run else 0
+            ),
+            "last_batch_ms": round(self.last_batch_ms, 1),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_sec * 1000,
+            "concurrency": self.concurrency,
+        }
+
+    def _next_batch(self):
+        with self.cond:
+            while not self.pending and not self.stopped:
+                self.cond.wait()
+            if self.stopped:
+                return []
+            deadline = time.monotonic() + self.max_wait_sec
+            while len(self.pending) < self.max_batch_size and not self.stopped:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            batch = self.pending[: self.max_batch_size]
+            del self.pending[: self.max_batch_size]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                break
+            frames = [frame for frame, _ in batch]
+            start = time.perf_counter()
+            try:
+                results = self.predict_fn(frames)
+            except Exception as e:
+                logger.exception(
+                    f"Batched inference failed for {len(frames)} frames: {e}"
+                )
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.last_batch_ms = (time.perf_counter() - start) * 1000
+            self.batches_run += 1
+            self.frames_run += len(frames)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+        with self.cond:
+            pending, self.pending = self.pending, []
+        for _, future in pending:
+            future.cancel()
@@ -0,0 +1,113 @@
+"""
+Inference worker process started by InferencePool:
+
+    python -m app.services.inference_worker <worker index> <socket fd>
+
+The parent sends ("init", backend config, shared memory name, slot bytes), then
+one ("predict", request id, slot, frame layout) per request, and None to stop.
+Frames are read in place from the shared memory; each reply carries the
+detections packed into one array.
+"""
+
+import gc
+import logging
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Connection
+
+import numpy as np
+
+from .inference_pool import pack_detections
+from .model_backends import create_backend
+
+logger = logging.getLogger(__name__)
+
+
+def attach(name):
+    """Opens the parent's shared memory without taking ownership of it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the block with this process's
+        # resource tracker, which would unlink it when the worker exits.
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def detach(shm, index):
+    """
+    Closes this process's mapping of the shared memory. Views into it that are
+    still alive (say, kept by the backend) make close() raise BufferError; the
+    mapping then simply goes away with the process.
+    """
+    gc.collect()  # views caught in reference cycles, e.g. via tracebacks
+    try:
+        shm.close()
+    except BufferError:
+        logger.warning(
+            f"Inference worker {index}: shared memory still referenced at exit."
+        )
+
+
+def load(config):
+    backend = create_backend(config)
+    size = config.get("MODEL_IMGSZ") or 640
+    start = time.perf_counter()
+    backend.predict([np.zeros((size, size, 3), dtype=np.uint8)])
+    return backend, (time.perf_counter() - start) * 1000
+
+
+def serve(index, conn):
+    _, config, shm_name, slot_bytes = conn.recv()
+    shm = attach(shm_name)
+    try:
+        try:
+            backend, warmup_ms = load(config)
+        except Exception as e:
+            logger.exception(f"Inference worker {index}: failed to load the model: {e}")
+            conn.send(("failed", str(e)))
+            return
+        conn.send(("ready", backend.describe(), warmup_ms))
+
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break  # the parent went away
+            if message is None:
+                break
+            _, request_id, slot, layout = message
+            conn.send(predict(backend, shm, slot * slot_bytes, request_id, layout))
+    finally:
+        backend = None  # drop anything the backend kept from the last frames
+        detach(shm, index)
+
+
+def predict(backend, shm, base, request_id, layout):
+    """
+    Runs one request on frames read in place from the slot at `base`. The
+    views only live in this call, so none outlive the shared memory.
+    """
+    frames = [
+        np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=base + offset)
+        for offset, shape in layout
+    ]
+    try:
+        counts, packed = pack_detections(backend.predict(frames))
+        return ("result", request_id, counts, packed)
+    except Exception as e:
+        logger.exception(f"Inference request {request_id}: prediction failed: {e}")
+        return ("error", request_id, str(e))
+    finally:
+        del frames
+
+
+def main():
+    index, fd = int(sys.argv[1]), int(sys.argv[2])
+    serve(index, Connection(fd))
+
+
+if __name__ == "__main__":
+    main()
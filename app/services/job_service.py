@@ -0,0 +1,209 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+
+class Job:
+    def __init__(self, filepath, media_type, location, area_type):
+        self.id = uuid.uuid4().hex
+        self.filepath = filepath
+        self.filename = os.path.basename(filepath)
+        self.media_type = media_type
+        self.location = location
+        self.area_type = area_type
+        self.status = JOB_QUEUED
+        self.frames_analyzed = 0
+        self.total_frames = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def violation_count(self):
+        if not self.result:
+            return 0
+        if self.media_type == "video":
+            return self.result.get("total_violations", 0)
+        return len(self.result.get("violations", []))
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "media_type": self.media_type,
+            "location": self.location,
+            "area_type": self.area_type,
+            "status": self.status,
+            "progress": {
+                "frames_analyzed": self.frames_analyzed,
+                "total_frames": self.total_frames,
+            },
+            "violation_count": self.violation_count(),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Runs upload processing on a bounded background worker pool so requests return
+    immediately. At most `max_workers` uploads are analysed concurrently and at
+    most `max_pending` may wait in the queue; finished jobs are kept for
+    `retention_sec` so clients can fetch their results.
+    """
+
+    def __init__(self, app, max_workers=2, max_pending=10, retention_sec=3600):
+        self.app = app
+        self.max_pending = max_pending
+        self.retention_sec = retention_sec
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="upload-job"
+        )
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, filepath, media_type, location, area_type):
+        """Queues a saved upload. Returns the Job, or None if the queue is full."""
+        with self.lock:
+            self._prune_finished()
+            pending = sum(1 for job in self.jobs.values() if job.status == JOB_QUEUED)
+            if pending >= self.max_pending:
+                logger.warning(
+                    f"Upload queue full ({pending} pending). Rejecting {filepath}."
+                )
+                return None
+            job = Job(filepath, media_type, location, area_type)
+            self.jobs[job.id] = job
+
+        self.executor.submit(self._run, job)
+        logger.info(f"Queued {media_type} job {job.id} for {job.filename}")
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Requests cancellation. A job still in the queue is cancelled at once so
+        it stops counting towards `max_pending`; a running one stops at its next
+        sampled frame. Returns False if the job is unknown or already finished.
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job.cancel_event.set()
+            dequeued = job.status == JOB_QUEUED
+            if dequeued:
+                job.status = JOB_CANCELLED
+                job.finished_at = time.time()
+        if dequeued:
+            self._remove_upload(job)
+            logger.info(f"Cancelled queued job {job_id}")
+        else:
+            logger.info(f"Cancellation requested for job {job_id}")
+        return True
+
+    def _prune_finished(self):
+        cutoff = time.time() - self.retention_sec
+        expired = [
+            job_id
+            for job_id, job in self.jobs.items()
+            if job.finished and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def _update_progress(self, job, frames_analyzed, total_frames):
+        job.frames_analyzed = frames_analyzed
+        job.total_frames = max(total_frames, frames_analyzed)
+
+    def _run(self, job):
+        with self.lock:
+            if job.status != JOB_QUEUED:
+                return  # cancelled while queued
+            if not job.cancel_event.is_set():
+                job.status = JOB_RUNNING
+                job.started_at = time.time()
+        if job.status != JOB_RUNNING:  # cancelled by shutdown()
+            job.status = JOB_CANCELLED
+            job.finished_at = time.time()
+            self._remove_upload(job)
+            return
+        try:
+            with self.app.app_context():
+                # Waits for the model if it is still loading.
+                detection_service = self.app.detection_loader.get()
+                if detection_service is None:
+                    raise RuntimeError("Detection is not available on this worker.")
+                if job.media_type == "image":
+                    job.total_frames = 1
+                    result = detection_service.process_image(
+                        job.filepath, job.location, job.area_type
+                    )
+                    job.frames_analyzed = 1
+                else:
+                    result = detection_service.process_video(
+                        job.filepath,
+                        job.location,
+                        job.area_type,
+                        progress_callback=lambda done, total: self._update_progress(
+                            job, done, total
+                        ),
+                        cancel_event=job.cancel_event,
+                    )
+
+            job.result = result
+            if result and result.get("cancelled"):
+                job.status = JOB_CANCELLED
+            elif result and "error" in result:
+                job.error = result["error"]
+                job.status = JOB_FAILED
+            else:
+                job.status = JOB_COMPLETED
+        except Exception as e:
+            logger.exception(f"Upload job {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = JOB_FAILED
+        finally:
+            job.finished_at = time.time()
+            self._remove_upload(job)
+            logger.info(
+                f"Job {job.id} {job.status}: {job.frames_analyzed} frames analysed, "
+                f"{job.violation_count()} violation(s)."
+            )
+
+    def _remove_upload(self, job):
+        try:
+            os.remove(job.filepath)
+            logger.info(f"Cleaned up uploaded file: {job.filepath}")
+        except OSError as e:
+            logger.error(f"Error removing uploaded file {job.filepath}: {e}")
+
+    def shutdown(self, wait=False):
+        with self.lock:
+            for job in self.jobs.values():
+                if not job.finished:
+                    job.cancel_event.set()
+        self.executor.shutdown(wait=wait)
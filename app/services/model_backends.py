@@ -0,0 +1,275 @@
+import abc
+import hashlib
+import logging
+import os
+import shutil
+
+import cv2
+import numpy as np
+
+from .postprocessing import Detections
+
+logger = logging.getLogger(__name__)
+
+MODEL_BACKENDS = ("ultralytics", "onnxruntime")
+
+# Added to boxes per class id so one NMS pass never suppresses across classes.
+NMS_CLASS_OFFSET = 7680
+
+
+class ModelBackend(abc.ABC):
+    """
+    Runs the detector. `predict(frames)` takes a list of BGR frames and returns
+    one Detections per frame in original frame coordinates, whatever runtime
+    is underneath.
+    """
+
+    name = None
+
+    @abc.abstractmethod
+    def predict(self, frames):
+        pass
+
+    def describe(self):
+        return self.name
+
+
+class UltralyticsBackend(ModelBackend):
+    """PyTorch weights (or any format Ultralytics loads) through `YOLO`."""
+
+    name = "ultralytics"
+
+    def __init__(self, model_path, conf=0.35, iou=0.7):
+        from ultralytics import YOLO  # imports torch; only when this backend is used
+
+        self.model = YOLO(model_path)
+        self.model_path = model_path
+        self.conf = conf
+        self.iou = iou
+
+    def predict(self, frames):
+        results = self.model(frames, conf=self.conf, iou=self.iou, verbose=False)
+        return [Detections.from_result(result) for result in results]
+
+    def describe(self):
+        return f"{self.name} ({os.path.basename(self.model_path)})"
+
+
+class OnnxRuntimeBackend(ModelBackend):
+    """
+    A YOLOv8 detection model exported to ONNX, run with ONNX Runtime on CPU.
+
+    Pre- and post-processing mirror Ultralytics: frames are letterboxed to the
+    model input size, and the raw (batch, 4 + classes, anchors) output is
+    filtered by confidence, suppressed per class with NMS and mapped back to
+    frame coordinates. Models exported with a dynamic batch axis run a whole
+    batch in one call; static ones run frame by frame.
+    """
+
+    name = "onnxruntime"
+
+    def __init__(
+        self,
+        model_path,
+        conf=0.35,
+        iou=0.7,
+        intra_op_threads=0,
+        inter_op_threads=0,
+        max_det=300,
+    ):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # 0 lets ONNX Runtime pick (one thread per physical core).
+        options.intra_op_num_threads = int(intra_op_threads)
+        options.inter_op_num_threads = int(inter_op_threads)
+        if inter_op_threads and int(inter_op_threads) > 1:
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch, _, height, width = model_input.shape
+        self.dynamic_batch = not isinstance(batch, int)
+        self.input_size = (
+            height if isinstance(height, int) else 640,
+            width if isinstance(width, int) else 640,
+        )
+        self.model_path = model_path
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+
+    def describe(self):
+        return f"{self.name} ({os.path.basename(self.model_path)})"
+
+    def _letterbox(self, frame):
+        """Resizes keeping the aspect ratio and pads to the input size (grey 114)."""
+        target_h, target_w = self.input_size
+        height, width = frame.shape[:2]
+        gain = min(target_h / height, target_w / width)
+        new_w, new_h = int(round(width * gain)), int(round(height * gain))
+        pad_x, pad_y = (target_w - new_w) / 2, (target_h - new_h) / 2
+        if (new_w, new_h) != (width, height):
+            frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+        bottom, right = target_h - new_h - top, target_w - new_w - left
+        frame = cv2.copyMakeBorder(
+            frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114)
+        )
+        return frame, gain, left, top
+
+    def preprocess(self, frames):
+        """Letterboxed input batch plus the per-frame transforms to undo it."""
+        blobs, transforms = [], []
+        for frame in frames:
+            padded, gain, left, top = self._letterbox(frame)
+            blobs.append(padded)
+            transforms.append((gain, left, top, frame.shape[:2]))
+        # BGR HWC uint8 -> RGB CHW float32 in [0, 1]
+        batch = np.stack(blobs)[..., ::-1].transpose(0, 3, 1, 2)
+        return np.ascontiguousarray(batch, dtype=np.float32) / 255.0, transforms
+
+    def _postprocess(self, output, transform):
+        gain, left, top, (height, width) = transform
+        predictions = output.T  # (anchors, 4 + classes)
+        scores = predictions[:, 4:]
+        cls_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), cls_ids]
+        keep = confidences >= self.conf
+        if not keep.any():
+            return Detections.empty()
+        predictions, cls_ids, confidences = (
+            predictions[keep],
+            cls_ids[keep],
+            confidences[keep],
+        )
+
+        cx, cy, w, h = predictions[:, :4].T
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+        offset_boxes = boxes + (cls_ids * NMS_CLASS_OFFSET)[:, None]
+        xywh = np.concatenate(
+            [offset_boxes[:, :2], boxes[:, 2:] - boxes[:, :2]], axis=1
+        )
+        indices = cv2.dnn.NMSBoxes(
+            xywh.tolist(), confidences.tolist(), self.conf, self.iou, top_k=self.max_det
+        )
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)[: self.max_det]
+
+        boxes = boxes[indices]
+        boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - left) / gain).clip(0, width)
+        boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - top) / gain).clip(0, height)
+        return Detections(cls_ids[indices], confidences[indices], boxes)
+
+    def predict(self, frames):
+        if not frames:
+            return []
+        if self.dynamic_batch:
+            groups = [frames]
+        else:
+            groups = [[frame] for frame in frames]
+        detections = []
+        for group in groups:
+            batch, transforms = self.preprocess(group)
+            outputs = self.session.run(None, {self.input_name: batch})[0]
+            detections.extend(
+                self._postprocess(output, transform)
+                for output, transform in zip(outputs, transforms)
+            )
+        return detections
+
+
+def weights_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cached_onnx_path(model_path, cache_dir, imgsz=640):
+    """Where the ONNX export of `model_path` is cached, keyed on its content hash."""
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    key = weights_hash(model_path)[:16]
+    return os.path.join(cache_dir, f"{stem}-{key}-{imgsz}.onnx")
+
+
+def export_onnx(model_path, cache_dir, imgsz=640):
+    """
+    Returns an ONNX export of the weights at `model_path`, exporting it with
+    Ultralytics (which needs torch) only if no export of identical weights is
+    cached. The cache key is the SHA-256 of the weights, so replacing the .pt
+    file triggers a fresh export.
+    """
+    target = cached_onnx_path(model_path, cache_dir, imgsz)
+    if os.path.exists(target):
+        return target
+
+    from ultralytics import YOLO
+
+    logger.info(f"Exporting {model_path} to ONNX (imgsz={imgsz}); cached as {target}")
+    os.makedirs(cache_dir, exist_ok=True)
+    exported = YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=True)
+    # Copy then rename so concurrent workers never load a half-written file.
+    partial = f"{target}.{os.getpid()}.tmp"
+    shutil.copyfile(exported, partial)
+    os.replace(partial, target)
+    return target
+
+
+def quantized_onnx_path(onnx_path):
+    """Default location of the INT8 model quantized from an FP32 ONNX model."""
+    return f"{os.path.splitext(onnx_path)[0]}-int8.onnx"
+
+
+def resolve_onnx_model(config):
+    """Path of the FP32 ONNX model for MODEL_PATH, exporting it if needed."""
+    model_path = config["MODEL_PATH"]
+    if model_path.endswith(".onnx"):
+        return model_path
+    return export_onnx(
+        model_path,
+        config.get("ONNX_CACHE_DIR") or os.path.dirname(model_path),
+        imgsz=config.get("MODEL_IMGSZ", 640),
+    )
+
+
+def create_backend(config):
+    """Builds the detector backend selected by MODEL_BACKEND and MODEL_PRECISION."""
+    backend = config.get("MODEL_BACKEND", "ultralytics")
+    precision = config.get("MODEL_PRECISION", "fp32")
+    conf = config.get("MODEL_CONFIDENCE", 0.35)
+    iou = config.get("MODEL_IOU", 0.7)
+
+    if backend not in MODEL_BACKENDS:
+        logger.warning(f"Unknown model backend '{backend}'. Using 'ultralytics'.")
+        backend = "ultralytics"
+
+    if backend == "onnxruntime":
+        if precision == "int8":
+            model_path = config.get("MODEL_INT8_PATH") or quantized_onnx_path(
+                resolve_onnx_model(config)
+            )
+            if not os.path.exists(model_path):
+                raise FileNotFoundError(
+                    f"INT8 model not found at {model_path}; "
+                    "create it with scripts/quantize_model.py"
+                )
+        else:
+            model_path = resolve_onnx_model(config)
+        return OnnxRuntimeBackend(
+            model_path,
+            conf=conf,
+            iou=iou,
+            intra_op_threads=config.get("ONNX_INTRA_OP_THREADS", 0),
+            inter_op_threads=config.get("ONNX_INTER_OP_THREADS", 0),
+        )
+
+    if precision != "fp32":
+        logger.warning(
+            f"MODEL_PRECISION={precision} needs MODEL_BACKEND=onnxruntime. Using fp32."
+        )
+    return UltralyticsBackend(config["MODEL_PATH"], conf=conf, iou=iou)
@@ -0,0 +1,133 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DETECTION_MODES = ("background", "on_demand", "disabled")
+
+STATE_NOT_LOADED = "not_loaded"
+STATE_LOADING = "loading"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+STATE_DISABLED = "disabled"
+
+
+class DetectionLoader:
+    """
+    Builds the DetectionService (and with it the model) off the request path.
+
+    Modes:
+      - "background": loading starts on a daemon thread as soon as the app is
+        created, so the web routes serve immediately.
+      - "on_demand": loading starts with the first request that needs inference.
+      - "disabled": web-only workers; detection code and the model are never
+        imported or loaded.
+
+    Once the model is loaded, one inference on a blank frame warms it up, so the
+    first real frame does not pay for lazy initialisation inside the runtime.
+    """
+
+    def __init__(self, app, mode="background", warmup_size=640):
+        if mode not in DETECTION_MODES:
+            logger.warning(f"Unknown detection mode '{mode}'. Using 'background'.")
+            mode = "background"
+        self.app = app
+        self.mode = mode
+        self.warmup_size = warmup_size
+        self.service = None
+        self.state = STATE_DISABLED if mode == "disabled" else STATE_NOT_LOADED
+        self.error = None
+        self.load_sec = None
+        self.warmup_ms = None
+        self.ready_event = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def available(self):
+        """False if inference can never become available in this process."""
+        return self.state not in (STATE_DISABLED, STATE_FAILED)
+
+    @property
+    def ready(self):
+        return self.state == STATE_READY
+
+    def start(self):
+        """Starts loading on a background thread, unless already started."""
+        with self.lock:
+            if self.state != STATE_NOT_LOADED:
+                return
+            self.state = STATE_LOADING
+            self.thread = threading.Thread(
+                target=self._load, name="detection-loader", daemon=True
+            )
+            self.thread.start()
+
+    def get(self, timeout=None):
+        """
+        Returns the DetectionService once it is ready, starting the load if
+        needed and waiting up to `timeout` seconds (None waits indefinitely).
+        Returns None if detection is disabled, failed to load or timed out.
+        """
+        if self.state == STATE_DISABLED:
+            return None
+        self.start()
+        self.ready_event.wait(timeout)
+        return self.service if self.ready else None
+
+    def status(self):
+        status = {
+            "mode": self.mode,
+            "state": self.state,
+            "inference_available": self.ready,
+        }
+        if self.error:
+            status["error"] = self.error
+        if self.load_sec is not None:
+            status["load_sec"] = round(self.load_sec, 2)
+        if self.warmup_ms is not None:
+            status["warmup_ms"] = round(self.warmup_ms, 1)
+        if self.service is not None and self.service.model is not None:
+            status["backend"] = self.service.model.describe()
+            if hasattr(self.service.model, "stats"):
+                status["inference_pool"] = self.service.model.stats()
+        return status
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            with self.app.app_context():
+                # Imported here so web-only workers never import the detection stack.
+                from .detection_service import DetectionService
+
+                service = DetectionService()
+            if service.model is None:
+                raise RuntimeError(
+                    "Model could not be loaded; see the log for details."
+                )
+            self.load_sec = time.perf_counter() - start
+            self._warm_up(service)
+            self.service = service
+            self.state = STATE_READY
+            logger.info(
+                f"Detection ready after {self.load_sec:.2f}s "
+                f"(warm-up {self.warmup_ms or 0:.0f}ms)."
+            )
+        except Exception as e:
+            self.error = str(e)
+            self.state = STATE_FAILED
+            logger.exception(f"Failed to initialise detection: {e}")
+        finally:
+            self.ready_event.set()
+
+    def _warm_up(self, service):
+        import numpy as np
+
+        frame = np.zeros((self.warmup_size, self.warmup_size, 3), dtype=np.uint8)
+        start = time.perf_counter()
+        try:
+            service._predict([frame])
+            self.warmup_ms = (time.perf_counter() - start) * 1000
+        except Exception as e:
+            logger.warning(f"Model warm-up failed: {e}")
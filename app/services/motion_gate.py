@@ -0,0 +1,79 @@
+import cv2
+
+
+class MotionGate:
+    """
+    Decides whether a frame differs enough from the last analysed one to be
+    worth running the model on.
+
+    Frames are compared as small blurred grayscale thumbnails `width` pixels
+    wide. A pixel counts as changed when it differs by more than
+    `pixel_threshold` (0-255) from the reference, and the frame counts as changed
+    when more than `min_changed_ratio` of the pixels did. The reference is the
+    last frame that was analysed, so slow drifts (lighting, a person creeping
+    in) still accumulate into a change. A frame is always analysed at least
+    every `max_skip_sec` so stale detections get refreshed.
+
+    The caller stores the detections of analysed frames in `detections` and
+    reuses them for skipped frames (None until the first analysed frame's
+    detections are stored).
+    """
+
+    def __init__(
+        self, width=160, pixel_threshold=25, min_changed_ratio=0.005, max_skip_sec=10.0
+    ):
+        self.width = max(16, int(width))
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_ratio = min_changed_ratio
+        self.max_skip_sec = max_skip_sec
+        self.reference = None
+        self.reference_clock = None
+        self.detections = None
+        self.analysed = 0
+        self.skipped = 0
+
+    def _thumbnail(self, frame):
+        height, width = frame.shape[:2]
+        size = (self.width, max(1, int(round(height * self.width / width))))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def should_analyse(self, frame, clock):
+        """
+        Returns True if `frame` must go through the model, False if the stored
+        `detections` can be reused. `clock` is any monotonic time in seconds.
+        """
+        thumbnail = self._thumbnail(frame)
+        changed = (
+            self.reference is None
+            or self.reference.shape != thumbnail.shape
+            or (self.max_skip_sec and clock - self.reference_clock >= self.max_skip_sec)
+            or self._changed_ratio(thumbnail) > self.min_changed_ratio
+        )
+        if changed:
+            self.reference = thumbnail
+            self.reference_clock = clock
+            self.analysed += 1
+        else:
+            self.skipped += 1
+        return changed
+
+    def invalidate(self):
+        """Forces the next frame through the model, e.g. after inference failed."""
+        self.reference = None
+        self.detections = None
+
+    def _changed_ratio(self, thumbnail):
+        diff = cv2.absdiff(thumbnail, self.reference)
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(mask) / mask.size
+
+    def stats(self):
+        total = self.analysed + self.skipped
+        return {
+            "analysed": self.analysed,
+            "skipped": self.skipped,
+            "skip_ratio": round(self.skipped / total, 3) if total else 0.0,
+        }
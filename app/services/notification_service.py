@@ -1,21 +1,106 @@
+import atexit
+import json
 import logging
 import os
+import queue
+import threading
 import time
-from datetime import datetime, timedelta
+from collections import Counter
+from contextlib import ExitStack
+from datetime import datetime
 
 import requests
 from flask import current_app
+from requests.adapters import HTTPAdapter
+
+from .cooldown_store import create_cooldown_store
 
 logger = logging.getLogger(__name__)
 
-# Use a simple in-memory cache for cooldowns
-last_notification_times = (
-    {}
-)  # Key: (location, area_type, equipment_type), Value: timestamp
+# Telegram limits: media groups hold 2-10 items, captions up to 1024 characters.
+MEDIA_GROUP_MAX_ITEMS = 10
+CAPTION_MAX_LENGTH = 1024
+
+
+def telegram_api_url(token: str):
+    base = current_app.config.get("TELEGRAM_API_BASE") or "https://api.telegram.org"
+    return f"{base.rstrip('/')}/bot{token}/"
+
+
+class SendResult:
+    """
+    Outcome of a Telegram API call; truthy if the message was delivered.
+    `retryable` is set for network errors, 5xx and 429 responses, and
+    `retry_after` to the seconds a 429 asked the client to wait.
+    """
+
+    __slots__ = ("ok", "retryable", "retry_after")
+
+    def __init__(self, ok, retryable=False, retry_after=None):
+        self.ok = ok
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+    def __bool__(self):
+        return self.ok
 
+    def __repr__(self):
+        return (
+            f"<SendResult ok={self.ok} retryable={self.retryable} "
+            f"retry_after={self.retry_after}>"
+        )
+
+
+def classify_response(response, what):
+    """Turns a Bot API response into a SendResult, logging failures."""
+    try:
+        body = response.json()
+    except ValueError:
+        body = {}
+    if response.ok and body.get("ok"):
+        return SendResult(True)
+
+    description = body.get("description") or response.text[:200]
+    logger.error(
+        f"Telegram API error sending {what} ({response.status_code}): {description}"
+    )
+    if response.status_code == 429:
+        retry_after = (body.get("parameters") or {}).get("retry_after")
+        if retry_after is None:
+            retry_after = response.headers.get("Retry-After")
+        try:
+            retry_after = float(retry_after)
+        except (TypeError, ValueError):
+            retry_after = None
+        return SendResult(False, retryable=True, retry_after=retry_after)
+    # Other 4xx (bad token or chat_id, malformed request) fail the same way again.
+    return SendResult(False, retryable=response.status_code >= 500)
 
-def send_telegram_notification(message: str, image_path: str = None):
-    """Sends a notification message via Telegram, optionally with an image."""
+
+def post_telegram(http, url, what, **kwargs):
+    """POSTs to the Bot API and returns a SendResult."""
+    try:
+        response = http.post(url, **kwargs)
+    except requests.exceptions.Timeout:
+        logger.error(f"Telegram API request timed out sending {what}.")
+        return SendResult(False, retryable=True)
+    except requests.exceptions.ConnectionError as e:
+        logger.error(f"Error sending Telegram {what}: {e}")
+        return SendResult(False, retryable=True)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error sending Telegram {what}: {e}")
+        return SendResult(False)
+    return classify_response(response, what)
+
+
+def send_telegram_notification(
+    message: str, image_path: str = None, session: requests.Session = None
+):
+    """
+    Sends a notification message via Telegram, optionally with an image.
+    Returns a SendResult.
+    """
+    http = session or requests
     token = current_app.config.get("TELEGRAM_BOT_TOKEN")
     chat_id = current_app.config.get("TELEGRAM_CHAT_ID")
 
@@ -23,33 +108,39 @@ def send_telegram_notification(message: str, image_path: str = None):
         logger.warning(
             "Telegram token or chat_id not configured. Skipping notification."
         )
-        return False
+        return SendResult(False)
 
-    api_url = f"https://api.telegram.org/bot{token}/"
+    api_url = telegram_api_url(token)
 
     try:
         if image_path:
             # Send photo
-            files = {"photo": open(image_path, "rb")}
-            payload = {"chat_id": chat_id, "caption": message, "parse_mode": "Markdown"}
-            response = requests.post(
-                f"{api_url}sendPhoto", data=payload, files=files, timeout=20
-            )
+            with open(image_path, "rb") as photo:
+                files = {"photo": photo}
+                payload = {
+                    "chat_id": chat_id,
+                    "caption": message,
+                    "parse_mode": "Markdown",
+                }
+                result = post_telegram(
+                    http,
+                    f"{api_url}sendPhoto",
+                    "photo",
+                    data=payload,
+                    files=files,
+                    timeout=20,
+                )
         else:
             # Send text message
             payload = {"chat_id": chat_id, "text": message, "parse_mode": "Markdown"}
-            response = requests.post(f"{api_url}sendMessage", data=payload, timeout=10)
-
-        response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
-
-        if response.json().get("ok"):
+            result = post_telegram(
+                http, f"{api_url}sendMessage", "message", data=payload, timeout=10
+            )
+        if result:
             logger.info(
                 f"Telegram notification sent successfully to chat_id {chat_id}."
             )
-            return True
-        else:
-            logger.error(f"Telegram API error: {response.json().get('description')}")
-            return False
+        return result
 
     except FileNotFoundError:
         logger.error(
@@ -61,53 +152,401 @@ def send_telegram_notification(message: str, image_path: str = None):
             "text": message + "\n\n(Error: Image not found)",
             "parse_mode": "Markdown",
         }
+        result = post_telegram(
+            http,
+            f"{api_url}sendMessage",
+            "text notification (fallback)",
+            data=payload,
+            timeout=10,
+        )
+        if result:
+            logger.info("Telegram text notification sent (image error fallback).")
+        return result
+    except Exception as e:  # Catch any other unexpected errors
+        logger.exception(f"Unexpected error during Telegram notification: {e}")
+        return SendResult(False)
+
+
+def send_telegram_media_group(
+    caption: str, image_paths: list, session: requests.Session = None
+):
+    """
+    Sends up to 10 photos as one Telegram album, captioned on the first photo.
+    Returns a SendResult.
+    """
+    http = session or requests
+    token = current_app.config.get("TELEGRAM_BOT_TOKEN")
+    chat_id = current_app.config.get("TELEGRAM_CHAT_ID")
+
+    if not token or not chat_id:
+        logger.warning(
+            "Telegram token or chat_id not configured. Skipping notification."
+        )
+        return SendResult(False)
+
+    existing = [p for p in image_paths if os.path.exists(p)]
+    existing = existing[:MEDIA_GROUP_MAX_ITEMS]
+    if len(existing) < 2:
+        # Albums need at least two items.
+        return send_telegram_notification(
+            caption, existing[0] if existing else None, session=session
+        )
+
+    media = []
+    for i in range(len(existing)):
+        item = {"type": "photo", "media": f"attach://photo{i}"}
+        if i == 0:
+            item["caption"] = caption[:CAPTION_MAX_LENGTH]
+            item["parse_mode"] = "Markdown"
+        media.append(item)
+
+    try:
+        with ExitStack() as stack:
+            files = {
+                f"photo{i}": stack.enter_context(open(path, "rb"))
+                for i, path in enumerate(existing)
+            }
+            result = post_telegram(
+                http,
+                f"{telegram_api_url(token)}sendMediaGroup",
+                "media group",
+                data={"chat_id": chat_id, "media": json.dumps(media)},
+                files=files,
+                timeout=30,
+            )
+        if result:
+            logger.info(
+                f"Telegram media group with {len(existing)} photos sent "
+                f"to chat_id {chat_id}."
+            )
+        return result
+    except Exception as e:
+        logger.exception(f"Unexpected error during Telegram media group send: {e}")
+        return SendResult(False)
+
+
+class NotificationDispatcher:
+    """
+    Sends Telegram notifications from a background thread so detection never
+    waits on the Telegram API. Messages go over one pooled keep-alive
+    `requests.Session`. Sends that failed in a retryable way (network errors,
+    5xx, 429) are retried up to `max_retries` times with exponential backoff,
+    waiting at least the `retry_after` a 429 asked for; other 4xx errors (bad
+    token or chat_id, oversized media) are not retried. When `max_queue`
+    messages are waiting, new ones are dropped rather than blocking the caller.
+    """
+
+    def __init__(
+        self,
+        app,
+        max_queue=500,
+        max_retries=3,
+        backoff_base_sec=1.0,
+        backoff_max_sec=30.0,
+    ):
+        self.app = app
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.max_retries = max_retries
+        self.backoff_base_sec = backoff_base_sec
+        self.backoff_max_sec = backoff_max_sec
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.last_send_ms = 0.0
+        self.avg_send_ms = 0.0
+
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(
+            target=self._run, name="notification-dispatcher", daemon=True
+        )
+        self.thread.start()
+
+    def enqueue(self, message, image_paths=()):
+        """
+        Queues a notification with zero, one or several (sent as an album)
+        images. Returns False if the queue is full.
+        """
         try:
-            response = requests.post(f"{api_url}sendMessage", data=payload, timeout=10)
-            response.raise_for_status()
-            if response.json().get("ok"):
-                logger.info(f"Telegram text notification sent (image error fallback).")
-                return True
-            else:
-                logger.error(
-                    f"Telegram API error (fallback): {response.json().get('description')}"
+            self.queue.put_nowait((message, tuple(image_paths), time.monotonic()))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Notification queue full. Dropping notification.")
+            return False
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue.qsize(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "last_send_ms": round(self.last_send_ms, 1),
+            "avg_send_ms": round(self.avg_send_ms, 1),
+        }
+
+    def stop(self, timeout=5.0):
+        """Stops the worker after it has drained the queue (bounded by `timeout`)."""
+        self.stop_event.set()
+        self.thread.join(timeout)
+        self.session.close()
+
+    def _run(self):
+        with self.app.app_context():
+            while not (self.stop_event.is_set() and self.queue.empty()):
+                try:
+                    message, image_paths, queued_at = self.queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                self._deliver(message, image_paths, queued_at)
+
+    def _send(self, message, image_paths):
+        """Sends one notification and returns its SendResult."""
+        if len(image_paths) > 1:
+            return send_telegram_media_group(message, image_paths, session=self.session)
+        image_path = image_paths[0] if image_paths else None
+        return send_telegram_notification(message, image_path, session=self.session)
+
+    def _retry_delay(self, attempt, result):
+        delay = min(self.backoff_base_sec * (2 ** (attempt - 1)), self.backoff_max_sec)
+        if result.retry_after is not None:
+            # Sending earlier would only be rejected again and extend the limit.
+            delay = max(delay, result.retry_after)
+        return delay
+
+    def _deliver(self, message, image_paths, queued_at):
+        result = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+                if self.stop_event.wait(self._retry_delay(attempt, result)):
+                    break  # Shutting down; don't sleep through the backoff.
+            start = time.perf_counter()
+            result = self._send(message, image_paths)
+            self.last_send_ms = (time.perf_counter() - start) * 1000
+            self.avg_send_ms = 0.8 * self.avg_send_ms + 0.2 * self.last_send_ms
+            if result:
+                self.sent += 1
+                logger.debug(
+                    f"Notification delivered {time.monotonic() - queued_at:.2f}s "
+                    "after queueing."
                 )
+                return True
+            if result.retry_after is not None:
+                self.rate_limited += 1
+            if not result.retryable:
+                self.failed += 1
+                logger.error("Notification rejected by Telegram; not retrying.")
                 return False
-        except requests.exceptions.RequestException as e_fallback:
-            logger.error(
-                f"Error sending Telegram text notification (fallback): {e_fallback}"
-            )
-            return False
-    except requests.exceptions.Timeout:
-        logger.error("Telegram API request timed out.")
-        return False
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error sending Telegram notification: {e}")
-        # Log detailed error if available
-        if hasattr(e, "response") and e.response is not None:
-            try:
-                logger.error(f"Telegram API response content: {e.response.text}")
-            except Exception:  # Handle cases where response text isn't readable
-                logger.error("Could not read Telegram API error response content.")
-        return False
-    except Exception as e:  # Catch any other unexpected errors
-        logger.exception(f"Unexpected error during Telegram notification: {e}")
+        self.failed += 1
+        logger.error(f"Giving up on notification after {attempt + 1} attempt(s).")
         return False
 
 
+class DigestCoalescer:
+    """
+    Collects violations per site (location) for `window_sec` after the first one
+    and then sends a single digest: an album of up to 10 snapshots, highest
+    severity first, captioned with counts per violation type and severity.
+    """
+
+    def __init__(self, dispatcher, window_sec=30.0):
+        self.dispatcher = dispatcher
+        self.window_sec = window_sec
+        self.sites = {}  # location -> (due monotonic time, [events])
+        self.cond = threading.Condition()
+        self.stopped = False
+        self.digests_sent = 0
+        self.violations_coalesced = 0
+        self.thread = threading.Thread(
+            target=self._run, name="notification-digest", daemon=True
+        )
+        self.thread.start()
+
+    def add(self, location, area_type, violation_type, severity, image_path, when):
+        event = {
+            "area_type": area_type,
+            "type": violation_type,
+            "severity": severity.lower(),
+            "image_path": image_path,
+            "time": when,
+        }
+        with self.cond:
+            if location not in self.sites:
+                self.sites[location] = (time.monotonic() + self.window_sec, [])
+                self.cond.notify()
+            self.sites[location][1].append(event)
+            self.violations_coalesced += 1
+
+    def stats(self):
+        with self.cond:
+            pending = sum(len(events) for _, events in self.sites.values())
+        return {
+            "pending_sites": len(self.sites),
+            "pending_violations": pending,
+            "violations_coalesced": self.violations_coalesced,
+            "digests_sent": self.digests_sent,
+        }
+
+    def stop(self):
+        """Sends all pending digests immediately."""
+        with self.cond:
+            self.stopped = True
+            self.cond.notify()
+        self.thread.join(5.0)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.stopped:
+                    now = time.monotonic()
+                    due = [loc for loc, (at, _) in self.sites.items() if at <= now]
+                    if due:
+                        break
+                    next_due = min((at for at, _ in self.sites.values()), default=None)
+                    self.cond.wait(None if next_due is None else next_due - now)
+                if self.stopped:
+                    due = list(self.sites)
+                batches = [(loc, self.sites.pop(loc)[1]) for loc in due]
+                stopped = self.stopped
+
+            for location, events in batches:
+                caption, image_paths = format_digest(location, events)
+                if self.dispatcher.enqueue(caption, image_paths):
+                    self.digests_sent += 1
+            if stopped:
+                return
+
+
+def format_digest(location, events):
+    """Builds the digest caption and picks the snapshots to attach."""
+    severity_rank = {"high": 0, "medium": 1, "low": 2}
+    by_type = Counter(event["type"] for event in events)
+    by_severity = Counter(event["severity"] for event in events)
+    areas = sorted({event["area_type"] for event in events})
+    first = min(event["time"] for event in events)
+    last = max(event["time"] for event in events)
+    worst = min(by_severity, key=lambda sev: severity_rank.get(sev, 3))
+    severity_emoji = {"high": "🚨", "medium": "⚠️", "low": "ℹ️"}
+    emoji = severity_emoji.get(worst, "⚠️")
+
+    lines = [
+        f"{emoji} *PPE Violation Digest* {emoji}",
+        "",
+        f"*{len(events)}* violation(s) at *{location}* ({', '.join(areas)})",
+        f"{first.strftime('%H:%M:%S')} - {last.strftime('%H:%M:%S')}",
+        "",
+        "*By type:*",
+    ]
+    lines += [f"- {vtype}: {count}" for vtype, count in by_type.most_common()]
+    lines += ["", "*By severity:*"]
+    lines += [
+        f"- {sev.upper()}: {by_severity[sev]}"
+        for sev in sorted(by_severity, key=lambda sev: severity_rank.get(sev, 3))
+    ]
+
+    image_paths = []
+    for event in sorted(events, key=lambda e: severity_rank.get(e["severity"], 3)):
+        path = event["image_path"]
+        if path and path not in image_paths:
+            image_paths.append(path)
+        if len(image_paths) == MEDIA_GROUP_MAX_ITEMS:
+            break
+    return "\n".join(lines)[:CAPTION_MAX_LENGTH], image_paths
+
+
+dispatcher = None
+coalescer = None
+cooldown_store = None
+dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    global dispatcher
+    with dispatcher_lock:
+        if dispatcher is None:
+            app = current_app._get_current_object()
+            dispatcher = NotificationDispatcher(
+                app,
+                max_queue=app.config.get("NOTIFICATION_QUEUE_SIZE", 500),
+                max_retries=app.config.get("NOTIFICATION_MAX_RETRIES", 3),
+                backoff_base_sec=app.config.get("NOTIFICATION_BACKOFF_SEC", 1.0),
+            )
+            atexit.register(dispatcher.stop)
+    return dispatcher
+
+
+def get_coalescer():
+    global coalescer
+    dispatcher = get_dispatcher()
+    with dispatcher_lock:
+        if coalescer is None:
+            coalescer = DigestCoalescer(
+                dispatcher,
+                window_sec=current_app.config.get("NOTIFICATION_DIGEST_WINDOW_SEC", 30),
+            )
+            # Registered after the dispatcher, so atexit runs it first and the
+            # final digests are still delivered.
+            atexit.register(coalescer.stop)
+    return coalescer
+
+
+def get_cooldown_store():
+    global cooldown_store
+    with dispatcher_lock:
+        if cooldown_store is None:
+            cooldown_store = create_cooldown_store(current_app.config)
+    return cooldown_store
+
+
 def notify_violation(
     violation_type: str, location: str, area_type: str, severity: str, image_path: str
 ):
-    """Formats and sends a violation notification, respecting cooldown."""
-    cooldown_period = timedelta(
-        seconds=current_app.config.get("NOTIFICATION_COOLDOWN", 60)
-    )
+    """Formats and queues a violation notification, respecting cooldown."""
+    if not current_app.config.get("TELEGRAM_BOT_TOKEN") or not current_app.config.get(
+        "TELEGRAM_CHAT_ID"
+    ):
+        logger.debug("Telegram not configured. Skipping notification.")
+        return False
+
+    # Use the absolute path for sending; violations logged without a snapshot
+    # are sent as text only.
+    full_image_path = None
+    if image_path:
+        full_image_path = os.path.join(
+            current_app.config["VIOLATION_IMAGE_FOLDER"], os.path.basename(image_path)
+        )
+
+    if current_app.config.get("NOTIFICATION_MODE") == "digest":
+        # The digest window rate-limits messages itself and its counts should
+        # cover every violation, so the per-key cooldown does not apply.
+        get_coalescer().add(
+            location,
+            area_type,
+            violation_type,
+            severity,
+            full_image_path,
+            datetime.now(),
+        )
+        return True
+
+    cooldown_period = current_app.config.get("NOTIFICATION_COOLDOWN", 60)
     now = datetime.now()
 
-    # Cooldown key: Tuple of identifying factors
+    # Cooldown key: Tuple of identifying factors. Claiming it is atomic, so with
+    # a shared backend only one worker process sends for the key.
     cooldown_key = (location, area_type, violation_type)
-    last_sent = last_notification_times.get(cooldown_key)
-
-    if last_sent and (now - last_sent) < cooldown_period:
+    store = get_cooldown_store()
+    if not store.acquire(cooldown_key, cooldown_period):
         logger.debug(f"Notification cooldown active for {cooldown_key}. Skipping.")
         return False
 
@@ -129,12 +568,10 @@ A *{severity.upper()}* severity violation was detected.
 
 Please investigate and ensure compliance.
 """
-    # Use the absolute path for sending
-    full_image_path = os.path.join(
-        current_app.config["VIOLATION_IMAGE_FOLDER"], os.path.basename(image_path)
-    )
-
-    if send_telegram_notification(message, full_image_path):
-        last_notification_times[cooldown_key] = now  # Update last sent time on success
+    # Delivery happens in the background, so the cooldown starts when the
+    # notification is queued rather than when Telegram confirms it.
+    image_paths = [full_image_path] if full_image_path else []
+    if get_dispatcher().enqueue(message, image_paths):
         return True
+    store.release(cooldown_key)
     return False
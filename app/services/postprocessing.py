@@ -0,0 +1,115 @@
+import datetime
+
+import numpy as np
+
+
+class Detections:
+    """Detections of one frame as parallel NumPy arrays (class ids, scores, xyxy boxes)."""
+
+    __slots__ = ("cls_ids", "confidences", "boxes")
+
+    def __init__(self, cls_ids, confidences, boxes):
+        self.cls_ids = np.asarray(cls_ids, dtype=np.int64).reshape(-1)
+        self.confidences = np.asarray(confidences, dtype=np.float32).reshape(-1)
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+
+    def __len__(self):
+        return len(self.cls_ids)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0), np.empty(0), np.empty((0, 4)))
+
+    @classmethod
+    def from_result(cls, result):
+        """Moves an Ultralytics result's boxes to NumPy in a single transfer."""
+        if result is None or result.boxes is None or len(result.boxes) == 0:
+            return cls.empty()
+        boxes = result.boxes.cpu().numpy()
+        return cls(boxes.cls, boxes.conf, boxes.xyxy)
+
+    def select(self, mask):
+        return Detections(self.cls_ids[mask], self.confidences[mask], self.boxes[mask])
+
+    def translate(self, dx, dy):
+        """Shifts the boxes, e.g. from crop back to full-frame coordinates."""
+        if not dx and not dy:
+            return self
+        offset = np.array([dx, dy, dx, dy], dtype=np.float32)
+        return Detections(self.cls_ids, self.confidences, self.boxes + offset)
+
+
+class PostProcessor:
+    """
+    Turns Detections into the detection/violation records used throughout the app.
+    Class labels, violation flags and severities are resolved through lookup
+    arrays indexed by class id, built once from the configuration.
+    """
+
+    def __init__(self, class_mapping, violation_classes, severity_fn):
+        size = max(class_mapping, default=-1) + 1
+        self.labels = np.array(
+            [class_mapping.get(i, f"Unknown_{i}") for i in range(size)], dtype=object
+        )
+        self.violation_lookup = np.array(
+            [label in violation_classes for label in self.labels], dtype=bool
+        )
+        self.severity_lookup = np.array(
+            [
+                severity_fn(label) if flag else None
+                for label, flag in zip(self.labels, self.violation_lookup)
+            ],
+            dtype=object,
+        )
+
+    def _in_range(self, cls_ids):
+        return cls_ids < len(self.labels)
+
+    def labels_for(self, cls_ids):
+        in_range = self._in_range(cls_ids)
+        if in_range.all():
+            return self.labels[cls_ids].tolist()
+        return [
+            self.labels[c] if ok else f"Unknown_{c}"
+            for c, ok in zip(cls_ids.tolist(), in_range.tolist())
+        ]
+
+    def violation_mask(self, cls_ids):
+        mask = np.zeros(len(cls_ids), dtype=bool)
+        in_range = self._in_range(cls_ids)
+        mask[in_range] = self.violation_lookup[cls_ids[in_range]]
+        return mask
+
+    def build(self, detections, **violation_extra):
+        """
+        Returns (detection_records, violation_records, labels, violation_mask).
+        `violation_extra` is merged into every violation record (e.g. frame time).
+        """
+        if not len(detections):
+            return [], [], [], np.zeros(0, dtype=bool)
+
+        labels = self.labels_for(detections.cls_ids)
+        mask = self.violation_mask(detections.cls_ids)
+        confidences = detections.confidences.tolist()
+        boxes = detections.boxes.tolist()
+
+        detection_records = [
+            {"label": label, "confidence": conf, "bbox": bbox}
+            for label, conf, bbox in zip(labels, confidences, boxes)
+        ]
+
+        violation_records = []
+        if mask.any():
+            now = datetime.datetime.now()
+            for i in np.flatnonzero(mask).tolist():
+                violation_records.append(
+                    {
+                        "type": labels[i],
+                        "severity": self.severity_lookup[detections.cls_ids[i]],
+                        "confidence": confidences[i],
+                        "bbox": boxes[i],
+                        "timestamp": now,
+                        **violation_extra,
+                    }
+                )
+        return detection_records, violation_records, labels, mask
@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class StreamRateCoordinator:
+    """
+    Splits an inference budget fairly between the live streams sharing the model.
+
+    The budget is expressed in inference-seconds per second: 1.0 means the
+    streams together may keep the model busy continuously. Each stream's demand
+    is the time it would spend at its maximum frame rate (max_fps x latency).
+    Shares are assigned max-min fairly: streams needing less than an equal split
+    get what they need (e.g. idle cameras whose frames are motion-gated) and
+    the rest is divided evenly among the others.
+    """
+
+    def __init__(self, budget=1.0):
+        self.budget = max(0.01, float(budget))
+        self.controllers = set()
+        self.lock = threading.Lock()
+
+    def register(self, controller):
+        with self.lock:
+            self.controllers.add(controller)
+            self._rebalance()
+
+    def unregister(self, controller):
+        with self.lock:
+            self.controllers.discard(controller)
+            self._rebalance()
+
+    def rebalance(self):
+        with self.lock:
+            self._rebalance()
+
+    def _rebalance(self):
+        remaining = self.budget
+        by_demand = sorted(self.controllers, key=lambda c: c.demand())
+        for i, controller in enumerate(by_demand):
+            fair = remaining / (len(by_demand) - i)
+            share = min(controller.demand(), fair)
+            controller.share = share
+            remaining -= share
+
+
+class AdaptiveRateController:
+    """
+    Decides how many frames per second a live stream sends through inference.
+
+    The measured latency of each inference (including time spent waiting in the
+    cross-stream batch) is smoothed, and the frame rate is adjusted
+    additive-increase / multiplicative-decrease: it backs off sharply when the
+    latency exceeds `latency_budget_sec` and creeps up again otherwise. It never
+    exceeds what the stream's share of the coordinator's budget allows
+    (share / latency), nor the [min_fps, max_fps] range.
+    """
+
+    def __init__(
+        self,
+        coordinator=None,
+        min_fps=0.5,
+        max_fps=10.0,
+        latency_budget_sec=0.5,
+        increase_step=0.5,
+        decrease_factor=0.7,
+    ):
+        self.coordinator = coordinator
+        self.min_fps = max(0.01, float(min_fps))
+        self.max_fps = max(self.min_fps, float(max_fps))
+        self.latency_budget_sec = latency_budget_sec
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+
+        self.fps = max(self.min_fps, self.max_fps / 2)
+        self.latency_sec = None
+        self.share = None
+        self.next_due = 0.0
+
+    def demand(self):
+        """Inference time per second this stream would use at max_fps."""
+        if self.latency_sec is None:
+            return float("inf")
+        return self.max_fps * self.latency_sec
+
+    def start(self):
+        if self.coordinator is not None:
+            self.coordinator.register(self)
+
+    def stop(self):
+        if self.coordinator is not None:
+            self.coordinator.unregister(self)
+
+    def time_until_due(self, now=None):
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.next_due - now)
+
+    def record(self, started_at, latency_sec):
+        """Feeds back one inference that started at `started_at` (monotonic)."""
+        if self.latency_sec is None:
+            self.latency_sec = latency_sec
+        else:
+            self.latency_sec = 0.8 * self.latency_sec + 0.2 * latency_sec
+        if self.coordinator is not None:
+            self.coordinator.rebalance()
+
+        if self.latency_sec > self.latency_budget_sec:
+            fps = self.fps * self.decrease_factor
+        else:
+            fps = self.fps + self.increase_step
+        if self.share is not None and self.latency_sec > 0:
+            fps = min(fps, self.share / self.latency_sec)
+        self.fps = min(self.max_fps, max(self.min_fps, fps))
+        self.next_due = started_at + 1.0 / self.fps
+
+    def stats(self):
+        return {
+            "target_fps": round(self.fps, 2),
+            "inference_latency_ms": round((self.latency_sec or 0.0) * 1000, 1),
+            "budget_share": None if self.share is None else round(self.share, 3),
+        }
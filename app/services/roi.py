@@ -0,0 +1,78 @@
+import logging
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class RegionOfInterest:
+    """
+    One or more polygons, in coordinates normalised to [0, 1] of the frame size,
+    that delimit the part of a camera view to analyse.
+
+    `crop` cuts the frame down to the bounding rectangle of all polygons before
+    inference, and `restore` maps the detections back to full-frame
+    coordinates, dropping those whose box centre lies outside the polygons.
+    Pixel geometry is computed once per frame size.
+    """
+
+    def __init__(self, polygons):
+        self.polygons = []
+        for polygon in polygons:
+            points = np.asarray(polygon, dtype=np.float32)
+            if points.ndim != 2 or points.shape[0] < 3 or points.shape[1] != 2:
+                logger.warning(f"Ignoring invalid ROI polygon: {polygon}")
+                continue
+            self.polygons.append(np.clip(points, 0.0, 1.0))
+        self.geometry = {}  # (height, width) -> (x1, y1, x2, y2, crop mask)
+
+    def __bool__(self):
+        return bool(self.polygons)
+
+    def _geometry(self, shape):
+        height, width = shape[:2]
+        geometry = self.geometry.get((height, width))
+        if geometry is None:
+            scale = np.array([width - 1, height - 1], dtype=np.float32)
+            pixel_polygons = [
+                np.round(p * scale).astype(np.int32) for p in self.polygons
+            ]
+            all_points = np.concatenate(pixel_polygons)
+            x1, y1 = all_points.min(axis=0)
+            x2, y2 = all_points.max(axis=0) + 1
+            mask = np.zeros((y2 - y1, x2 - x1), dtype=np.uint8)
+            cv2.fillPoly(mask, [p - [x1, y1] for p in pixel_polygons], 1)
+            geometry = (int(x1), int(y1), int(x2), int(y2), mask)
+            self.geometry[(height, width)] = geometry
+        return geometry
+
+    def crop(self, frame):
+        """Returns a view of the frame's region to analyse (no copy)."""
+        x1, y1, x2, y2, _ = self._geometry(frame.shape)
+        return frame[y1:y2, x1:x2]
+
+    def restore(self, detections, frame_shape):
+        """Maps detections made on `crop(frame)` back onto the full frame."""
+        if len(detections) == 0:
+            return detections
+        x1, y1, _, _, mask = self._geometry(frame_shape)
+        boxes = detections.boxes
+        cx = ((boxes[:, 0] + boxes[:, 2]) / 2).astype(np.int64)
+        cy = ((boxes[:, 1] + boxes[:, 3]) / 2).astype(np.int64)
+        cx = np.clip(cx, 0, mask.shape[1] - 1)
+        cy = np.clip(cy, 0, mask.shape[0] - 1)
+        inside = mask[cy, cx].astype(bool)
+        return detections.select(inside).translate(x1, y1)
+
+
+def load_rois(config):
+    """Builds RegionOfInterest objects from the CAMERA_ROIS and AREA_ROIS settings."""
+    rois = {}
+    for setting in ("CAMERA_ROIS", "AREA_ROIS"):
+        rois[setting] = {}
+        for key, polygons in (config.get(setting) or {}).items():
+            roi = RegionOfInterest(polygons)
+            if roi:
+                rois[setting][key] = roi
+    return rois["CAMERA_ROIS"], rois["AREA_ROIS"]
@@ -0,0 +1,144 @@
+import datetime
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+QUEUE_POLICIES = ("drop", "block")
+
+
+class SnapshotWriter:
+    """
+    Annotates and JPEG-encodes violation snapshots on a small thread pool so the
+    detection thread never waits on disk.
+
+    At most `max_pending` snapshots may be queued or in flight. When the queue is
+    full the "drop" policy skips the snapshot (and with it the violation's log
+    entry and notification) while "block" makes the caller wait for a free slot.
+    Frames wider than `max_width` are downscaled before encoding.
+    """
+
+    def __init__(
+        self,
+        app,
+        image_folder,
+        max_workers=2,
+        max_pending=32,
+        jpeg_quality=90,
+        max_width=0,
+        policy="drop",
+    ):
+        if policy not in QUEUE_POLICIES:
+            logger.warning(f"Unknown snapshot queue policy '{policy}'. Using 'drop'.")
+            policy = "drop"
+        self.app = app
+        self.image_folder = image_folder
+        self.jpeg_quality = int(jpeg_quality)
+        self.max_width = int(max_width or 0)
+        self.policy = policy
+        self.slots = threading.BoundedSemaphore(max(1, int(max_pending)))
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(1, int(max_workers)), thread_name_prefix="snapshot"
+        )
+        self.saved = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def submit(
+        self, image, violation_details, location, area_type, on_saved, bbox_scale=1.0
+    ):
+        """
+        Queues an annotated snapshot of `image`. `bbox_scale` converts the
+        violation boxes to `image` coordinates when they were detected on a
+        downscaled copy. `on_saved(relative_path)` runs in an app context once
+        the file is written, with None if writing failed.
+        Returns False if the snapshot was dropped because the queue is full;
+        `on_saved` is not called in that case. The caller must not modify
+        `image` afterwards.
+        """
+        if not self.slots.acquire(blocking=self.policy == "block"):
+            self.dropped += 1
+            logger.warning(
+                f"Snapshot queue full, dropping violation image for {location}."
+            )
+            return False
+
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        filename = f"violation_{location}_{area_type}_{timestamp}.jpg"
+        try:
+            self.executor.submit(
+                self._write, image, violation_details, filename, on_saved, bbox_scale
+            )
+        except RuntimeError:  # executor shut down
+            self.slots.release()
+            return False
+        return True
+
+    def stats(self):
+        return {
+            "saved": self.saved,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "policy": self.policy,
+        }
+
+    def _annotate(self, image, violation_details, bbox_scale=1.0):
+        scale = 1.0
+        height, width = image.shape[:2]
+        if self.max_width and width > self.max_width:
+            scale = self.max_width / width
+            annotated_img = cv2.resize(
+                image,
+                (self.max_width, int(round(height * scale))),
+                interpolation=cv2.INTER_AREA,
+            )
+        else:
+            annotated_img = image.copy()
+        scale *= bbox_scale
+
+        for detail in violation_details:
+            if "bbox" in detail and len(detail["bbox"]) == 4:
+                x1, y1, x2, y2 = (int(v * scale) for v in detail["bbox"])
+                cv2.rectangle(annotated_img, (x1, y1), (x2, y2), (0, 0, 255), 2)
+                cv2.putText(
+                    annotated_img,
+                    f"Violation: {detail.get('type', 'Unknown')}",
+                    (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    0.6,
+                    (0, 0, 255),
+                    2,
+                )
+        return annotated_img
+
+    def _write(self, image, violation_details, filename, on_saved, bbox_scale=1.0):
+        absolute_filepath = os.path.join(self.image_folder, filename)
+        relative_filepath = None
+        try:
+            annotated_img = self._annotate(image, violation_details, bbox_scale)
+            params = [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality]
+            if cv2.imwrite(absolute_filepath, annotated_img, params):
+                self.saved += 1
+                relative_filepath = os.path.join("images", filename)
+                logger.info(f"Violation image saved: {absolute_filepath}")
+            else:
+                self.failed += 1
+                logger.error(f"Error saving violation image {absolute_filepath}")
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Error saving violation image {absolute_filepath}: {e}")
+        finally:
+            self.slots.release()
+
+        try:
+            with self.app.app_context():
+                on_saved(relative_filepath)
+        except Exception as e:
+            logger.exception(f"Snapshot callback failed for {filename}: {e}")
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,113 @@
+import datetime
+import hashlib
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CachedStats:
+    __slots__ = ("stats", "etag", "last_modified", "generation", "expires_at")
+
+    def __init__(self, stats, etag, last_modified, generation, expires_at):
+        self.stats = stats
+        self.etag = etag
+        self.last_modified = last_modified
+        self.generation = generation
+        self.expires_at = expires_at
+
+
+class StatsCache:
+    """
+    Holds the dashboard stats payload so concurrent viewers share one
+    computation. An entry is reused until `ttl_sec` passes or `invalidate()`
+    is called (on a violation insert or status change); only one thread
+    recomputes it while the others wait for the result.
+
+    Each entry carries an ETag derived from the payload and the time the
+    payload last changed, for conditional GETs. Recomputing identical stats
+    keeps both, so viewers still get 304 after an unrelated invalidation.
+
+    Invalidation is per process; in other processes the TTL bounds staleness.
+    """
+
+    def __init__(self, ttl_sec=30):
+        self.ttl_sec = ttl_sec
+        self.lock = threading.Lock()
+        self.compute_lock = threading.Lock()
+        self.entry = None
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def invalidate(self):
+        with self.lock:
+            self.generation += 1
+            self.invalidations += 1
+
+    def _fresh(self):
+        entry = self.entry
+        if (
+            entry is not None
+            and entry.generation == self.generation
+            and time.monotonic() < entry.expires_at
+        ):
+            return entry
+        return None
+
+    def get(self, compute):
+        """
+        Returns a CachedStats for the current data, calling `compute()` for the
+        stats dict if the cached one is stale. Payloads with an "error" key are
+        returned uncached, with no ETag.
+        """
+        with self.lock:
+            entry = self._fresh()
+            if entry is not None:
+                self.hits += 1
+                return entry
+
+        with self.compute_lock:
+            with self.lock:
+                entry = self._fresh()
+                if entry is not None:
+                    self.hits += 1
+                    return entry
+                self.misses += 1
+                generation = self.generation
+                previous = self.entry
+
+            start = time.perf_counter()
+            stats = compute()
+            if "error" in stats:
+                return CachedStats(stats, None, None, generation, 0)
+            payload = json.dumps(stats, sort_keys=True, default=str).encode("utf8")
+            etag = hashlib.sha1(payload).hexdigest()[:20]
+            if previous is not None and previous.etag == etag:
+                last_modified = previous.last_modified
+            else:
+                last_modified = datetime.datetime.now(datetime.timezone.utc).replace(
+                    microsecond=0
+                )
+            entry = CachedStats(
+                stats, etag, last_modified, generation, time.monotonic() + self.ttl_sec
+            )
+            logger.debug(
+                f"Dashboard stats computed in {(time.perf_counter() - start) * 1000:.1f}ms."
+            )
+            with self.lock:
+                # A write during the computation leaves the entry already stale.
+                self.entry = entry
+            return entry
+
+    def stats(self):
+        return {
+            "ttl_sec": self.ttl_sec,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
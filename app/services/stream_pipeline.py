@@ -0,0 +1,337 @@
+import collections
+import logging
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from .frame_scaling import downscale_frame
+from .rate_controller import AdaptiveRateController
+
+logger = logging.getLogger(__name__)
+
+
+class FpsMeter:
+    """Counts events over a sliding window to report a per-stage frame rate."""
+
+    def __init__(self, window_sec=5.0):
+        self.window_sec = window_sec
+        self.events = collections.deque()
+        self.lock = threading.Lock()
+        self.total = 0
+
+    def tick(self):
+        now = time.monotonic()
+        with self.lock:
+            self.total += 1
+            self.events.append(now)
+            self._trim(now)
+
+    def _trim(self, now):
+        while self.events and now - self.events[0] > self.window_sec:
+            self.events.popleft()
+
+    @property
+    def fps(self):
+        now = time.monotonic()
+        with self.lock:
+            self._trim(now)
+            if len(self.events) < 2:
+                return 0.0
+            span = now - self.events[0]
+            return len(self.events) / span if span > 0 else 0.0
+
+
+class DropOldestQueue:
+    """
+    Bounded hand-off between pipeline stages. When full, `put` discards the
+    oldest item instead of blocking, so a slow consumer always sees fresh data.
+    With maxsize=1 it behaves as a "latest value" slot.
+    """
+
+    def __init__(self, maxsize=1):
+        self.items = collections.deque(maxlen=maxsize)
+        self.cond = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item):
+        with self.cond:
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1
+            self.items.append(item)
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        """Returns the next item, or None on timeout or once the queue is closed."""
+        with self.cond:
+            if not self.items and not self.closed:
+                self.cond.wait(timeout)
+            if not self.items:
+                return None
+            return self.items.popleft()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class StreamPipeline:
+    """
+    Runs a live stream as three threads connected by bounded queues:
+
+      capture -+-> [latest frame] -> inference -> (detections, violations)
+               +-> [latest frame] -> encode (annotate with latest detections)
+                                            -> [latest JPEG]
+
+    Capture always overwrites the pending frames. Inference is paced by an
+    AdaptiveRateController, which picks the analysed frame rate from the
+    measured inference latency and the stream's fair share of the model, and
+    drops frames older than `max_frame_age_sec`. The preview is independent of
+    inference: every encoded frame (up to `preview_max_fps`) is annotated with
+    the stream's most recent detections.
+    """
+
+    def __init__(
+        self,
+        app,
+        detection_service,
+        stream_url,
+        stream_id,
+        area_type="default",
+        jpeg_quality=80,
+        max_frame_age_sec=1.0,
+        min_fps=0.5,
+        max_fps=10.0,
+        latency_budget_sec=0.5,
+        preview_max_fps=15.0,
+    ):
+        self.app = app
+        self.detection_service = detection_service
+        self.stream_url = stream_url
+        self.stream_id = stream_id
+        self.stream_label = f"Stream_{stream_id}"
+        self.area_type = area_type
+        self.jpeg_quality = int(jpeg_quality)
+        self.max_frame_age_sec = max_frame_age_sec
+        self.roi = detection_service.roi_for(area_type, stream_url)
+        self.inference_size = detection_service.inference_size_for(
+            area_type, stream_url
+        )
+        self.preview_interval_sec = 1.0 / preview_max_fps if preview_max_fps > 0 else 0
+        self.rate = AdaptiveRateController(
+            detection_service.rate_coordinator,
+            min_fps=min_fps,
+            max_fps=max_fps,
+            latency_budget_sec=latency_budget_sec,
+        )
+
+        self.captured = DropOldestQueue(maxsize=1)
+        self.preview = DropOldestQueue(maxsize=1)
+        self.encoded = DropOldestQueue(maxsize=1)
+
+        self.capture_fps = FpsMeter()
+        self.inference_fps = FpsMeter()
+        self.encode_fps = FpsMeter()
+        self.stale_dropped = 0
+        self.latency_sec = 0.0
+
+        self.stop_event = threading.Event()
+        self.connected = threading.Event()
+        self.error = None
+        self.threads = []
+
+    def start(self):
+        for name, target in (
+            ("capture", self._capture_loop),
+            ("inference", self._inference_loop),
+            ("encode", self._encode_loop),
+        ):
+            thread = threading.Thread(
+                target=target, name=f"stream-{name}-{self.stream_id[:8]}", daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        if self.stop_event.is_set():
+            return
+        self.stop_event.set()
+        for q in (self.captured, self.preview, self.encoded):
+            q.close()
+        logger.info(f"Stream ({self.stream_id}) pipeline stopping.")
+
+    @property
+    def running(self):
+        return not self.stop_event.is_set()
+
+    def wait_until_connected(self, timeout=15.0):
+        """Blocks until the capture opened (True) or failed/timed out (False)."""
+        self.connected.wait(timeout)
+        return self.connected.is_set() and self.error is None
+
+    def frames(self, timeout=1.0):
+        """Yields encoded JPEG bytes until the pipeline stops."""
+        while self.running:
+            jpeg = self.encoded.get(timeout=timeout)
+            if jpeg is not None:
+                yield jpeg
+
+    def stats(self):
+        return {
+            "stream_id": self.stream_id,
+            "running": self.running,
+            "error": self.error,
+            "capture_fps": round(self.capture_fps.fps, 2),
+            "inference_fps": round(self.inference_fps.fps, 2),
+            "encode_fps": round(self.encode_fps.fps, 2),
+            "frames_captured": self.capture_fps.total,
+            "frames_analyzed": self.inference_fps.total,
+            "frames_encoded": self.encode_fps.total,
+            "dropped": {
+                "capture_overwritten": self.captured.dropped,
+                "stale": self.stale_dropped,
+                "encode_overwritten": self.preview.dropped,
+                "output_overwritten": self.encoded.dropped,
+            },
+            "latency_ms": round(self.latency_sec * 1000, 1),
+            **self.rate.stats(),
+        }
+
+    def _open_capture(self):
+        source = self.stream_url
+        if isinstance(source, str) and source.isdigit():
+            source = int(source)  # local camera index
+        cap = cv2.VideoCapture(source)
+        # Keep the backend's own buffer minimal; we only ever want the newest frame.
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def _capture_loop(self):
+        cap = None
+        try:
+            logger.info(
+                f"Attempting to connect to stream ({self.stream_id}): {self.stream_url}"
+            )
+            cap = self._open_capture()
+            if not cap.isOpened():
+                self.error = "Could not connect to stream."
+                logger.error(
+                    f"Cannot open stream ({self.stream_id}): {self.stream_url}"
+                )
+                self.connected.set()
+                self.stop()
+                return
+
+            logger.info(
+                f"Successfully connected to stream ({self.stream_id}): {self.stream_url}."
+            )
+            self.connected.set()
+            frame_index = 0
+            while self.running:
+                ret, frame = cap.read()
+                if not ret:
+                    logger.warning(
+                        f"Stream ({self.stream_id}) ended or frame not read."
+                    )
+                    break
+                captured_at = time.monotonic()
+                # Downscale once; inference, annotation and the preview all use
+                # the small copy. The original is only kept for snapshots.
+                small = downscale_frame(frame, self.inference_size)
+                full = self.detection_service.snapshot_frame_for(small, frame)
+                self.captured.put((frame_index, captured_at, small, full))
+                self.preview.put((captured_at, small))
+                self.capture_fps.tick()
+                frame_index += 1
+        except Exception as e:
+            self.error = str(e)
+            logger.exception(f"Exception in stream ({self.stream_id}) capture: {e}")
+        finally:
+            if cap is not None:
+                cap.release()
+            self.connected.set()
+            self.stop()
+
+    def _inference_loop(self):
+        with self.app.app_context():
+            self.rate.start()
+            try:
+                while self.running:
+                    delay = self.rate.time_until_due()
+                    if delay > 0:
+                        self.stop_event.wait(min(delay, 0.5))
+                        continue
+                    item = self.captured.get(timeout=0.5)
+                    if item is None:
+                        continue
+                    frame_index, captured_at, frame, full_frame = item
+                    if time.monotonic() - captured_at > self.max_frame_age_sec:
+                        self.stale_dropped += 1
+                        continue
+
+                    started_at = time.monotonic()
+                    try:
+                        self.detection_service.process_live_stream_frame(
+                            frame,
+                            stream_url_label=self.stream_label,
+                            area_type=self.area_type,
+                            frame_time_offset=frame_index,
+                            annotate=False,
+                            roi=self.roi,
+                            snapshot_frame=full_frame,
+                        )
+                    except Exception as e:
+                        logger.exception(
+                            f"Stream ({self.stream_id}): inference stage error: {e}"
+                        )
+                    self.rate.record(started_at, time.monotonic() - started_at)
+                    self.inference_fps.tick()
+            finally:
+                self.rate.stop()
+                self.detection_service.close_stream(self.stream_label)
+
+    def _encode_loop(self):
+        params = [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality]
+        while self.running:
+            item = self.preview.get(timeout=0.5)
+            if item is None:
+                continue
+            captured_at, frame = item
+            started_at = time.monotonic()
+            annotated_frame = self.detection_service.annotate_live_frame(
+                frame, self.stream_label
+            )
+            flag, encoded_image = cv2.imencode(".jpg", annotated_frame, params)
+            if not flag:
+                logger.warning(
+                    f"Stream ({self.stream_id}): JPEG encoding failed for a frame."
+                )
+                continue
+            self.encoded.put(encoded_image.tobytes())
+            self.encode_fps.tick()
+            latency = time.monotonic() - captured_at
+            # Exponentially weighted so the reported latency tracks recent load.
+            self.latency_sec = 0.9 * self.latency_sec + 0.1 * latency
+            # Cap the preview rate; frames arriving meanwhile are overwritten.
+            remaining = self.preview_interval_sec - (time.monotonic() - started_at)
+            if remaining > 0:
+                self.stop_event.wait(remaining)
+
+
+def error_frame_jpeg(message):
+    """Renders a placeholder frame carrying an error message."""
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    cv2.putText(
+        frame,
+        message,
+        (50, 240),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        1,
+        (255, 255, 255),
+        2,
+    )
+    flag, encoded_image = cv2.imencode(".jpg", frame)
+    return encoded_image.tobytes() if flag else None
@@ -0,0 +1,133 @@
+import datetime
+import uuid
+
+import numpy as np
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU between two (N, 4) and (M, 4) xyxy box arrays."""
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    inter_w = np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0])
+    inter_h = np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1])
+    inter = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def centroid_distance_matrix(boxes_a, boxes_b):
+    """Pairwise centroid distance normalised by the diagonal of the tracked box."""
+    ca = (boxes_a[:, :2] + boxes_a[:, 2:]) / 2
+    cb = (boxes_b[:, :2] + boxes_b[:, 2:]) / 2
+    diag = np.hypot(boxes_a[:, 2] - boxes_a[:, 0], boxes_a[:, 3] - boxes_a[:, 1])
+    dist = np.linalg.norm(ca[:, None, :] - cb[None, :, :], axis=-1)
+    return dist / np.maximum(diag[:, None], 1e-9)
+
+
+class Track:
+    def __init__(self, label, bbox, clock, first_seen_at):
+        self.id = uuid.uuid4().hex[:16]
+        self.label = label
+        self.bbox = bbox
+        self.first_clock = clock
+        self.last_clock = clock
+        self.first_seen_at = first_seen_at
+        self.hits = 1
+
+    @property
+    def last_seen_at(self):
+        return self.first_seen_at + datetime.timedelta(
+            seconds=self.last_clock - self.first_clock
+        )
+
+
+class ViolationTracker:
+    """
+    Associates violations across consecutive frames of one camera/video so a
+    persistent violation becomes a single event.
+
+    Violations are matched to open tracks of the same type by IoU, falling back
+    to centroid distance for fast movement. `clock` values are seconds on any
+    monotonic timeline (wall clock for live streams, media time for videos); a
+    track closes once it has not been seen for `max_age_sec`.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_centroid_distance=0.75, max_age_sec=5.0):
+        self.iou_threshold = iou_threshold
+        self.max_centroid_distance = max_centroid_distance
+        self.max_age_sec = max_age_sec
+        self.tracks = {}
+
+    def update(self, violations, clock):
+        """
+        Assigns a `track_id` to every violation record.
+        Returns (new_violations, closed_tracks): violations that started a new
+        track, and tracks that expired at this update.
+        """
+        new_violations = []
+        by_label = {}
+        for violation in violations:
+            by_label.setdefault(violation["type"], []).append(violation)
+
+        for label, label_violations in by_label.items():
+            open_tracks = [t for t in self.tracks.values() if t.label == label]
+            matched = self._match(open_tracks, label_violations)
+            for v_idx, violation in enumerate(label_violations):
+                track = matched.get(v_idx)
+                if track is None:
+                    track = Track(
+                        label, violation["bbox"], clock, violation["timestamp"]
+                    )
+                    self.tracks[track.id] = track
+                    new_violations.append(violation)
+                else:
+                    track.bbox = violation["bbox"]
+                    track.last_clock = clock
+                    track.hits += 1
+                violation["track_id"] = track.id
+                violation["first_seen"] = track.first_seen_at
+
+        closed_tracks = [
+            track
+            for track in self.tracks.values()
+            if clock - track.last_clock > self.max_age_sec
+        ]
+        for track in closed_tracks:
+            del self.tracks[track.id]
+        return new_violations, closed_tracks
+
+    def _match(self, tracks, violations):
+        """Greedy best-first association; returns {violation_index: track}."""
+        if not tracks or not violations:
+            return {}
+        track_boxes = np.array([t.bbox for t in tracks], dtype=np.float32)
+        det_boxes = np.array([v["bbox"] for v in violations], dtype=np.float32)
+        ious = iou_matrix(track_boxes, det_boxes)
+        distances = centroid_distance_matrix(track_boxes, det_boxes)
+
+        # Higher score is better: IoU matches first, then close centroids.
+        score = np.where(
+            ious >= self.iou_threshold,
+            1.0 + ious,
+            np.where(distances <= self.max_centroid_distance, 1.0 - distances, -1.0),
+        )
+        matches = {}
+        used_tracks = set()
+        flat_order = np.argsort(-score, axis=None)
+        for t_idx, v_idx in zip(*np.unravel_index(flat_order, score.shape)):
+            t_idx, v_idx = int(t_idx), int(v_idx)
+            if score[t_idx, v_idx] < 0:
+                break
+            if t_idx in used_tracks or v_idx in matches:
+                continue
+            used_tracks.add(t_idx)
+            matches[v_idx] = tracks[t_idx]
+        return matches
+
+    def close_all(self):
+        """Closes and returns every open track (end of video / stream stopped)."""
+        closed_tracks = list(self.tracks.values())
+        self.tracks.clear()
+        return closed_tracks
@@ -0,0 +1,244 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from ..database import INSERT_VIOLATION_SQL, UPDATE_LAST_SEEN_SQL
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def _is_transient(error):
+    """True for lock contention (SQLITE_BUSY/SQLITE_LOCKED), which a retry can clear."""
+    return isinstance(error, sqlite3.OperationalError) and "locked" in str(error)
+
+
+class ViolationWriter:
+    """
+    Write-behind persistence for violations. Callers only enqueue; a dedicated
+    thread owns its own SQLite connection (from `connections`, a
+    database.ConnectionManager) and writes queued rows with
+    `executemany` in a single transaction once `batch_size` rows are pending or
+    `flush_interval_sec` has passed. `stop()` flushes whatever is left.
+    `on_insert()` is called after each batch that committed new violations.
+
+    A batch that fails because the database is locked stays pending and is
+    retried, together with rows queued meanwhile, after a backoff that doubles
+    from `retry_initial_sec` up to `retry_max_sec`. On stop it gets
+    `final_attempts` tries. Batches failing with any other error are dropped
+    and counted in `stats()`.
+
+    A track's row is only queued once its snapshot is written, which can be
+    after the track closed. Tracks announced with `expect_track()` therefore
+    hold their `update_last_seen()` until `add_violation()` queues the row (or
+    `discard_track()` says it will never come), so the update cannot run before
+    the insert and match nothing.
+    """
+
+    def __init__(
+        self,
+        connections,
+        batch_size=200,
+        flush_interval_sec=1.0,
+        on_insert=None,
+        retry_initial_sec=0.1,
+        retry_max_sec=5.0,
+        final_attempts=5,
+    ):
+        self.connections = connections
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval_sec = flush_interval_sec
+        self.on_insert = on_insert
+        self.retry_initial_sec = retry_initial_sec
+        self.retry_max_sec = retry_max_sec
+        self.final_attempts = max(1, int(final_attempts))
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        # track id -> held last-seen time (None until the track closes)
+        self.awaiting_tracks = {}
+        self.tracks_lock = threading.Lock()
+
+        self.rows_written = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.flush_retries = 0
+        self.rows_dropped = 0
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self._run, name="violation-writer", daemon=True
+                )
+                self.thread.start()
+
+    def add_violation(
+        self,
+        timestamp,
+        equipment_type,
+        image_path,
+        location,
+        area_type,
+        severity,
+        track_id=None,
+    ):
+        """Queues a violation row; never blocks on the database."""
+        row = (
+            timestamp,
+            equipment_type,
+            image_path,
+            location,
+            area_type,
+            severity,
+            track_id,
+            timestamp,
+        )
+        with self.tracks_lock:
+            self.queue.put(("insert", row))
+            last_seen = self.awaiting_tracks.pop(track_id, None)
+            if last_seen is not None:
+                self.queue.put(("last_seen", (last_seen, track_id)))
+
+    def expect_track(self, track_id):
+        """Holds last-seen updates of `track_id` until its row is queued."""
+        with self.tracks_lock:
+            self.awaiting_tracks.setdefault(track_id, None)
+
+    def discard_track(self, track_id):
+        """Drops a track whose row will never be queued."""
+        with self.tracks_lock:
+            self.awaiting_tracks.pop(track_id, None)
+
+    def update_last_seen(self, track_id, last_seen):
+        with self.tracks_lock:
+            if track_id in self.awaiting_tracks:
+                self.awaiting_tracks[track_id] = last_seen
+                return
+            self.queue.put(("last_seen", (last_seen, track_id)))
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue.qsize(),
+            "awaiting_tracks": len(self.awaiting_tracks),
+            "rows_written": self.rows_written,
+            "flushes": self.flushes,
+            "last_flush_ms": round(self.last_flush_ms, 1),
+            "flush_retries": self.flush_retries,
+            "rows_dropped": self.rows_dropped,
+        }
+
+    def stop(self, timeout=10.0):
+        """Flushes pending rows and stops the writer thread."""
+        with self.lock:
+            thread = self.thread
+            self.thread = None
+        if thread is None:
+            return
+        self.queue.put(_STOP)
+        thread.join(timeout)
+        logger.info(f"Violation writer stopped after writing {self.rows_written} rows.")
+
+    def _run(self):
+        conn = self.connections.connect()
+        pending = []
+        deadline = None
+        retry_delay = 0.0  # non-zero while backing off from a locked database
+        try:
+            while True:
+                timeout = None
+                if deadline is not None:
+                    timeout = max(0.0, deadline - time.monotonic())
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                if item is _STOP:
+                    break
+                if item is not None:
+                    if not pending:
+                        deadline = time.monotonic() + self.flush_interval_sec
+                    pending.append(item)
+                    if deadline > time.monotonic() and (
+                        retry_delay or len(pending) < self.batch_size
+                    ):
+                        continue
+
+                if pending and not self._flush(conn, pending):
+                    retry_delay = min(
+                        max(retry_delay * 2, self.retry_initial_sec),
+                        self.retry_max_sec,
+                    )
+                    deadline = time.monotonic() + retry_delay
+                    continue
+                pending = []
+                deadline = None
+                retry_delay = 0.0
+
+            # Drain anything queued before the stop marker.
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    pending.append(item)
+            delay = retry_delay or self.retry_initial_sec
+            for attempt in range(self.final_attempts):
+                if not pending or self._flush(conn, pending):
+                    break
+                if attempt + 1 < self.final_attempts:
+                    time.sleep(delay)
+                    delay = min(delay * 2, self.retry_max_sec)
+            else:
+                self._drop(pending, "the database stayed locked")
+        finally:
+            self.connections.close()
+
+    def _flush(self, conn, items):
+        """
+        Writes `items` in one transaction. Returns False if the database was
+        locked and the batch should be retried; other failures drop it.
+        """
+        inserts = [params for kind, params in items if kind == "insert"]
+        updates = [params for kind, params in items if kind == "last_seen"]
+        start = time.perf_counter()
+        try:
+            with conn:  # one transaction; rolled back on error
+                if inserts:
+                    conn.executemany(INSERT_VIOLATION_SQL, inserts)
+                if updates:
+                    conn.executemany(UPDATE_LAST_SEEN_SQL, updates)
+        except sqlite3.Error as e:
+            if _is_transient(e):
+                self.flush_retries += 1
+                logger.warning(
+                    f"Database locked writing {len(items)} queued violation rows; "
+                    "will retry."
+                )
+                return False
+            self._drop(items, e)
+            return True
+
+        self.last_flush_ms = (time.perf_counter() - start) * 1000
+        self.flushes += 1
+        self.rows_written += len(inserts)
+        if inserts and self.on_insert is not None:
+            self.on_insert()
+        logger.debug(
+            f"Flushed {len(inserts)} violations and {len(updates)} track updates "
+            f"in {self.last_flush_ms:.1f}ms."
+        )
+        return True
+
+    def _drop(self, items, reason):
+        inserts = sum(1 for kind, _ in items if kind == "insert")
+        self.rows_dropped += inserts
+        logger.error(
+            f"Dropped {inserts} queued violations and {len(items) - inserts} "
+            f"track updates: {reason}"
+        )
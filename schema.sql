@@ -6,23 +6,70 @@ CREATE TABLE IF NOT EXISTS violations (
     location TEXT,
     area_type TEXT,
     severity TEXT,
-    status TEXT DEFAULT 'unresolved' NOT NULL CHECK(status IN ('unresolved', 'resolved', 'investigating'))
+    status TEXT DEFAULT 'unresolved' NOT NULL CHECK(status IN ('unresolved', 'resolved', 'investigating')),
+    track_id TEXT, -- one row per tracked violation instead of one per frame
+    last_seen TIMESTAMP
 );
 
 -- creating indexes for faster querying if the table grows large
 CREATE INDEX IF NOT EXISTS idx_violations_timestamp ON violations (timestamp);
-CREATE INDEX IF NOT EXISTS idx_violations_equipment_type ON violations (equipment_type);
-CREATE INDEX IF NOT EXISTS idx_violations_location ON violations (location);
-CREATE INDEX IF NOT EXISTS idx_violations_status ON violations (status);
+CREATE INDEX IF NOT EXISTS idx_violations_track_id ON violations (track_id);
+-- Serves day grouping and day ranges, including the day rollup rebuild.
+CREATE INDEX IF NOT EXISTS idx_violations_date ON violations (DATE(timestamp));
+-- The violation log filters on one of these columns and pages through the
+-- matches by (timestamp, id); each index answers the filter, the time range and
+-- the order (the rowid id is implicitly last) without sorting. They also
+-- cover the per-column GROUP BYs of `flask rebuild-stats`.
+CREATE INDEX IF NOT EXISTS idx_violations_status_timestamp ON violations (status, timestamp);
+CREATE INDEX IF NOT EXISTS idx_violations_location_timestamp ON violations (location, timestamp);
+CREATE INDEX IF NOT EXISTS idx_violations_equipment_type_timestamp ON violations (equipment_type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_violations_severity_timestamp ON violations (severity, timestamp);
+-- Superseded by the composite indexes above.
+DROP INDEX IF EXISTS idx_violations_equipment_type;
+DROP INDEX IF EXISTS idx_violations_location;
+DROP INDEX IF EXISTS idx_violations_status;
 
--- Stats Table :
-/*
-CREATE TABLE IF NOT EXISTS equipment_stats (
-    equipment_type TEXT PRIMARY KEY,
-    violation_count INTEGER DEFAULT 0,
-    last_updated TIMESTAMP
-);
-*/
+-- Stats rollups: violation counts per equipment type, severity, location, status
+-- and day, kept current by the triggers below in the same transaction as the
+-- change to violations, so the dashboard reads a few rows instead of scanning
+-- the table. NULL severities/locations are stored as ''. `flask rebuild-stats`
+-- recomputes them from scratch.
+CREATE TABLE IF NOT EXISTS violation_rollups (
+    dimension TEXT NOT NULL CHECK(dimension IN ('equipment', 'severity', 'location', 'status', 'day')),
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, value)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS violation_rollups_insert AFTER INSERT ON violations
+BEGIN
+    INSERT INTO violation_rollups (dimension, value, count) VALUES
+        ('equipment', NEW.equipment_type, 1),
+        ('severity', IFNULL(NEW.severity, ''), 1),
+        ('location', IFNULL(NEW.location, ''), 1),
+        ('status', NEW.status, 1),
+        ('day', IFNULL(DATE(NEW.timestamp), ''), 1)
+    ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS violation_rollups_status AFTER UPDATE OF status ON violations
+WHEN OLD.status IS NOT NEW.status
+BEGIN
+    UPDATE violation_rollups SET count = count - 1
+    WHERE dimension = 'status' AND value = OLD.status;
+    INSERT INTO violation_rollups (dimension, value, count) VALUES ('status', NEW.status, 1)
+    ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS violation_rollups_delete AFTER DELETE ON violations
+BEGIN
+    UPDATE violation_rollups SET count = count - 1
+    WHERE (dimension = 'equipment' AND value = OLD.equipment_type)
+       OR (dimension = 'severity' AND value = IFNULL(OLD.severity, ''))
+       OR (dimension = 'location' AND value = IFNULL(OLD.location, ''))
+       OR (dimension = 'status' AND value = OLD.status)
+       OR (dimension = 'day' AND value = IFNULL(DATE(OLD.timestamp), ''));
+END;
 
 --user stuff
 
@@ -0,0 +1,291 @@
+"""
+Benchmarks the dashboard and violation log queries on a large synthetic
+violations table, before and after the current schema is applied.
+
+Seeds a database with the original schema (single-column indexes, no
+rollups), times the original queries and the current ones and prints their
+query plans, then migrates it with database.apply_schema (day and
+composite indexes, stats rollups) and repeats the measurements.
+
+    python scripts/benchmark_queries.py --rows 5000000
+    python scripts/benchmark_queries.py --rows 200000 --repeat 3 --report plans.json
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flask import Flask  # noqa: E402
+
+from app import database  # noqa: E402
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "..", "schema.sql")
+
+# schema.sql as it was before the day and composite indexes and the rollups.
+BASELINE_SCHEMA = """
+CREATE TABLE violations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    equipment_type TEXT NOT NULL,
+    image_path TEXT,
+    location TEXT,
+    area_type TEXT,
+    severity TEXT,
+    status TEXT DEFAULT 'unresolved' NOT NULL CHECK(status IN ('unresolved', 'resolved', 'investigating')),
+    track_id TEXT,
+    last_seen TIMESTAMP
+);
+CREATE INDEX idx_violations_timestamp ON violations (timestamp);
+CREATE INDEX idx_violations_equipment_type ON violations (equipment_type);
+CREATE INDEX idx_violations_location ON violations (location);
+CREATE INDEX idx_violations_status ON violations (status);
+CREATE INDEX idx_violations_track_id ON violations (track_id);
+"""
+
+SEED_SQL = """INSERT INTO violations (timestamp, equipment_type, image_path, location,
+    area_type, severity, status, track_id, last_seen)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+EQUIPMENT = {
+    "NO-Hardhat": "high",
+    "NO-Safety Vest": "medium",
+    "NO-Mask": "medium",
+    "NO-Gloves": "low",
+}
+LOCATIONS = [f"Site {i}" for i in range(1, 13)]
+AREAS = ["construction", "warehouse", "laboratory", "default"]
+STATUSES = ["resolved", "unresolved", "investigating"]
+STATUS_WEIGHTS = [0.75, 0.2, 0.05]
+
+# The five GROUP BY scans get_violation_stats ran before the rollups.
+BASELINE_STATS_QUERIES = [
+    """SELECT equipment_type, COUNT(*) as count FROM violations
+       GROUP BY equipment_type ORDER BY count DESC""",
+    """SELECT severity, COUNT(*) as count FROM violations GROUP BY severity
+       ORDER BY CASE severity WHEN 'high' THEN 1 WHEN 'medium' THEN 2
+       WHEN 'low' THEN 3 ELSE 4 END""",
+    """SELECT location, COUNT(*) as count FROM violations
+       GROUP BY location ORDER BY count DESC""",
+    """SELECT status, COUNT(*) as count FROM violations
+       GROUP BY status ORDER BY count DESC""",
+    """SELECT DATE(timestamp) as day, COUNT(*) as count FROM violations
+       WHERE timestamp >= DATE('now', '-30 days') GROUP BY day ORDER BY day ASC""",
+]
+
+
+def seed(conn, rows, days, seed_value):
+    """Inserts `rows` violations spread over the last `days` days, oldest first."""
+    rng = random.Random(seed_value)
+    end = datetime.datetime.now().replace(microsecond=0)
+    span = days * 86400
+    offsets = sorted(rng.randrange(span) for _ in range(rows))
+    location_weights = [1 / (i + 1) for i in range(len(LOCATIONS))]
+    equipment_types = list(EQUIPMENT)
+
+    def generate():
+        for offset in offsets:
+            timestamp = str(end - datetime.timedelta(seconds=span - offset))
+            equipment_type = rng.choice(equipment_types)
+            yield (
+                timestamp,
+                equipment_type,
+                None,
+                rng.choices(LOCATIONS, location_weights)[0],
+                rng.choice(AREAS),
+                EQUIPMENT[equipment_type],
+                rng.choices(STATUSES, STATUS_WEIGHTS)[0],
+                None,
+                timestamp,
+            )
+
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    with conn:
+        conn.executemany(SEED_SQL, generate())
+
+
+def plan(conn, sql, params=()):
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def time_ms(fn, repeat):
+    fn()  # warm the page cache
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def log_queries(conn):
+    """The violation log and API queries, as query_violations builds them."""
+    now = datetime.datetime.now()
+    middle = conn.execute(
+        """SELECT id, timestamp FROM violations
+           WHERE id >= (SELECT MAX(id) / 2 FROM violations) LIMIT 1"""
+    ).fetchone()
+    deep_cursor = database.encode_cursor({"id": middle[0], "timestamp": middle[1]})
+    cases = {
+        "log: newest page": {},
+        "log: unresolved, last 7 days": {
+            "filters": {"status": "unresolved"},
+            "since": now - datetime.timedelta(days=7),
+        },
+        "log: one location, last 30 days": {
+            "filters": {"location": LOCATIONS[3]},
+            "since": now - datetime.timedelta(days=30),
+        },
+        "log: equipment type + status": {
+            "filters": {"equipment_type": "NO-Gloves", "status": "investigating"},
+        },
+        "log: unresolved, page halfway back": {
+            "filters": {"status": "unresolved"},
+            "cursor": deep_cursor,
+        },
+    }
+    return {
+        name: database.build_violations_query(limit=50, **kwargs)
+        for name, kwargs in cases.items()
+    }
+
+
+def measure(conn, app, phase, repeat):
+    """Returns {case: {"ms": ..., "plan": [...]}} for one phase."""
+    results = {}
+
+    if phase == "before":
+        results["dashboard stats"] = {
+            "ms": time_ms(
+                lambda: [
+                    conn.execute(sql).fetchall() for sql in BASELINE_STATS_QUERIES
+                ],
+                repeat,
+            ),
+            "plan": [
+                step for sql in BASELINE_STATS_QUERIES for step in plan(conn, sql)
+            ],
+        }
+        trend_sql = BASELINE_STATS_QUERIES[-1]
+    else:
+
+        def stats():
+            with app.app_context():
+                database.get_violation_stats()
+
+        results["dashboard stats"] = {
+            "ms": time_ms(stats, repeat),
+            "plan": plan(
+                conn,
+                "SELECT value, count FROM violation_rollups WHERE dimension = ?",
+                ("equipment",),
+            ),
+        }
+        trend_sql = """SELECT DATE(timestamp) AS day, COUNT(*) AS count
+            FROM violations WHERE DATE(timestamp) >= DATE('now', '-30 days')
+            GROUP BY DATE(timestamp) ORDER BY day ASC"""
+
+    results["daily trend from violations"] = {
+        "ms": time_ms(lambda: conn.execute(trend_sql).fetchall(), repeat),
+        "plan": plan(conn, trend_sql),
+    }
+
+    for name, (sql, params) in log_queries(conn).items():
+        results[name] = {
+            "ms": time_ms(lambda: conn.execute(sql, params).fetchall(), repeat),
+            "plan": plan(conn, sql, params),
+        }
+    return results
+
+
+def print_report(before, after, migration_sec):
+    print(f"\n{'query':<40} {'before ms':>10} {'after ms':>10} {'speed-up':>9}")
+    for name in before:
+        b, a = before[name]["ms"], after[name]["ms"]
+        print(f"{name:<40} {b:>10.2f} {a:>10.2f} {b / a if a else 0:>8.1f}x")
+    print(f"\nMigration (indexes, rollups): {migration_sec:.1f}s")
+    for name in before:
+        print(f"\n{name}")
+        for phase, results in (("before", before), ("after", after)):
+            for step in results[name]["plan"]:
+                print(f"  {phase:<7} {step}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument(
+        "--days", type=int, default=365, help="history to spread rows over"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per query")
+    parser.add_argument("--db", help="database file (default: a temporary file)")
+    parser.add_argument("--report", help="write results and plans as JSON to this file")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    tmpdir = None
+    db_path = args.db
+    if db_path is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(tmpdir.name, "violations.db")
+    elif os.path.exists(db_path):
+        sys.exit(f"{db_path} already exists; pass a new path.")
+
+    app = Flask(__name__)
+    app.config["DATABASE_URL"] = f"sqlite:///{db_path}"
+    database.init_app(app)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executescript(BASELINE_SCHEMA)
+        print(f"Seeding {args.rows} violations over {args.days} days into {db_path}...")
+        start = time.perf_counter()
+        seed(conn, args.rows, args.days, args.seed)
+        print(f"Seeded in {time.perf_counter() - start:.1f}s")
+        conn.execute("ANALYZE")
+
+        before = measure(conn, app, "before", args.repeat)
+
+        with open(SCHEMA_PATH) as f:
+            script = f.read()
+        start = time.perf_counter()
+        database.apply_schema(conn, script)
+        conn.execute("ANALYZE")
+        migration_sec = time.perf_counter() - start
+
+        after = measure(conn, app, "after", args.repeat)
+    finally:
+        conn.close()
+        app.db_connections.close()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+    print_report(before, after, migration_sec)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(
+                {
+                    "rows": args.rows,
+                    "migration_sec": migration_sec,
+                    "before": before,
+                    "after": after,
+                },
+                f,
+                indent=2,
+            )
+        print(f"\nReport written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Exports the configured PyTorch model to ONNX ahead of deployment and optionally
+compares inference speed of the two backends.
+
+The export lands in ONNX_CACHE_DIR under the hash of the weights, which is where
+MODEL_BACKEND=onnxruntime looks for it, so workers never need torch installed.
+
+    python scripts/export_onnx.py
+    python scripts/export_onnx.py --benchmark 50 --image sample.jpg
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.config import Config  # noqa: E402
+from app.services.model_backends import (  # noqa: E402
+    OnnxRuntimeBackend,
+    UltralyticsBackend,
+    export_onnx,
+)
+
+
+def benchmark(backend, frames, runs):
+    backend.predict(frames)  # warm-up
+    start = time.perf_counter()
+    for _ in range(runs):
+        detections = backend.predict(frames)
+    elapsed = time.perf_counter() - start
+    per_frame_ms = elapsed / (runs * len(frames)) * 1000
+    return per_frame_ms, detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--weights", default=Config.MODEL_PATH)
+    parser.add_argument("--cache-dir", default=Config.ONNX_CACHE_DIR)
+    parser.add_argument("--imgsz", type=int, default=Config.MODEL_IMGSZ)
+    parser.add_argument(
+        "--benchmark", type=int, default=0, help="timed runs per backend (0 = skip)"
+    )
+    parser.add_argument("--batch", type=int, default=1, help="frames per call")
+    parser.add_argument("--image", help="frame to benchmark on (default: noise)")
+    args = parser.parse_args()
+
+    onnx_path = export_onnx(args.weights, args.cache_dir, imgsz=args.imgsz)
+    print(f"ONNX model: {onnx_path}")
+    if not args.benchmark:
+        return
+
+    frame = cv2.imread(args.image) if args.image else None
+    if frame is None:
+        frame = np.random.randint(0, 255, (720, 1280, 3), dtype=np.uint8)
+    frames = [frame] * args.batch
+
+    backends = [
+        UltralyticsBackend(args.weights, conf=Config.MODEL_CONFIDENCE),
+        OnnxRuntimeBackend(
+            onnx_path,
+            conf=Config.MODEL_CONFIDENCE,
+            intra_op_threads=Config.ONNX_INTRA_OP_THREADS,
+            inter_op_threads=Config.ONNX_INTER_OP_THREADS,
+        ),
+    ]
+    for backend in backends:
+        per_frame_ms, detections = benchmark(backend, frames, args.benchmark)
+        print(
+            f"{backend.describe():<50} {per_frame_ms:8.1f} ms/frame  "
+            f"{1000 / per_frame_ms:6.1f} frames/s  "
+            f"{len(detections[0])} detections"
+        )
+
+
+if __name__ == "__main__":
+    main()
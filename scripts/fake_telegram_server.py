@@ -0,0 +1,216 @@
+"""
+Local stand-in for the Telegram Bot API, for testing notification batching and
+throughput offline.
+
+Accepts sendMessage, sendPhoto and sendMediaGroup for any token (or only for
+--token, answering 401 otherwise), optionally enforces a per-chat rate limit
+with Telegram-style 429 responses, and reports what it received at GET /stats.
+
+    python scripts/fake_telegram_server.py --port 8081 --rate-limit 20
+    TELEGRAM_API_BASE=http://127.0.0.1:8081 python run.py
+"""
+
+import argparse
+import collections
+import json
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+SUPPORTED_METHODS = ("sendMessage", "sendPhoto", "sendMediaGroup")
+
+
+class FakeTelegramState:
+    def __init__(self, rate_limit_per_minute=0, token=None):
+        self.rate_limit_per_minute = rate_limit_per_minute
+        self.token = token
+        self.lock = threading.Lock()
+        self.calls = collections.Counter()
+        self.photos = 0
+        self.rate_limited = 0
+        self.unauthorized = 0
+        self.bytes_received = 0
+        self.recent = collections.defaultdict(collections.deque)  # chat_id -> times
+        self.message_id = 0
+
+    def check_rate_limit(self, chat_id):
+        """Returns seconds to wait if the chat is over its limit, else 0."""
+        if not self.rate_limit_per_minute:
+            return 0
+        now = time.monotonic()
+        with self.lock:
+            sent = self.recent[chat_id]
+            while sent and now - sent[0] > 60:
+                sent.popleft()
+            if len(sent) >= self.rate_limit_per_minute:
+                self.rate_limited += 1
+                return max(1, int(60 - (now - sent[0])) + 1)
+            sent.append(now)
+            return 0
+
+    def check_token(self, token):
+        if self.token is None or token == self.token:
+            return True
+        with self.lock:
+            self.unauthorized += 1
+        return False
+
+    def record(self, method, photos, size):
+        with self.lock:
+            self.calls[method] += 1
+            self.photos += photos
+            self.bytes_received += size
+            self.message_id += 1
+            return self.message_id
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "calls": dict(self.calls),
+                "messages": sum(self.calls.values()),
+                "photos": self.photos,
+                "rate_limited": self.rate_limited,
+                "unauthorized": self.unauthorized,
+                "bytes_received": self.bytes_received,
+            }
+
+
+def parse_form(content_type, body):
+    """Returns (fields, file_count) for urlencoded or multipart bodies."""
+    if content_type.startswith("multipart/form-data"):
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + body
+        )
+        fields, files = {}, 0
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if part.get_filename():
+                files += 1
+            else:
+                fields[name] = part.get_content()
+        return fields, files
+    parsed = parse_qs(body.decode("utf-8"))
+    return {key: values[0] for key, values in parsed.items()}, 0
+
+
+def make_handler(state):
+    class FakeTelegramHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _error(self, status, description, **extra):
+            self._reply(
+                status,
+                {
+                    "ok": False,
+                    "error_code": status,
+                    "description": description,
+                    **extra,
+                },
+            )
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._reply(200, state.snapshot())
+            else:
+                self._error(404, "Not Found")
+
+        def do_POST(self):
+            bot, _, method = self.path.strip("/").rpartition("/")
+            if method not in SUPPORTED_METHODS:
+                self._error(404, "Not Found")
+                return
+            if not state.check_token(bot.rpartition("/")[2].removeprefix("bot")):
+                self._error(401, "Unauthorized")
+                return
+
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            fields, files = parse_form(self.headers.get("Content-Type", ""), body)
+            chat_id = fields.get("chat_id")
+            if not chat_id:
+                self._error(400, "Bad Request: chat_id is empty")
+                return
+
+            retry_after = state.check_rate_limit(chat_id)
+            if retry_after:
+                self._error(
+                    429,
+                    f"Too Many Requests: retry after {retry_after}",
+                    parameters={"retry_after": retry_after},
+                )
+                return
+
+            if method == "sendMediaGroup":
+                media = json.loads(fields.get("media", "[]"))
+                if not 2 <= len(media) <= 10:
+                    self._error(400, "Bad Request: wrong number of media")
+                    return
+
+            message_id = state.record(method, files, length)
+            result = {"message_id": message_id, "chat": {"id": chat_id}}
+            self._reply(200, {"ok": True, "result": result})
+
+    return FakeTelegramHandler
+
+
+class FakeTelegramServer:
+    """Runs the stand-in API on a background thread (usable from other scripts)."""
+
+    def __init__(self, host="127.0.0.1", port=0, rate_limit_per_minute=0, token=None):
+        self.state = FakeTelegramState(rate_limit_per_minute, token)
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(self.state))
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument(
+        "--rate-limit",
+        type=int,
+        default=20,
+        help="messages per minute per chat before answering 429 (0 = unlimited)",
+    )
+    parser.add_argument(
+        "--token", help="only accept this bot token (default: accept any token)"
+    )
+    args = parser.parse_args()
+
+    server = FakeTelegramServer(args.host, args.port, args.rate_limit, args.token)
+    print(f"Fake Telegram API listening on {server.base_url} (stats at /stats)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Offline throughput test for violation notifications.
+
+Starts the stand-in Telegram API (fake_telegram_server.py), fires a burst of
+violations across several sites through notify_violation and reports how many
+Telegram calls, photos and rate-limit rejections each notification mode causes.
+
+    python scripts/notification_load_test.py --violations 500 --sites 5 --mode both
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fake_telegram_server import FakeTelegramServer  # noqa: E402
+from flask import Flask  # noqa: E402
+
+from app.config import Config  # noqa: E402
+from app.services import notification_service  # noqa: E402
+
+VIOLATION_TYPES = ["NO-Hardhat", "NO-Safety Vest", "NO-Mask"]
+SEVERITIES = {"NO-Hardhat": "high", "NO-Safety Vest": "medium", "NO-Mask": "medium"}
+
+
+def make_app(base_url, image_folder, mode, window_sec, cooldown):
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update(
+        TELEGRAM_BOT_TOKEN="offline-test",
+        TELEGRAM_CHAT_ID="1",
+        TELEGRAM_API_BASE=base_url,
+        VIOLATION_IMAGE_FOLDER=image_folder,
+        NOTIFICATION_MODE=mode,
+        NOTIFICATION_DIGEST_WINDOW_SEC=window_sec,
+        NOTIFICATION_COOLDOWN=cooldown,
+        NOTIFICATION_BACKOFF_SEC=0.05,
+        NOTIFICATION_MAX_RETRIES=0,
+    )
+    return app
+
+
+def reset_notification_state():
+    """Stops the module-level dispatcher/coalescer so the next run starts clean."""
+    if notification_service.coalescer is not None:
+        notification_service.coalescer.stop()
+    if notification_service.dispatcher is not None:
+        notification_service.dispatcher.stop(timeout=30)
+    notification_service.coalescer = None
+    notification_service.dispatcher = None
+    notification_service.cooldown_store = None
+
+
+def run(mode, args, image_folder, images):
+    server = FakeTelegramServer(rate_limit_per_minute=args.rate_limit).start()
+    app = make_app(server.base_url, image_folder, mode, args.window, args.cooldown)
+    rng = random.Random(42)
+    sites = [f"Site_{i}" for i in range(args.sites)]
+
+    start = time.perf_counter()
+    with app.app_context():
+        for _ in range(args.violations):
+            vtype = rng.choice(VIOLATION_TYPES)
+            notification_service.notify_violation(
+                violation_type=vtype,
+                location=rng.choice(sites),
+                area_type="construction",
+                severity=SEVERITIES[vtype],
+                image_path=rng.choice(images),
+            )
+        enqueue_sec = time.perf_counter() - start
+        if mode == "digest":
+            time.sleep(args.window + 0.5)  # let the digest windows close normally
+        dispatcher = notification_service.get_dispatcher()
+        reset_notification_state()
+    total_sec = time.perf_counter() - start
+
+    received = server.state.snapshot()
+    server.stop()
+    print(f"\n== mode: {mode} ==")
+    print(f"violations          : {args.violations} across {args.sites} sites")
+    print(f"enqueue time        : {enqueue_sec * 1000:.1f} ms")
+    print(f"total time          : {total_sec:.2f} s (incl. digest window / drain)")
+    print(f"telegram calls      : {received['messages']} {received['calls']}")
+    print(f"photos uploaded     : {received['photos']}")
+    print(f"rate-limited (429)  : {received['rate_limited']}")
+    print(f"dispatcher          : {dispatcher.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--violations", type=int, default=500)
+    parser.add_argument("--sites", type=int, default=5)
+    parser.add_argument(
+        "--mode", choices=["immediate", "digest", "both"], default="both"
+    )
+    parser.add_argument("--window", type=float, default=2.0, help="digest window (s)")
+    parser.add_argument(
+        "--cooldown", type=int, default=60, help="immediate-mode cooldown (s)"
+    )
+    parser.add_argument(
+        "--rate-limit", type=int, default=20, help="fake API messages/min per chat"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as image_folder:
+        images = []
+        for i in range(20):
+            name = f"violation_test_{i}.jpg"
+            with open(os.path.join(image_folder, name), "wb") as f:
+                f.write(os.urandom(50_000))  # stand-in payload, never decoded
+            images.append(os.path.join("images", name))
+
+        modes = ["immediate", "digest"] if args.mode == "both" else [args.mode]
+        for mode in modes:
+            run(mode, args, image_folder, images)
+
+
+if __name__ == "__main__":
+    main()
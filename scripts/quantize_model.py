@@ -0,0 +1,294 @@
+"""
+Builds an INT8 version of the PPE model with ONNX Runtime static quantization
+and reports how it compares with the FP32 model.
+
+Calibration images are taken from the stored violation snapshots (or any folder
+given with --images); a disjoint subset is held out for evaluation. Without
+--labels, the FP32 model's detections serve as ground truth, so the report
+measures how faithfully INT8 reproduces FP32. With a folder of YOLO-format
+label files (<image stem>.txt: "class cx cy w h", normalised) both models are
+scored against the labels.
+
+Note that violation snapshots carry the red boxes drawn when they were saved;
+for the most representative calibration, point --images at raw frames.
+
+    python scripts/quantize_model.py --calibration-images 200 --eval-images 100
+    MODEL_PRECISION=int8 MODEL_BACKEND=onnxruntime flask run
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import cv2
+import numpy as np
+from onnxruntime.quantization import (
+    CalibrationDataReader,
+    CalibrationMethod,
+    QuantFormat,
+    QuantType,
+    quantize_static,
+)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.config import Config  # noqa: E402
+from app.services.model_backends import (  # noqa: E402
+    OnnxRuntimeBackend,
+    quantized_onnx_path,
+    resolve_onnx_model,
+)
+from app.services.postprocessing import Detections  # noqa: E402
+from app.services.tracker import iou_matrix  # noqa: E402
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def list_images(folder):
+    return sorted(
+        os.path.join(folder, name)
+        for name in os.listdir(folder)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+class SnapshotCalibrationReader(CalibrationDataReader):
+    """Feeds preprocessed calibration images to the quantizer one at a time."""
+
+    def __init__(self, backend, image_paths):
+        self.backend = backend
+        self.image_paths = image_paths
+        self.remaining = iter(image_paths)
+
+    def get_next(self):
+        for path in self.remaining:
+            frame = cv2.imread(path)
+            if frame is None:
+                continue
+            batch, _ = self.backend.preprocess([frame])
+            return {self.backend.input_name: batch}
+        return None
+
+    def rewind(self):
+        self.remaining = iter(self.image_paths)
+
+
+def quantize(fp32_path, int8_path, calibration_paths, args):
+    # Shape inference and graph folding first, as recommended for static
+    # quantization; fall back to the raw export if the model does not allow it.
+    source = f"{os.path.splitext(int8_path)[0]}-prep.onnx"
+    try:
+        quant_pre_process(fp32_path, source)
+    except Exception as e:
+        print(f"Pre-processing skipped ({e}); quantizing the export directly.")
+        source = fp32_path
+
+    backend = OnnxRuntimeBackend(fp32_path)
+    reader = SnapshotCalibrationReader(backend, calibration_paths)
+    quantize_static(
+        source,
+        int8_path,
+        reader,
+        quant_format=QuantFormat.QDQ,
+        per_channel=args.per_channel,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        calibrate_method=getattr(CalibrationMethod, args.calibration_method),
+        nodes_to_exclude=args.exclude_nodes,
+    )
+    if source != fp32_path:
+        os.remove(source)
+
+
+def load_labels(labels_dir, image_path, shape):
+    """Reads a YOLO label file into Detections in pixel coordinates."""
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    path = os.path.join(labels_dir, f"{stem}.txt")
+    if not os.path.exists(path):
+        return Detections.empty()
+    rows = np.loadtxt(path, ndmin=2)
+    if rows.size == 0:
+        return Detections.empty()
+    height, width = shape[:2]
+    cx, w = rows[:, 1] * width, rows[:, 3] * width
+    cy, h = rows[:, 2] * height, rows[:, 4] * height
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    return Detections(rows[:, 0], np.ones(len(rows)), boxes)
+
+
+def match(predicted, truth, counts, iou_threshold):
+    """Greedy per-class matching by confidence; accumulates tp/fp/fn per class."""
+    for cls_id in set(predicted.cls_ids.tolist()) | set(truth.cls_ids.tolist()):
+        pred = predicted.select(predicted.cls_ids == cls_id)
+        gt = truth.select(truth.cls_ids == cls_id)
+        stats = counts.setdefault(cls_id, {"tp": 0, "fp": 0, "fn": 0})
+        matched = np.zeros(len(gt), dtype=bool)
+        if len(pred) and len(gt):
+            ious = iou_matrix(pred.boxes, gt.boxes)
+            for i in np.argsort(-pred.confidences):
+                candidates = np.where(~matched & (ious[i] >= iou_threshold))[0]
+                if len(candidates):
+                    matched[candidates[np.argmax(ious[i, candidates])]] = True
+                    stats["tp"] += 1
+                else:
+                    stats["fp"] += 1
+        else:
+            stats["fp"] += len(pred)
+        stats["fn"] += int((~matched).sum())
+
+
+def timed_predict(backend, frame, latencies):
+    start = time.perf_counter()
+    detections = backend.predict([frame])[0]
+    latencies.append((time.perf_counter() - start) * 1000)
+    return detections
+
+
+def summarise_latency(latencies):
+    values = np.asarray(latencies)
+    return {
+        "mean_ms": round(float(values.mean()), 2),
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+    }
+
+
+def summarise_classes(counts, class_names):
+    per_class = {}
+    for cls_id, stats in sorted(counts.items()):
+        tp, fp, fn = stats["tp"], stats["fp"], stats["fn"]
+        per_class[class_names.get(cls_id, str(cls_id))] = {
+            **stats,
+            "precision": round(tp / (tp + fp), 4) if tp + fp else None,
+            "recall": round(tp / (tp + fn), 4) if tp + fn else None,
+        }
+    return per_class
+
+
+def evaluate(fp32_path, int8_path, eval_paths, args):
+    backends = {
+        name: OnnxRuntimeBackend(
+            path,
+            conf=Config.MODEL_CONFIDENCE,
+            iou=Config.MODEL_IOU,
+            intra_op_threads=Config.ONNX_INTRA_OP_THREADS,
+            inter_op_threads=Config.ONNX_INTER_OP_THREADS,
+        )
+        for name, path in (("fp32", fp32_path), ("int8", int8_path))
+    }
+    latencies = {name: [] for name in backends}
+    counts = {name: {} for name in backends}
+
+    frames = (cv2.imread(path) for path in eval_paths)
+    warmup = np.zeros((640, 640, 3), dtype=np.uint8)
+    for backend in backends.values():
+        for _ in range(3):
+            backend.predict([warmup])
+
+    evaluated = 0
+    for path, frame in zip(eval_paths, frames):
+        if frame is None:
+            continue
+        evaluated += 1
+        fp32 = timed_predict(backends["fp32"], frame, latencies["fp32"])
+        int8 = timed_predict(backends["int8"], frame, latencies["int8"])
+        if args.labels:
+            truth = load_labels(args.labels, path, frame.shape)
+            match(fp32, truth, counts["fp32"], args.iou)
+        else:
+            truth = fp32
+        match(int8, truth, counts["int8"], args.iou)
+
+    class_names = {int(k): v for k, v in Config.PPE_CLASS_MAPPING.items()}
+    report = {
+        "ground_truth": "labels" if args.labels else "fp32 detections",
+        "images": evaluated,
+        "iou_threshold": args.iou,
+        "models": {},
+    }
+    for name, path in (("fp32", fp32_path), ("int8", int8_path)):
+        report["models"][name] = {
+            "path": path,
+            "size_mb": round(os.path.getsize(path) / 1e6, 2),
+            "latency": summarise_latency(latencies[name]) if evaluated else None,
+        }
+        if counts[name]:
+            report["models"][name]["classes"] = summarise_classes(
+                counts[name], class_names
+            )
+    return report
+
+
+def print_report(report):
+    print(f"\nEvaluated on {report['images']} images against {report['ground_truth']}")
+    for name, model in report["models"].items():
+        latency = model["latency"] or {}
+        print(
+            f"\n{name.upper()}: {model['size_mb']} MB, "
+            f"mean {latency.get('mean_ms')} ms, p50 {latency.get('p50_ms')} ms, "
+            f"p95 {latency.get('p95_ms')} ms"
+        )
+        for cls_name, stats in model.get("classes", {}).items():
+            print(
+                f"  {cls_name:<20} precision {stats['precision']}  "
+                f"recall {stats['recall']}  "
+                f"(tp {stats['tp']}, fp {stats['fp']}, fn {stats['fn']})"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--images", default=Config.VIOLATION_IMAGE_FOLDER)
+    parser.add_argument("--labels", help="folder of YOLO label files for --images")
+    parser.add_argument("--fp32", help="FP32 ONNX model (default: export MODEL_PATH)")
+    parser.add_argument("--output", help="INT8 model path (default: <fp32>-int8.onnx)")
+    parser.add_argument("--calibration-images", type=int, default=200)
+    parser.add_argument("--eval-images", type=int, default=100)
+    parser.add_argument(
+        "--calibration-method",
+        default="MinMax",
+        choices=["MinMax", "Entropy", "Percentile"],
+    )
+    parser.add_argument("--per-channel", action="store_true")
+    parser.add_argument(
+        "--exclude-nodes", nargs="*", default=[], help="node names to keep in FP32"
+    )
+    parser.add_argument("--iou", type=float, default=0.5, help="match threshold")
+    parser.add_argument("--report", help="write the report as JSON to this file")
+    parser.add_argument("--skip-quantize", action="store_true", help="only evaluate")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fp32_path = args.fp32 or resolve_onnx_model(vars(Config))
+    int8_path = args.output or quantized_onnx_path(fp32_path)
+
+    images = list_images(args.images)
+    if not images:
+        sys.exit(f"No images found in {args.images}")
+    random.Random(args.seed).shuffle(images)
+    calibration = images[: args.calibration_images]
+    held_out = images[args.calibration_images :][: args.eval_images]
+    if not held_out:
+        print("Not enough images for a held-out set; evaluating on calibration images.")
+        held_out = calibration[: args.eval_images]
+
+    if not args.skip_quantize:
+        print(f"Quantizing {fp32_path} with {len(calibration)} calibration images...")
+        start = time.perf_counter()
+        quantize(fp32_path, int8_path, calibration, args)
+        print(f"Wrote {int8_path} in {time.perf_counter() - start:.1f}s")
+
+    report = evaluate(fp32_path, int8_path, held_out, args)
+    print_report(report)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+from app import create_app, database
+from app.config import Config
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    violation_folder = str(tmp_path_factory.mktemp("violation_data"))
+
+    class TestConfig(Config):
+        TESTING = True
+        LOGIN_DISABLED = True
+        WTF_CSRF_ENABLED = False
+        BASIC_AUTH_USERNAME = "admin"
+        BASIC_AUTH_PASSWORD = "secret"
+        DETECTION_MODE = "disabled"
+        UPLOAD_FOLDER = str(tmp_path_factory.mktemp("uploads"))
+        VIOLATION_FOLDER = violation_folder
+        VIOLATION_IMAGE_FOLDER = os.path.join(violation_folder, "images")
+        DATABASE_URL = f"sqlite:///{os.path.join(violation_folder, 'violations.db')}"
+        NOTIFICATION_COOLDOWN_DB = os.path.join(violation_folder, "cooldowns.db")
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        database.init_db()
+    yield app
+    app.violation_writer.stop()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
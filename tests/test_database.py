@@ -0,0 +1,95 @@
+import base64
+import datetime
+import os
+import sqlite3
+
+import pytest
+
+from app import database
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "..", "schema.sql")
+
+
+def rollups(db):
+    return sorted(
+        tuple(row)
+        for row in db.execute(
+            "SELECT dimension, value, count FROM violation_rollups WHERE count > 0"
+        )
+    )
+
+
+def test_rebuild_matches_trigger_maintained_rollups(app):
+    with app.app_context():
+        db = database.get_db()
+        database.add_violation(
+            timestamp=datetime.datetime(2026, 1, 2, 10, 0, 0),
+            equipment_type="NO-Hardhat",
+            image_path=None,
+            location="Rollup Dock",
+            area_type="construction",
+            severity="high",
+        )
+        # Rows written by other tools don't go through INSERT_VIOLATION_SQL.
+        db.execute(
+            "INSERT INTO violations (timestamp, equipment_type) VALUES (?, ?)",
+            ("2026-01-03 23:59:59", "NO-Safety Vest"),
+        )
+        db.execute(
+            "INSERT INTO violations (timestamp, equipment_type, location)"
+            " VALUES (?, ?, ?)",
+            ("2026-01-03 00:00:00", "NO-Mask", "Rollup Dock"),
+        )
+        db.commit()
+        (violation_id,) = db.execute(
+            "SELECT id FROM violations WHERE equipment_type = 'NO-Mask'"
+        ).fetchone()
+        database.update_violation_status(violation_id, "resolved")
+
+        incremental = rollups(db)
+        assert ("day", "2026-01-03", 2) in incremental
+        database.rebuild_violation_rollups(db)
+        assert rollups(db) == incremental
+
+
+def test_apply_schema_drops_the_stored_day_column():
+    db = sqlite3.connect(":memory:")
+    db.executescript(
+        """
+        CREATE TABLE violations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            equipment_type TEXT NOT NULL,
+            image_path TEXT,
+            location TEXT,
+            area_type TEXT,
+            severity TEXT,
+            status TEXT DEFAULT 'unresolved' NOT NULL,
+            track_id TEXT,
+            last_seen TIMESTAMP,
+            day TEXT
+        );
+        CREATE INDEX idx_violations_day ON violations (day);
+        INSERT INTO violations (timestamp, equipment_type, day)
+            VALUES ('2026-01-02 10:00:00', 'NO-Hardhat', '2026-01-02');
+        """
+    )
+    with open(SCHEMA_PATH) as f:
+        database.apply_schema(db, f.read())
+
+    columns = {row[1] for row in db.execute("PRAGMA table_info(violations)")}
+    assert "day" not in columns
+    assert ("day", "2026-01-02", 1) in rollups(db)
+
+
+def test_cursor_round_trips_and_rejects_garbage():
+    row = {"timestamp": datetime.datetime(2026, 1, 2, 10, 0, 0, 250000), "id": 42}
+    cursor = database.encode_cursor(row)
+    assert database.decode_cursor(cursor) == ("2026-01-02 10:00:00.250000", 42)
+    wrong_shapes = [b"[1]", b'["2026-01-02", "x"]', b"{}"]
+    garbage = ["not-a-cursor", ""] + [
+        base64.urlsafe_b64encode(payload).decode() for payload in wrong_shapes
+    ]
+    for cursor in garbage:
+        with pytest.raises(ValueError):
+            database.decode_cursor(cursor)
@@ -0,0 +1,67 @@
+import pytest
+from flask import Flask
+
+from app.services.notification_service import NotificationDispatcher
+from scripts.fake_telegram_server import FakeTelegramServer
+
+
+@pytest.fixture
+def telegram():
+    server = FakeTelegramServer(rate_limit_per_minute=1, token="good-token").start()
+    yield server
+    server.stop()
+
+
+def make_dispatcher(telegram, token="good-token"):
+    app = Flask(__name__)
+    app.config.update(
+        TELEGRAM_BOT_TOKEN=token,
+        TELEGRAM_CHAT_ID="42",
+        TELEGRAM_API_BASE=telegram.base_url,
+    )
+    dispatcher = NotificationDispatcher(
+        app, max_retries=3, backoff_base_sec=0.01, backoff_max_sec=0.05
+    )
+    # Record backoff waits instead of sleeping through them.
+    dispatcher.waits = []
+
+    def wait(delay):
+        dispatcher.waits.append(delay)
+        telegram.state.recent.clear()  # the rate-limit window has passed
+        return False
+
+    dispatcher.stop_event.wait = wait
+    return app, dispatcher
+
+
+def test_rate_limited_send_waits_for_retry_after(telegram):
+    app, dispatcher = make_dispatcher(telegram)
+    try:
+        with app.app_context():
+            assert dispatcher._deliver("first", (), 0.0)
+            assert dispatcher._deliver("second", (), 0.0)
+    finally:
+        dispatcher.stop()
+
+    # The second message hit the 1/minute limit once and was retried after
+    # the server's retry_after, not after the 10ms backoff.
+    assert telegram.state.rate_limited == 1
+    assert len(dispatcher.waits) == 1
+    assert dispatcher.waits[0] >= 59
+    assert dispatcher.stats()["sent"] == 2
+    assert dispatcher.stats()["rate_limited"] == 1
+    assert telegram.state.snapshot()["messages"] == 2
+
+
+def test_permanent_error_is_not_retried(telegram):
+    app, dispatcher = make_dispatcher(telegram, token="revoked-token")
+    try:
+        with app.app_context():
+            assert not dispatcher._deliver("hello", (), 0.0)
+    finally:
+        dispatcher.stop()
+
+    assert dispatcher.waits == []
+    assert telegram.state.unauthorized == 1
+    assert dispatcher.stats()["failed"] == 1
+    assert dispatcher.stats()["retries"] == 0
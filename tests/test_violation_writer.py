@@ -0,0 +1,79 @@
+import datetime
+import os
+import sqlite3
+import time
+
+import pytest
+
+from app import database
+from app.services.violation_writer import ViolationWriter
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "..", "schema.sql")
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "violations.db")
+    conn = sqlite3.connect(path)
+    with open(SCHEMA_PATH) as f:
+        database.apply_schema(conn, f.read())
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def writer(db_path):
+    writer = ViolationWriter(
+        database.ConnectionManager(db_path, busy_timeout_ms=10),
+        flush_interval_sec=0.01,
+        retry_initial_sec=0.01,
+        retry_max_sec=0.05,
+    )
+    writer.start()
+    yield writer
+    writer.stop()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def add(writer, equipment_type="NO-Hardhat"):
+    writer.add_violation(
+        timestamp=datetime.datetime(2026, 1, 2, 10, 0, 0),
+        equipment_type=equipment_type,
+        image_path=None,
+        location="Gate",
+        area_type="construction",
+        severity="high",
+    )
+
+
+def test_locked_database_is_retried_not_dropped(db_path, writer):
+    add(writer)
+    wait_for(lambda: writer.rows_written == 1)  # writer connection is open
+
+    locker = sqlite3.connect(db_path, isolation_level=None)
+    locker.execute("BEGIN EXCLUSIVE")
+    add(writer)
+    wait_for(lambda: writer.flush_retries >= 2)
+    add(writer, "NO-Mask")
+    locker.execute("COMMIT")
+
+    wait_for(lambda: writer.rows_written == 3)
+    assert writer.stats()["rows_dropped"] == 0
+    count = locker.execute("SELECT COUNT(*) FROM violations").fetchone()[0]
+    assert count == 3
+    locker.close()
+
+
+def test_failing_batch_is_dropped_and_counted(writer):
+    add(writer, equipment_type=None)  # violates NOT NULL
+
+    wait_for(lambda: writer.rows_dropped == 1)
+    assert writer.flush_retries == 0
+    add(writer)
+    wait_for(lambda: writer.rows_written == 1)
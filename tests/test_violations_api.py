@@ -0,0 +1,142 @@
+import base64
+import datetime
+import os
+
+from app import database
+
+
+def basic_auth(app):
+    credentials = (
+        f"{app.config['BASIC_AUTH_USERNAME']}:{app.config['BASIC_AUTH_PASSWORD']}"
+    )
+    return {"Authorization": f"Basic {base64.b64encode(credentials.encode()).decode()}"}
+
+
+def test_image_url_serves_the_snapshot(app, client):
+    filename = "violation_Gate_construction_20260101_080000_000000.jpg"
+    with open(os.path.join(app.config["VIOLATION_IMAGE_FOLDER"], filename), "wb") as f:
+        f.write(b"\xff\xd8snapshot\xff\xd9")
+    with app.app_context():
+        database.add_violation(
+            timestamp=datetime.datetime(2026, 1, 1, 8, 0, 0),
+            equipment_type="NO-Hardhat",
+            image_path=os.path.join("images", filename),
+            location="Gate",
+            area_type="construction",
+            severity="high",
+        )
+
+    response = client.get("/api/violations", query_string={"location": "Gate"})
+    assert response.status_code == 200
+    (violation,) = response.get_json()["violations"]
+    assert violation["image_url"].endswith(f"/violations/images/{filename}")
+
+    image = client.get(violation["image_url"], headers=basic_auth(app))
+    assert image.status_code == 200
+    assert image.data == b"\xff\xd8snapshot\xff\xd9"
+
+
+def test_violation_without_image_has_no_url(app, client):
+    with app.app_context():
+        database.add_violation(
+            timestamp=datetime.datetime(2026, 1, 1, 9, 0, 0),
+            equipment_type="NO-Safety Vest",
+            image_path=None,
+            location="Yard",
+            area_type="construction",
+            severity="medium",
+        )
+
+    response = client.get("/api/violations", query_string={"location": "Yard"})
+    (violation,) = response.get_json()["violations"]
+    assert violation["image_url"] is None
+
+
+def add(app, location, timestamp, **fields):
+    values = {
+        "equipment_type": "NO-Hardhat",
+        "image_path": None,
+        "area_type": "construction",
+        "severity": "high",
+        **fields,
+    }
+    with app.app_context():
+        database.add_violation(timestamp=timestamp, location=location, **values)
+
+
+def ids(client, **query):
+    response = client.get("/api/violations", query_string=query)
+    assert response.status_code == 200
+    return [violation["id"] for violation in response.get_json()["violations"]]
+
+
+def test_equal_timestamps_page_every_violation_once(app, client):
+    timestamp = datetime.datetime(2026, 2, 1, 12, 0, 0)
+    for _ in range(7):
+        add(app, "Keyset Yard", timestamp)
+    add(app, "Keyset Yard", timestamp - datetime.timedelta(seconds=1))
+
+    pages, cursor = [], None
+    while True:
+        query = {"location": "Keyset Yard", "limit": 3}
+        if cursor:
+            query["cursor"] = cursor
+        body = client.get("/api/violations", query_string=query).get_json()
+        pages.append([violation["id"] for violation in body["violations"]])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [len(page) for page in pages] == [3, 3, 2]
+    seen = [row_id for page in pages for row_id in page]
+    assert seen == ids(client, location="Keyset Yard", limit=50)
+    assert len(set(seen)) == 8
+    # Ties on timestamp are broken by id, newest first.
+    assert seen[:7] == sorted(seen[:7], reverse=True)
+
+
+def test_each_filter_narrows_the_log(app, client):
+    timestamp = datetime.datetime(2026, 3, 1, 8, 0, 0)
+    add(app, "Filter Dock", timestamp, equipment_type="NO-Mask", severity="low")
+    add(app, "Filter Dock", timestamp, equipment_type="NO-Hardhat", severity="high")
+    with app.app_context():
+        mask, hardhat = [
+            row["id"]
+            for row in database.query_violations({"location": "Filter Dock"})[0]
+        ][::-1]
+        database.update_violation_status(mask, "resolved")
+
+    assert ids(client, location="Filter Dock") == [hardhat, mask]
+    assert ids(client, location="Filter Dock", status="resolved") == [mask]
+    assert ids(client, location="Filter Dock", severity="high") == [hardhat]
+    assert ids(client, location="Filter Dock", equipment_type="NO-Mask") == [mask]
+    assert ids(client, location="Filter Nowhere") == []
+
+
+def test_since_and_until_bound_the_log(app, client):
+    for day, hour in ((4, 23), (5, 0), (5, 23), (6, 0)):
+        add(app, "Range Gate", datetime.datetime(2026, 4, day, hour, 30, 0))
+    all_ids = ids(client, location="Range Gate")  # newest first
+
+    assert ids(client, location="Range Gate", since="2026-04-05") == all_ids[:3]
+    # A bare `until` date includes that whole day.
+    assert ids(client, location="Range Gate", until="2026-04-05") == all_ids[1:]
+    assert (
+        ids(client, location="Range Gate", since="2026-04-05", until="2026-04-05")
+        == all_ids[1:3]
+    )
+    assert (
+        ids(client, location="Range Gate", until="2026-04-05T23:00:00") == all_ids[2:]
+    )
+
+
+def test_invalid_query_parameters_are_rejected(client):
+    for query in (
+        {"cursor": "not-a-cursor"},
+        {"since": "yesterday"},
+        {"until": "2026-13-01"},
+        {"status": "closed"},
+    ):
+        response = client.get("/api/violations", query_string=query)
+        assert response.status_code == 400, query
+        assert response.get_json()["status"] == "error"